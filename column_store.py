@@ -0,0 +1,151 @@
+"""
+Módulo de armazenamento colunar mapeado em memória
+Este módulo contém o column store somente leitura (um arquivo .npy por coluna),
+aberto com mapeamento em memória para que todas as sessões e processos do
+Streamlit compartilhem as mesmas páginas do sistema operacional
+"""
+
+import os
+import json
+import shutil
+import uuid
+from typing import Dict, Any
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+
+ARQUIVO_METADADOS = 'metadados.json'
+
+
+class ColumnStore:
+    """Classe responsável pela gravação e abertura do column store"""
+    
+    def __init__(self, diretorio: str):
+        self.diretorio = diretorio
+    
+    def existe(self) -> bool:
+        """Verifica se o diretório contém um column store completo"""
+        return os.path.exists(os.path.join(self.diretorio, ARQUIVO_METADADOS))
+    
+    def construir(self, df: pd.DataFrame):
+        """
+        Grava o DataFrame como um column store (uma única vez)
+        
+        Colunas numéricas e de data são gravadas como estão; colunas de texto
+        são gravadas como códigos inteiros, com as categorias nos metadados.
+        Colunas que normalizar_schema manteve como texto (alta cardinalidade)
+        guardam também o dtype original, restaurado na abertura.
+        A gravação ocorre em um diretório temporário, renomeado ao final.
+        
+        Args:
+            df: DataFrame com os dados (já normalizado)
+        """
+        diretorio_temporario = f"{self.diretorio}.{uuid.uuid4().hex}.tmp"
+        os.makedirs(diretorio_temporario)
+        
+        colunas = []
+        for nome in df.columns:
+            serie = df[nome]
+            dtype_original = None
+            if not (pd.api.types.is_numeric_dtype(serie) or pd.api.types.is_datetime64_any_dtype(serie)
+                    or isinstance(serie.dtype, pd.CategoricalDtype)):
+                dtype_original = str(serie.dtype)
+                serie = serie.astype('category')
+            
+            arquivo = f"{len(colunas):03d}.npy"
+            if isinstance(serie.dtype, pd.CategoricalDtype):
+                np.save(os.path.join(diretorio_temporario, arquivo), serie.cat.codes.to_numpy())
+                coluna = {
+                    'nome': nome,
+                    'arquivo': arquivo,
+                    'tipo': 'categoria' if dtype_original is None else 'texto',
+                    'categorias': [_valor_json(valor) for valor in serie.cat.categories]
+                }
+                if dtype_original is not None:
+                    coluna['dtype'] = dtype_original
+                colunas.append(coluna)
+            else:
+                np.save(os.path.join(diretorio_temporario, arquivo), serie.to_numpy())
+                colunas.append({'nome': nome, 'arquivo': arquivo, 'tipo': 'valores'})
+        
+        metadados = {
+            'versao': uuid.uuid4().hex,
+            'num_registros': len(df),
+            'colunas': colunas
+        }
+        with open(os.path.join(diretorio_temporario, ARQUIVO_METADADOS), 'w', encoding='utf-8') as arquivo:
+            json.dump(metadados, arquivo, ensure_ascii=False)
+        
+        if os.path.exists(self.diretorio):
+            shutil.rmtree(self.diretorio)
+        os.replace(diretorio_temporario, self.diretorio)
+    
+    def metadados(self) -> Dict[str, Any]:
+        """Lê os metadados do column store"""
+        with open(os.path.join(self.diretorio, ARQUIVO_METADADOS), encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    
+    def abrir(self) -> pd.DataFrame:
+        """
+        Abre o column store como um DataFrame somente leitura, sem copiar os dados
+        
+        Cada coluna é um array mapeado em memória; qualquer tentativa de
+        alteração no lugar gera erro ("assignment destination is read-only").
+        Colunas de texto voltam ao dtype original e, por isso, são as únicas
+        materializadas em memória.
+        
+        Returns:
+            DataFrame cujas colunas são visões dos arquivos mapeados
+        """
+        metadados = self.metadados()
+        
+        dados = {}
+        for coluna in metadados['colunas']:
+            valores = np.load(os.path.join(self.diretorio, coluna['arquivo']), mmap_mode='r')
+            if coluna['tipo'] == 'categoria':
+                dados[coluna['nome']] = _categorical_sem_copia(valores, coluna['categorias'])
+            elif coluna['tipo'] == 'texto':
+                dados[coluna['nome']] = pd.Series(
+                    _categorical_sem_copia(valores, coluna['categorias'])
+                ).astype(coluna['dtype'])
+            else:
+                dados[coluna['nome']] = valores
+        
+        df = pd.DataFrame(dados, copy=False)
+        df.attrs['versao_dados'] = metadados['versao']
+        return df
+
+
+def _categorical_sem_copia(codigos: np.ndarray, categorias: list) -> pd.Categorical:
+    """Cria um Categorical que reaproveita o array de códigos mapeado"""
+    try:
+        return pd.Categorical.from_codes(codigos, categories=categorias, validate=False)
+    except TypeError:
+        # pandas < 2.1 não aceita 'validate' e copia os códigos
+        return pd.Categorical.from_codes(codigos, categories=categorias)
+
+
+def _valor_json(valor: Any) -> Any:
+    """Converte escalares do NumPy em tipos serializáveis em JSON"""
+    return valor.item() if hasattr(valor, 'item') else valor
+
+
+@st.cache_resource
+def obter_column_store(diretorio: str) -> pd.DataFrame:
+    """
+    Abre o column store uma vez por processo (compartilhado entre sessões)
+    
+    Como o DataFrame é compartilhado, ele nunca deve ser alterado no lugar.
+    
+    Args:
+        diretorio: Diretório do column store
+    
+    Returns:
+        DataFrame mapeado em memória (vazio se o column store não existir)
+    """
+    store = ColumnStore(diretorio)
+    if not store.existe():
+        st.error(f"Column store não encontrado em '{diretorio}'")
+        return pd.DataFrame()
+    return store.abrir()
@@ -15,7 +15,125 @@ APP_CONFIG = {
 DATA_CONFIG = {
     'num_registros_ficticios': 500,  # Número de registros para dados fictícios
     'seed_aleatoria': 42,  # Semente para reprodutibilidade
-    'formato_data': 'DD/MM/YYYY'
+    'tamanho_bloco_geracao': 250000,  # Registros por bloco (cada bloco tem sua própria semente)
+    'num_workers_geracao': 1,  # Processos usados na geração de dados fictícios (1 = sequencial)
+    'formato_data': 'DD/MM/YYYY',
+    # 'ficticios', 'excel', 'csv', 'parquet', 'feather', 'particionado', 'sqlite' ou 'mmap'
+    'fonte_dados': 'ficticios',
+    'caminho_dados': None,  # Caminho do arquivo quando a fonte não for 'ficticios'
+    # Carga incremental: 'caminho_dados' aponta para um CSV que recebe novas linhas
+    # ou para um diretório onde chegam novos arquivos (.csv, .parquet, .feather)
+    'modo_incremental': False,
+    # Fonte 'particionado': diretório com subpastas ano=YYYY/mes=MM
+    'meses_iniciais_particionado': 3,  # Meses carregados antes de o usuário escolher um período
+    'workers_leitura_particoes': 4  # Threads usadas na leitura das partições
+}
+
+# Colunas efetivamente usadas pelo dashboard (projeção na leitura de arquivos colunares)
+COLUNAS_DASHBOARD = [
+    'ID_Transformador',
+    'Modelo',
+    'Data_Teste',
+    'Tipo_Ensaio',
+    'Eficiencia_Percentual',
+    'Elevacao_Temperatura_C',
+    'Perdas_Totais_kW',
+    'Status_Aprovacao',
+    'Tensao_Primaria_kV',
+    'Tensao_Secundaria_kV',
+    'Potencia_Nominal_MVA',
+    'Corrente_Excitacao_A'
+]
+
+# Esquema dos dados (tipos aplicados no carregamento, em obter_dados)
+SCHEMA_CONFIG = {
+    # Colunas de texto convertidas para 'category' quando têm poucos valores distintos
+    'colunas_categoricas': ['Modelo', 'Tipo_Ensaio', 'Status_Aprovacao', 'ID_Transformador'],
+    'limite_cardinalidade': 0.5,  # Máximo de (valores distintos / registros) para usar 'category'
+    # Medições convertidas para float32 no modo de economia de memória
+    'colunas_medicoes': [
+        'Eficiencia_Percentual', 'Elevacao_Temperatura_C', 'Perdas_Totais_kW',
+        'Tensao_Primaria_kV', 'Tensao_Secundaria_kV', 'Potencia_Nominal_MVA',
+        'Corrente_Excitacao_A'
+    ],
+    'economia_memoria': False  # Ative para reduzir as medições a float32
+}
+
+# Leitura de arquivos CSV em blocos
+CSV_CONFIG = {
+    'tamanho_bloco': 200000,  # Linhas lidas por bloco (limita o pico de memória)
+    'engine': 'c',  # 'c' (pandas) ou 'pyarrow' (leitor em lotes do PyArrow)
+    'tamanho_bloco_bytes_pyarrow': 32 * 1024 * 1024,  # Tamanho de cada lote do leitor PyArrow
+    # Tipos declarados na leitura (evita inferência e conversões posteriores)
+    'tipos_colunas': {
+        'ID_Transformador': 'str',
+        'Modelo': 'category',
+        'Tipo_Ensaio': 'category',
+        'Status_Aprovacao': 'category',
+        'Eficiencia_Percentual': 'float64',
+        'Elevacao_Temperatura_C': 'float64',
+        'Perdas_Totais_kW': 'float64',
+        'Tensao_Primaria_kV': 'float64',
+        'Tensao_Secundaria_kV': 'float64',
+        'Potencia_Nominal_MVA': 'float64',
+        'Corrente_Excitacao_A': 'float64'
+    },
+    'colunas_data': ['Data_Teste']
+}
+
+# Cache em disco de arquivos convertidos (planilhas Excel são lidas apenas uma vez)
+CACHE_CONFIG = {
+    'diretorio_conversao': '.cache_dados',  # Diretório onde ficam os arquivos convertidos
+    'usar_cache_excel': True,
+    # A entrada é localizada por caminho, tamanho e data de modificação; ative para
+    # confirmar também o hash do conteúdo (lê a planilha inteira a cada carga)
+    'verificar_conteudo_excel': False
+}
+
+# Banco de dados local (fonte 'sqlite': 'caminho_dados' aponta para o arquivo .db)
+DATABASE_CONFIG = {
+    'tabela': 'testes',
+    'colunas_indexadas': ['Data_Teste', 'Modelo', 'Tipo_Ensaio', 'Status_Aprovacao'],
+    'tamanho_bloco_importacao': 50000  # Registros gravados por lote na importação
+}
+
+# Colunas derivadas de 'Data_Teste' no carregamento (uso interno, ocultas na tabela)
+COLUNAS_INTERNAS = ['Chave_Dia', 'Chave_Mes']
+
+# Filtros de lista (chave do dicionário de filtros -> coluna)
+FILTROS_LISTA = {
+    'modelos': 'Modelo',
+    'status': 'Status_Aprovacao',
+    'tipos_ensaio': 'Tipo_Ensaio',
+    'potencias': 'Potencia_Nominal_MVA',
+    'status_rapido': 'Status_Aprovacao'  # Filtros rápidos "Apenas Aprovados/Reprovados"
+}
+
+# Filtros de período sobre 'Data_Teste' (datas de início e fim, ambas inclusivas)
+FILTROS_PERIODO = ['periodo', 'periodo_rapido']  # 'periodo_rapido': filtro rápido "Último Mês"
+
+# Filtros de faixa da barra lateral (chave do dicionário de filtros -> coluna)
+FILTROS_FAIXA = {
+    'eficiencia_range': 'Eficiencia_Percentual',
+    'temperatura_range': 'Elevacao_Temperatura_C',
+    'perdas_range': 'Perdas_Totais_kW'
+}
+
+# Cache dos resultados dos filtros (posições das linhas por combinação de filtros)
+FILTROS_CACHE_CONFIG = {
+    'memoria_maxima_mb': 64  # Resultados menos usados são descartados acima deste limite
+}
+
+# Planejador dos filtros (ordem de avaliação dos predicados pela seletividade estimada)
+FILTROS_PLANO_CONFIG = {
+    'bins_histograma': 64,  # Faixas dos histogramas usados para estimar filtros numéricos
+    'custo_relativo_posicoes': 4.0,  # Custo de avaliar uma linha por posição vs. varredura sequencial
+    'tamanho_bloco_faixas': 65536  # Linhas por bloco na avaliação conjunta dos filtros de faixa
+}
+
+# Expressões de filtro digitadas na barra lateral (filter_expression.py)
+FILTROS_EXPRESSAO_CONFIG = {
+    'tamanho_maximo': 500  # Máximo de caracteres de uma expressão
 }
 
 # Modelos de transformadores disponíveis
@@ -57,6 +175,31 @@ METRICAS_CONFIG = {
     'perdas_maximas': 30.0  # Perdas máximas aceitáveis (kW)
 }
 
+# Motor de agregação das métricas (metrics_engine.py)
+AGREGACAO_CONFIG = {
+    'tamanho_bloco': 65536,  # Linhas por bloco na passada única sobre cada coluna
+    # Cubo Modelo × Ensaio × Status × Potência × dia: responde às métricas quando
+    # só há filtros de lista e de período
+    'usar_cubo': True,
+    # Máximo de (células / registros) para usar o cubo. Com os dados fictícios
+    # (registros espalhados por 730 dias × 8 potências) há quase uma célula por
+    # registro, mesmo com 200 mil registros: o cubo é descartado e as métricas
+    # varrem as linhas. Ele só compensa com muitos registros por dia e combinação
+    'limite_celulas_cubo': 0.25
+}
+
+# Comparação entre períodos nos cards de métricas
+COMPARACAO_CONFIG = {
+    'modo_padrao': 'metas',  # 'metas', 'periodo_anterior', 'ano_anterior' ou 'janela_movel'
+    'dias_janela_movel': 30  # Tamanho padrão das janelas do modo 'janela_movel'
+}
+
+# Quantis das métricas e do boxplot (quantile_sketch.py)
+QUANTIS_CONFIG = {
+    'modo': 'esboco',  # 'esboco' (histograma combinável, guardado no cubo) ou 'exato' (ordena as linhas)
+    'erro_relativo': 0.001  # Erro máximo do esboço, como fração da amplitude da coluna
+}
+
 # Configurações de exportação
 EXPORT_CONFIG = {
     'nome_arquivo_csv': 'dados_filtrados_tsea.csv',
@@ -7,17 +7,23 @@ Data: 29 de Junho de 2025
 Versão: 1 - Versão Modular e Educativa
 """
 
+import os
 import streamlit as st
 import pandas as pd
 import numpy as np
-from datetime import datetime
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
 import warnings
 
 # Importa módulos personalizados
-from config import TEXTOS_INTERFACE, APP_CONFIG
-from data_generator import obter_dados
-from filters import DashboardFilters, criar_filtros_rapidos, aplicar_filtros_rapidos
+from config import TEXTOS_INTERFACE, APP_CONFIG, DATA_CONFIG, COLUNAS_DASHBOARD, COLUNAS_INTERNAS
+from data_generator import obter_dados, obter_carregador_incremental, obter_leitor_csv, limites_particoes
+from column_store import obter_column_store
+from database import obter_banco
+from filters import DashboardFilters, criar_filtros_rapidos
+from filter_engine import obter_cache_resultados
 from metrics import DashboardMetrics
+from metrics_engine import obter_cubo_metricas
 from visualizations import DashboardVisualizations, criar_visualizacao
 from utils import (
     DataExporter, DataValidator, SessionManager, 
@@ -44,11 +50,18 @@ def main():
     # Log da ação
     log_acao("Acesso ao dashboard", "Usuário acessou a página principal")
     
+    # Limites do período (fonte particionada: definidos pelas partições, sem ler os dados)
+    limites_datas, periodo_padrao = obter_limites_periodo()
+    
+    # Banco de dados local (fonte 'sqlite'): os filtros são executados no banco
+    # e apenas as linhas selecionadas são carregadas
+    banco = obter_banco_dashboard()
+    
     # Carregamento dos dados
     with st.spinner("Carregando dados..."):
-        df = carregar_dados_dashboard()
+        df = carregar_dados_dashboard(periodo_padrao) if banco is None else banco.esquema()
     
-    if df.empty:
+    if df.empty and banco is None:
         st.error("❌ Não foi possível carregar os dados. Verifique a configuração.")
         st.stop()
     
@@ -62,13 +75,10 @@ def main():
         st.warning(alerta)
     
     # Criação dos filtros
-    filtros_manager = DashboardFilters(df)
+    filtros_manager = DashboardFilters(df, limites_datas, periodo_padrao, banco)
     
-    # Filtros rápidos na área principal
+    # Filtros rápidos na área principal (mantidos entre reruns)
     filtros_rapidos = criar_filtros_rapidos(df)
-    if filtros_rapidos.get('tipo'):
-        df = aplicar_filtros_rapidos(df, filtros_rapidos)
-        log_acao("Filtro rápido aplicado", f"Tipo: {filtros_rapidos['tipo']}")
     
     # Filtros detalhados na sidebar
     filtros = filtros_manager.criar_filtros_sidebar()
@@ -79,6 +89,11 @@ def main():
         st.error(f"❌ {erro_filtros}")
         st.stop()
     
+    # O filtro rápido entra no mesmo plano de avaliação dos filtros da barra lateral
+    filtros = filtros_manager.combinar_filtros_rapidos(filtros, filtros_rapidos)
+    if filtros_rapidos.get('tipo'):
+        log_acao("Filtro rápido aplicado", f"Tipo: {filtros_rapidos['tipo']}")
+    
     # Aplicação dos filtros
     df_filtrado = filtros_manager.aplicar_filtros(filtros)
     
@@ -87,6 +102,7 @@ def main():
     
     # Log da aplicação de filtros
     log_acao("Filtros aplicados", f"Registros resultantes: {len(df_filtrado)}")
+    log_acao("Plano dos filtros", filtros_manager.obter_plano_filtros())
     
     # Verifica se há dados após filtros
     if df_filtrado.empty:
@@ -98,37 +114,113 @@ def main():
     resumo_filtros = filtros_manager.obter_resumo_filtros(filtros)
     st.info(f"📊 {resumo_filtros}")
     
-    # Seção de métricas
-    exibir_secao_metricas(df_filtrado)
+    # Seção de métricas (com só filtros de lista e de período, respondida pelo
+    # cubo pré-agregado, construído uma vez por versão dos dados)
+    cubo = obter_cubo_metricas(df) if banco is None else None
+    metrics_manager = DashboardMetrics(df_filtrado, cubo, filtros)
+    exibir_secao_metricas(
+        metrics_manager,
+        # Comparação entre períodos: demais filtros aplicados ao período de referência
+        lambda periodo: filtros_manager.aplicar_filtros_periodo(filtros, periodo)
+    )
+    log_acao("Origem das métricas", metrics_manager.origem_agregados)
     
     # Seção de visualizações
-    exibir_secao_visualizacoes(df_filtrado)
+    exibir_secao_visualizacoes(df_filtrado, metrics_manager)
     
     # Seção de dados detalhados
     exibir_secao_dados(df_filtrado)
     
     # Sidebar com informações adicionais
-    criar_sidebar_info()
+    estatisticas_cache = obter_cache_resultados().estatisticas() if banco is None else None
+    criar_sidebar_info(df.attrs.get('relatorio_memoria'), estatisticas_cache)
     
     # Histórico de filtros
     SessionManager.exibir_historico_filtros()
 
 
-def carregar_dados_dashboard() -> pd.DataFrame:
+def obter_limites_periodo() -> Tuple[Optional[tuple], Optional[tuple]]:
+    """
+    Calcula os limites e o período inicial do filtro de datas para a fonte particionada
+    
+    Returns:
+        Tupla (limites_datas, periodo_padrao); (None, None) para as demais fontes
+    """
+    if DATA_CONFIG['fonte_dados'] != 'particionado' or not DATA_CONFIG['caminho_dados']:
+        return None, None
+    
+    limites = limites_particoes(DATA_CONFIG['caminho_dados'])
+    if limites is None:
+        return None, None
+    
+    # Período inicial: últimos meses disponíveis
+    inicio_padrao = (
+        pd.Timestamp(limites[1]) - pd.DateOffset(months=DATA_CONFIG['meses_iniciais_particionado'])
+    ).date() + timedelta(days=1)
+    return limites, (max(inicio_padrao, limites[0]), limites[1])
+
+
+def obter_banco_dashboard():
+    """
+    Retorna o banco de dados local quando a fonte configurada é 'sqlite'
+    
+    Returns:
+        DashboardDatabase ou None para as demais fontes
+    """
+    if DATA_CONFIG['fonte_dados'] != 'sqlite' or not DATA_CONFIG['caminho_dados']:
+        return None
+    
+    banco = obter_banco(DATA_CONFIG['caminho_dados'])
+    if not banco.existe():
+        st.error(
+            "❌ Banco de dados sem a tabela de testes. Importe os dados com "
+            "DashboardDatabase.importar_dataframe (veja o README)."
+        )
+        st.stop()
+    
+    return banco
+
+
+def carregar_dados_dashboard(periodo_padrao: Optional[tuple] = None) -> pd.DataFrame:
     """
     Carrega os dados para o dashboard
     
+    Args:
+        periodo_padrao: Período inicial da fonte particionada (apenas as partições
+            que se sobrepõem ao período selecionado são lidas)
+    
     Returns:
         DataFrame com os dados carregados
     """
     try:
         # Por padrão, usa dados fictícios
-        # Para usar dados reais, modifique esta função
-        df = obter_dados(fonte='ficticios')
+        # Para usar dados reais, altere 'fonte_dados' e 'caminho_dados' em config.py
+        if DATA_CONFIG['modo_incremental'] and DATA_CONFIG['caminho_dados']:
+            df = carregar_dados_incrementais()
+        elif DATA_CONFIG['fonte_dados'] == 'mmap' and DATA_CONFIG['caminho_dados']:
+            # Column store mapeado em memória: todas as sessões leem as mesmas páginas
+            df = obter_column_store(DATA_CONFIG['caminho_dados'])
+        elif DATA_CONFIG['fonte_dados'] == 'csv' and DATA_CONFIG['caminho_dados']:
+            df = carregar_csv_dashboard(DATA_CONFIG['caminho_dados'])
+        else:
+            df = obter_dados(
+                fonte=DATA_CONFIG['fonte_dados'],
+                caminho_arquivo=DATA_CONFIG['caminho_dados'],
+                colunas=COLUNAS_DASHBOARD,
+                periodo=periodo_selecionado(periodo_padrao)
+            )
         
         if not df.empty:
             st.session_state.dados_carregados = True
             log_acao("Dados carregados", f"Total de registros: {len(df)}")
+            
+            relatorio_memoria = df.attrs.get('relatorio_memoria')
+            if relatorio_memoria:
+                log_acao(
+                    "Esquema normalizado",
+                    f"Memória: {relatorio_memoria['memoria_antes_mb']:.1f} MB → "
+                    f"{relatorio_memoria['memoria_depois_mb']:.1f} MB"
+                )
         
         return df
         
@@ -137,17 +229,82 @@ def carregar_dados_dashboard() -> pd.DataFrame:
         return pd.DataFrame()
 
 
-def exibir_secao_metricas(df: pd.DataFrame):
+def carregar_csv_dashboard(caminho: str) -> pd.DataFrame:
     """
-    Exibe a seção de métricas do dashboard
+    Lê o CSV exibindo o progresso da leitura em uma barra do dashboard
+    
+    A leitura é feita uma vez por versão do arquivo (tamanho e data de
+    modificação); nas execuções seguintes a barra não chega a aparecer.
     
     Args:
-        df: DataFrame com os dados filtrados
+        caminho: Caminho do arquivo CSV
+        
+    Returns:
+        DataFrame com os dados carregados
+    """
+    estado = os.stat(caminho)
+    leitor = obter_leitor_csv(caminho, COLUNAS_DASHBOARD, estado.st_size, estado.st_mtime_ns)
+    if leitor.df is not None:
+        return leitor.df
+    
+    barra_progresso = st.progress(0.0, text="Lendo arquivo CSV...")
+    try:
+        return leitor.carregar(
+            lambda fracao: barra_progresso.progress(fracao, text=f"Lendo arquivo CSV... {fracao:.0%}")
+        )
+    finally:
+        barra_progresso.empty()
+
+
+def periodo_selecionado(periodo_padrao: Optional[tuple]) -> Optional[tuple]:
     """
-    metrics_manager = DashboardMetrics(df)
+    Retorna o período escolhido na barra lateral (salvo pelo Streamlit na sessão)
     
+    Args:
+        periodo_padrao: Período usado enquanto não houver seleção completa
+        
+    Returns:
+        Tupla (data_inicio, data_fim) ou None (sem poda de partições)
+    """
+    if periodo_padrao is None:
+        return None
+    
+    periodo = st.session_state.get('filtro_periodo')
+    if periodo and len(periodo) == 2:
+        return tuple(periodo)
+    return periodo_padrao
+
+
+def carregar_dados_incrementais() -> pd.DataFrame:
+    """
+    Carrega os dados no modo incremental
+    
+    Quando o usuário pede para recarregar, apenas os registros novos
+    (linhas acrescentadas ao CSV ou arquivos novos no diretório) são lidos.
+    
+    Returns:
+        DataFrame com os dados acumulados
+    """
+    carregador = obter_carregador_incremental(DATA_CONFIG['caminho_dados'], COLUNAS_DASHBOARD)
+    
+    if st.session_state.pop('atualizar_dados', False):
+        novos_registros = carregador.atualizar()
+        log_acao("Atualização incremental", f"Novos registros: {novos_registros}")
+    
+    return carregador.df
+
+
+def exibir_secao_metricas(metrics_manager: DashboardMetrics, filtrar_periodo=None):
+    """
+    Exibe a seção de métricas do dashboard
+    
+    Args:
+        metrics_manager: DashboardMetrics dos dados filtrados
+        filtrar_periodo: Função que aplica os demais filtros a outro período
+            (usada na comparação entre períodos)
+    """
     # Métricas principais
-    metrics_manager.exibir_metricas_principais()
+    metrics_manager.exibir_metricas_principais(filtrar_periodo)
     
     # Métricas detalhadas
     metrics_manager.exibir_metricas_detalhadas()
@@ -158,12 +315,13 @@ def exibir_secao_metricas(df: pd.DataFrame):
         st.markdown(relatorio)
 
 
-def exibir_secao_visualizacoes(df: pd.DataFrame):
+def exibir_secao_visualizacoes(df: pd.DataFrame, metrics_manager: Optional[DashboardMetrics] = None):
     """
     Exibe a seção de visualizações do dashboard
     
     Args:
         df: DataFrame com os dados filtrados
+        metrics_manager: Métricas dos dados filtrados (agregados e esboços reaproveitados pelos gráficos)
     """
     st.markdown("---")
     st.header(TEXTOS_INTERFACE['graficos_titulo'])
@@ -196,38 +354,38 @@ def exibir_secao_visualizacoes(df: pd.DataFrame):
         num_graficos = len(graficos_selecionados)
         
         if num_graficos == 1:
-            fig = criar_visualizacao(graficos_selecionados[0], df)
+            fig = criar_visualizacao(graficos_selecionados[0], df, metrics_manager)
             st.plotly_chart(fig, use_container_width=True)
         
         elif num_graficos == 2:
             col1, col2 = st.columns(2)
             with col1:
-                fig1 = criar_visualizacao(graficos_selecionados[0], df)
+                fig1 = criar_visualizacao(graficos_selecionados[0], df, metrics_manager)
                 st.plotly_chart(fig1, use_container_width=True)
             with col2:
-                fig2 = criar_visualizacao(graficos_selecionados[1], df)
+                fig2 = criar_visualizacao(graficos_selecionados[1], df, metrics_manager)
                 st.plotly_chart(fig2, use_container_width=True)
         
         elif num_graficos >= 3:
             # Primeira linha
             col1, col2 = st.columns(2)
             with col1:
-                fig1 = criar_visualizacao(graficos_selecionados[0], df)
+                fig1 = criar_visualizacao(graficos_selecionados[0], df, metrics_manager)
                 st.plotly_chart(fig1, use_container_width=True)
             with col2:
-                fig2 = criar_visualizacao(graficos_selecionados[1], df)
+                fig2 = criar_visualizacao(graficos_selecionados[1], df, metrics_manager)
                 st.plotly_chart(fig2, use_container_width=True)
             
             # Segunda linha e subsequentes
             for i in range(2, num_graficos, 2):
                 col1, col2 = st.columns(2)
                 with col1:
-                    fig = criar_visualizacao(graficos_selecionados[i], df)
+                    fig = criar_visualizacao(graficos_selecionados[i], df, metrics_manager)
                     st.plotly_chart(fig, use_container_width=True)
                 
                 if i + 1 < num_graficos:
                     with col2:
-                        fig = criar_visualizacao(graficos_selecionados[i + 1], df)
+                        fig = criar_visualizacao(graficos_selecionados[i + 1], df, metrics_manager)
                         st.plotly_chart(fig, use_container_width=True)
     
     else:
@@ -244,6 +402,9 @@ def exibir_secao_dados(df: pd.DataFrame):
     st.markdown("---")
     st.header(TEXTOS_INTERFACE['dados_titulo'])
     
+    # Colunas derivadas (chaves de data) não são exibidas nem exportadas
+    df = df.drop(columns=[col for col in COLUNAS_INTERNAS if col in df.columns])
+    
     # Opções de exibição
     col1, col2, col3 = st.columns(3)
     
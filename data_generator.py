@@ -3,37 +3,144 @@ Módulo para geração e carregamento de dados
 Este módulo contém funções para gerar dados fictícios e carregar dados reais
 """
 
+import io
+import os
+import hashlib
+import re
+import calendar
+import threading
+import uuid
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
-from typing import Optional
+from datetime import datetime, date, timedelta
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, List, Iterator, Callable, Tuple
 import streamlit as st
 from config import (
     DATA_CONFIG, MODELOS_TRANSFORMADORES, TIPOS_ENSAIO, 
-    STATUS_APROVACAO, METRICAS_CONFIG
+    STATUS_APROVACAO, METRICAS_CONFIG, SCHEMA_CONFIG, CSV_CONFIG,
+    CACHE_CONFIG
 )
 
+# PyArrow é opcional: só é necessário para as fontes Parquet e Arrow IPC/Feather
+# e para a leitura de CSV com CSV_CONFIG['engine'] = 'pyarrow'
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+    import pyarrow.feather as feather
+    PYARROW_DISPONIVEL = True
+except ImportError:
+    PYARROW_DISPONIVEL = False
+
+# Extensões lidas em diretórios (partições e diretório de entrada incremental)
+EXTENSOES_DADOS = ('.csv', '.parquet', '.feather')
+
+# Partições mensais no formato ano=YYYY/mes=MM
+PADRAO_PARTICAO_ANO = re.compile(r'^ano=(\d{4})$')
+PADRAO_PARTICAO_MES = re.compile(r'^mes=(\d{1,2})$')
+
 
 class DataGenerator:
     """Classe responsável pela geração e carregamento de dados"""
     
     def __init__(self):
+        # Cada bloco recebe seu próprio gerador, derivado desta semente
+        # (o estado global do np.random não é alterado)
         self.seed = DATA_CONFIG['seed_aleatoria']
-        np.random.seed(self.seed)
     
-    def gerar_dados_ficticios(self, num_registros: Optional[int] = None) -> pd.DataFrame:
+    def gerar_dados_ficticios(self, num_registros: Optional[int] = None,
+                              num_workers: Optional[int] = None) -> pd.DataFrame:
         """
         Gera um DataFrame com dados fictícios de teste de transformadores
         
+        A base é dividida em blocos de tamanho fixo, cada um com um gerador
+        aleatório independente derivado da semente configurada. Por isso o
+        resultado é idêntico qualquer que seja o número de processos usados.
+        
         Args:
             num_registros: Número de registros a serem gerados
+            num_workers: Número de processos para a geração (1 = sequencial)
             
         Returns:
             DataFrame com dados fictícios
         """
         if num_registros is None:
             num_registros = DATA_CONFIG['num_registros_ficticios']
+        if num_workers is None:
+            num_workers = DATA_CONFIG['num_workers_geracao']
+        
+        tarefas = self._planejar_blocos(num_registros, DATA_CONFIG['tamanho_bloco_geracao'])
+        
+        if num_workers > 1 and len(tarefas) > 1:
+            with ProcessPoolExecutor(max_workers=num_workers) as executor:
+                blocos = list(executor.map(_gerar_bloco_processo, tarefas))
+        else:
+            blocos = [_gerar_bloco_processo(tarefa) for tarefa in tarefas]
+        
+        if len(blocos) == 1:
+            return blocos[0]
+        return pd.concat(blocos)
+    
+    def gerar_dados_ficticios_em_blocos(self, num_registros: Optional[int] = None,
+                                        tamanho_bloco: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """
+        Gera dados fictícios em blocos de tamanho fixo
+        
+        Permite criar bases de teste com milhões de registros (por exemplo,
+        gravando cada bloco em disco) sem manter a base inteira em memória.
+        
+        Args:
+            num_registros: Número total de registros a serem gerados
+            tamanho_bloco: Número de registros por bloco
+            
+        Yields:
+            DataFrames com no máximo `tamanho_bloco` registros cada
+        """
+        if num_registros is None:
+            num_registros = DATA_CONFIG['num_registros_ficticios']
+        if tamanho_bloco is None:
+            tamanho_bloco = DATA_CONFIG['tamanho_bloco_geracao']
+        
+        for tarefa in self._planejar_blocos(num_registros, tamanho_bloco):
+            yield _gerar_bloco_processo(tarefa)
+    
+    def _planejar_blocos(self, num_registros: int, tamanho_bloco: int) -> List[tuple]:
+        """
+        Divide a geração em blocos, cada um com sua própria semente
+        
+        Args:
+            num_registros: Número total de registros
+            tamanho_bloco: Número de registros por bloco
+            
+        Returns:
+            Lista de tuplas (inicio, num_registros, data_fim, semente_do_bloco)
+        """
+        # Mesma data de referência para todos os blocos
+        data_fim = datetime.now()
         
+        inicios = list(range(0, num_registros, tamanho_bloco)) or [0]
+        sementes = np.random.SeedSequence(self.seed).spawn(len(inicios))
+        
+        return [
+            (inicio, min(tamanho_bloco, num_registros - inicio), data_fim, semente)
+            for inicio, semente in zip(inicios, sementes)
+        ]
+    
+    def _gerar_bloco(self, inicio: int, num_registros: int, data_fim: datetime,
+                     rng: np.random.Generator) -> pd.DataFrame:
+        """
+        Gera um bloco de dados fictícios usando apenas operações vetorizadas
+        
+        Args:
+            inicio: Posição do primeiro registro do bloco (define os IDs)
+            num_registros: Número de registros do bloco
+            data_fim: Data de referência para as datas aleatórias
+            rng: Gerador aleatório exclusivo do bloco
+            
+        Returns:
+            DataFrame com o bloco de dados fictícios
+        """
         # Probabilidades para cada modelo (pode ser ajustado conforme necessário)
         prob_modelos = [0.25, 0.20, 0.20, 0.15, 0.10, 0.10]
         
@@ -44,87 +151,89 @@ class DataGenerator:
         prob_aprovacao = [0.92, 0.08]  # 92% aprovação, 8% reprovação
         
         dados = {
-            'ID_Transformador': [f'TR-{1000 + i:04d}' for i in range(num_registros)],
-            'Modelo': np.random.choice(MODELOS_TRANSFORMADORES, num_registros, p=prob_modelos),
-            'Data_Teste': self._gerar_datas_aleatorias(num_registros),
-            'Tipo_Ensaio': np.random.choice(TIPOS_ENSAIO, num_registros, p=prob_ensaios),
-            'Eficiencia_Percentual': self._gerar_eficiencia(num_registros),
-            'Elevacao_Temperatura_C': self._gerar_temperatura(num_registros),
-            'Perdas_Totais_kW': self._gerar_perdas(num_registros),
-            'Status_Aprovacao': np.random.choice(STATUS_APROVACAO, num_registros, p=prob_aprovacao),
-            'Tensao_Primaria_kV': self._gerar_tensao_primaria(num_registros),
-            'Tensao_Secundaria_kV': self._gerar_tensao_secundaria(num_registros),
-            'Potencia_Nominal_MVA': self._gerar_potencia_nominal(num_registros),
-            'Corrente_Excitacao_A': self._gerar_corrente_excitacao(num_registros)
+            'ID_Transformador': self._gerar_ids(inicio, num_registros),
+            'Modelo': rng.choice(MODELOS_TRANSFORMADORES, num_registros, p=prob_modelos),
+            'Data_Teste': self._gerar_datas_aleatorias(num_registros, rng, data_fim),
+            'Tipo_Ensaio': rng.choice(TIPOS_ENSAIO, num_registros, p=prob_ensaios),
+            'Eficiencia_Percentual': self._gerar_eficiencia(num_registros, rng),
+            'Elevacao_Temperatura_C': self._gerar_temperatura(num_registros, rng),
+            'Perdas_Totais_kW': self._gerar_perdas(num_registros, rng),
+            'Status_Aprovacao': rng.choice(STATUS_APROVACAO, num_registros, p=prob_aprovacao),
+            'Tensao_Primaria_kV': self._gerar_tensao_primaria(num_registros, rng),
+            'Tensao_Secundaria_kV': self._gerar_tensao_secundaria(num_registros, rng),
+            'Potencia_Nominal_MVA': self._gerar_potencia_nominal(num_registros, rng),
+            'Corrente_Excitacao_A': self._gerar_corrente_excitacao(num_registros, rng)
         }
         
-        df = pd.DataFrame(dados)
+        df = pd.DataFrame(dados, index=pd.RangeIndex(inicio, inicio + num_registros))
         
         # Adiciona algumas correlações realistas
-        df = self._adicionar_correlacoes(df)
+        df = self._adicionar_correlacoes(df, rng)
         
         return df
     
-    def _gerar_datas_aleatorias(self, num_registros: int) -> list:
+    def _gerar_ids(self, inicio: int, num_registros: int) -> np.ndarray:
+        """Gera os identificadores sequenciais (TR-1000, TR-1001, ...)"""
+        numeros = np.arange(1000 + inicio, 1000 + inicio + num_registros)
+        return np.char.add('TR-', numeros.astype(str))
+    
+    def _gerar_datas_aleatorias(self, num_registros: int, rng: np.random.Generator,
+                                data_fim: Optional[datetime] = None) -> np.ndarray:
         """Gera datas aleatórias nos últimos 2 anos"""
-        data_inicio = datetime.now() - timedelta(days=730)
-        data_fim = datetime.now()
+        if data_fim is None:
+            data_fim = datetime.now()
+        data_inicio = data_fim - timedelta(days=730)
         
-        datas = []
-        for _ in range(num_registros):
-            dias_aleatorios = np.random.randint(0, (data_fim - data_inicio).days)
-            data_aleatoria = data_inicio + timedelta(days=dias_aleatorios)
-            datas.append(data_aleatoria)
-        
-        return datas
+        dias_aleatorios = rng.integers(0, (data_fim - data_inicio).days, num_registros)
+        return np.datetime64(data_inicio, 'us') + dias_aleatorios.astype('timedelta64[D]')
     
-    def _gerar_eficiencia(self, num_registros: int) -> np.ndarray:
+    def _gerar_eficiencia(self, num_registros: int, rng: np.random.Generator) -> np.ndarray:
         """Gera valores de eficiência com distribuição realística"""
         # Eficiência segue uma distribuição normal truncada
-        eficiencia = np.random.normal(99.2, 0.3, num_registros)
+        eficiencia = rng.normal(99.2, 0.3, num_registros)
         eficiencia = np.clip(eficiencia, 98.0, 99.9)
         return np.round(eficiencia, 2)
     
-    def _gerar_temperatura(self, num_registros: int) -> np.ndarray:
+    def _gerar_temperatura(self, num_registros: int, rng: np.random.Generator) -> np.ndarray:
         """Gera valores de elevação de temperatura"""
-        temperatura = np.random.normal(55, 5, num_registros)
+        temperatura = rng.normal(55, 5, num_registros)
         temperatura = np.clip(temperatura, 40, 70)
         return np.round(temperatura, 1)
     
-    def _gerar_perdas(self, num_registros: int) -> np.ndarray:
+    def _gerar_perdas(self, num_registros: int, rng: np.random.Generator) -> np.ndarray:
         """Gera valores de perdas totais"""
-        perdas = np.random.lognormal(2.5, 0.4, num_registros)
+        perdas = rng.lognormal(2.5, 0.4, num_registros)
         perdas = np.clip(perdas, 3, 35)
         return np.round(perdas, 2)
     
-    def _gerar_tensao_primaria(self, num_registros: int) -> np.ndarray:
+    def _gerar_tensao_primaria(self, num_registros: int, rng: np.random.Generator) -> np.ndarray:
         """Gera valores de tensão primária"""
         tensoes_padrao = [13.8, 23.0, 34.5, 69.0, 138.0, 230.0]
-        return np.random.choice(tensoes_padrao, num_registros)
+        return rng.choice(tensoes_padrao, num_registros)
     
-    def _gerar_tensao_secundaria(self, num_registros: int) -> np.ndarray:
+    def _gerar_tensao_secundaria(self, num_registros: int, rng: np.random.Generator) -> np.ndarray:
         """Gera valores de tensão secundária"""
         tensoes_padrao = [0.38, 0.48, 4.16, 13.8, 23.0, 34.5]
-        return np.random.choice(tensoes_padrao, num_registros)
+        return rng.choice(tensoes_padrao, num_registros)
     
-    def _gerar_potencia_nominal(self, num_registros: int) -> np.ndarray:
+    def _gerar_potencia_nominal(self, num_registros: int, rng: np.random.Generator) -> np.ndarray:
         """Gera valores de potência nominal"""
         potencias_padrao = [0.5, 1.0, 2.5, 5.0, 10.0, 15.0, 25.0, 50.0]
-        return np.random.choice(potencias_padrao, num_registros)
+        return rng.choice(potencias_padrao, num_registros)
     
-    def _gerar_corrente_excitacao(self, num_registros: int) -> np.ndarray:
+    def _gerar_corrente_excitacao(self, num_registros: int, rng: np.random.Generator) -> np.ndarray:
         """Gera valores de corrente de excitação"""
-        corrente = np.random.uniform(0.5, 3.0, num_registros)
+        corrente = rng.uniform(0.5, 3.0, num_registros)
         return np.round(corrente, 2)
     
-    def _adicionar_correlacoes(self, df: pd.DataFrame) -> pd.DataFrame:
+    def _adicionar_correlacoes(self, df: pd.DataFrame, rng: np.random.Generator) -> pd.DataFrame:
         """Adiciona correlações realísticas entre variáveis"""
         # Transformadores com maior potência tendem a ter mais perdas
         mask_alta_potencia = df['Potencia_Nominal_MVA'] > 10
         df.loc[mask_alta_potencia, 'Perdas_Totais_kW'] *= 1.5
         
         # Transformadores com mais perdas tendem a ter maior elevação de temperatura
-        correlacao_temp = df['Perdas_Totais_kW'] * 0.8 + np.random.normal(0, 2, len(df))
+        correlacao_temp = df['Perdas_Totais_kW'] * 0.8 + rng.normal(0, 2, len(df))
         df['Elevacao_Temperatura_C'] = np.clip(
             df['Elevacao_Temperatura_C'] + correlacao_temp, 40, 70
         )
@@ -143,6 +252,11 @@ class DataGenerator:
         """
         Carrega dados de um arquivo Excel
         
+        A planilha convertida é guardada em Parquet no diretório de cache
+        (CACHE_CONFIG['diretorio_conversao']). Enquanto o arquivo não mudar,
+        as próximas cargas leem o Parquet e não analisam o XLSX novamente,
+        mesmo após reiniciar o processo ou limpar o cache do Streamlit.
+        
         Args:
             caminho_arquivo: Caminho para o arquivo Excel
             
@@ -150,40 +264,824 @@ class DataGenerator:
             DataFrame com os dados carregados
         """
         try:
+            usar_cache = CACHE_CONFIG['usar_cache_excel'] and PYARROW_DISPONIVEL
+            
+            if usar_cache:
+                caminho_cache = self._caminho_cache_conversao(caminho_arquivo)
+                if os.path.exists(caminho_cache) and self._conteudo_confere(caminho_arquivo, caminho_cache):
+                    return pd.read_parquet(caminho_cache)
+            
             df = pd.read_excel(caminho_arquivo)
             df['Data_Teste'] = pd.to_datetime(df['Data_Teste'])
+            
+            if usar_cache:
+                self._salvar_cache_conversao(df, caminho_cache, caminho_arquivo)
+            
             return df
         except Exception as e:
             st.error(f"Erro ao carregar arquivo Excel: {str(e)}")
             return pd.DataFrame()
     
-    def carregar_dados_csv(self, caminho_arquivo: str) -> pd.DataFrame:
+    def _caminho_cache_conversao(self, caminho_arquivo: str) -> str:
+        """
+        Monta o caminho do arquivo convertido no cache
+        
+        O nome combina o hash do caminho absoluto com o hash de tamanho e
+        data de modificação (apenas os metadados: o arquivo não é lido), de
+        modo que qualquer alteração no arquivo original gera uma nova entrada.
+        
+        Args:
+            caminho_arquivo: Caminho para o arquivo original
+            
+        Returns:
+            Caminho do arquivo Parquet correspondente no cache
+        """
+        caminho_absoluto = os.path.abspath(caminho_arquivo)
+        info = os.stat(caminho_absoluto)
+        
+        chave_caminho = hashlib.sha256(caminho_absoluto.encode('utf-8')).hexdigest()[:16]
+        chave_versao = hashlib.sha256(
+            f"{info.st_size}|{info.st_mtime_ns}".encode('utf-8')
+        ).hexdigest()[:16]
+        
+        return os.path.join(CACHE_CONFIG['diretorio_conversao'], f"{chave_caminho}_{chave_versao}.parquet")
+    
+    def _hash_conteudo(self, caminho_arquivo: str) -> str:
+        """SHA-256 do conteúdo do arquivo, lido em blocos de 1 MiB"""
+        hash_conteudo = hashlib.sha256()
+        with open(caminho_arquivo, 'rb') as arquivo:
+            for bloco in iter(lambda: arquivo.read(1024 * 1024), b''):
+                hash_conteudo.update(bloco)
+        return hash_conteudo.hexdigest()
+    
+    def _conteudo_confere(self, caminho_arquivo: str, caminho_cache: str) -> bool:
         """
-        Carrega dados de um arquivo CSV
+        Confirma pelo conteúdo uma entrada do cache encontrada pelos metadados
+        
+        Só lê o arquivo original com CACHE_CONFIG['verificar_conteudo_excel'];
+        o hash gravado ao lado do Parquet ('.sha256') é comparado com o atual.
+        
+        Args:
+            caminho_arquivo: Caminho para o arquivo original
+            caminho_cache: Entrada do cache com o mesmo tamanho e data de modificação
+            
+        Returns:
+            True se a entrada pode ser usada
+        """
+        if not CACHE_CONFIG['verificar_conteudo_excel']:
+            return True
+        
+        try:
+            with open(f"{caminho_cache}.sha256", encoding='utf-8') as arquivo:
+                hash_gravado = arquivo.read().strip()
+        except OSError:
+            return False
+        return hash_gravado == self._hash_conteudo(caminho_arquivo)
+    
+    def _salvar_cache_conversao(self, df: pd.DataFrame, caminho_cache: str, caminho_arquivo: str):
+        """
+        Grava o DataFrame convertido no cache, removendo versões antigas do mesmo arquivo
+        
+        Falhas de gravação não impedem o carregamento (o cache é apenas uma
+        otimização), mas são avisadas e não deixam arquivos temporários.
+        
+        Args:
+            df: DataFrame convertido
+            caminho_cache: Caminho de destino no cache
+            caminho_arquivo: Caminho para o arquivo original (hash do conteúdo)
+        """
+        diretorio, nome = os.path.split(caminho_cache)
+        chave_caminho = nome.split('_')[0]
+        # Grava em arquivo temporário e renomeia, para nunca deixar um Parquet incompleto
+        caminho_temporario = f"{caminho_cache}.{os.getpid()}.tmp"
+        
+        try:
+            os.makedirs(diretorio, exist_ok=True)
+            
+            for antigo in os.listdir(diretorio):
+                if antigo.startswith(f"{chave_caminho}_") and not antigo.startswith(nome):
+                    os.remove(os.path.join(diretorio, antigo))
+            
+            df.to_parquet(caminho_temporario, engine='pyarrow', index=False)
+            os.replace(caminho_temporario, caminho_cache)
+            
+            if CACHE_CONFIG['verificar_conteudo_excel']:
+                with open(f"{caminho_cache}.sha256", 'w', encoding='utf-8') as arquivo:
+                    arquivo.write(self._hash_conteudo(caminho_arquivo))
+        except Exception as e:
+            st.warning(f"Não foi possível gravar o cache da planilha convertida: {str(e)}")
+            if os.path.exists(caminho_temporario):
+                os.remove(caminho_temporario)
+    
+    def carregar_dados_csv(self, caminho_arquivo: str, colunas: Optional[List[str]] = None,
+                           progresso: Optional[Callable[[float], None]] = None,
+                           limite_bytes: Optional[int] = None) -> pd.DataFrame:
+        """
+        Carrega dados de um arquivo CSV em blocos
+        
+        Os tipos declarados em CSV_CONFIG['tipos_colunas'] e a conversão das datas
+        são aplicados durante a leitura, e apenas as colunas pedidas são mantidas.
+        Com isso, o pico de memória fica limitado a um bloco de texto por vez.
         
         Args:
             caminho_arquivo: Caminho para o arquivo CSV
+            colunas: Colunas a serem lidas (None lê todas)
+            progresso: Função chamada com a fração do arquivo já lida (0 a 1)
+            limite_bytes: Lê apenas os primeiros bytes do arquivo (None lê até o fim)
             
         Returns:
             DataFrame com os dados carregados
         """
         try:
-            df = pd.read_csv(caminho_arquivo)
-            df['Data_Teste'] = pd.to_datetime(df['Data_Teste'])
-            return df
+            if CSV_CONFIG['engine'] == 'pyarrow' and PYARROW_DISPONIVEL:
+                return self._ler_csv_pyarrow(caminho_arquivo, colunas, progresso, limite_bytes)
+            return self._ler_csv_pandas(caminho_arquivo, colunas, progresso, limite_bytes)
         except Exception as e:
             st.error(f"Erro ao carregar arquivo CSV: {str(e)}")
             return pd.DataFrame()
+    
+    def _ler_csv_pandas(self, caminho_arquivo: str, colunas: Optional[List[str]],
+                        progresso: Optional[Callable[[float], None]],
+                        limite_bytes: Optional[int] = None) -> pd.DataFrame:
+        """Lê o CSV em blocos com o leitor do pandas"""
+        with open(caminho_arquivo, 'rb') as arquivo_bruto:
+            arquivo, tamanho_total = _limitar_leitura(arquivo_bruto, limite_bytes)
+            
+            # Lê apenas o cabeçalho para montar a projeção e o mapa de tipos
+            cabecalho = list(pd.read_csv(arquivo, nrows=0).columns)
+            arquivo.seek(0)
+            usecols = self._projetar_colunas(colunas, cabecalho) or cabecalho
+            
+            leitor = pd.read_csv(
+                arquivo,
+                usecols=usecols,
+                dtype={col: tipo for col, tipo in CSV_CONFIG['tipos_colunas'].items() if col in usecols},
+                parse_dates=[col for col in CSV_CONFIG['colunas_data'] if col in usecols],
+                chunksize=CSV_CONFIG['tamanho_bloco']
+            )
+            
+            blocos = []
+            for bloco in leitor:
+                blocos.append(bloco)
+                if progresso:
+                    progresso(min(arquivo.tell() / tamanho_total, 1.0))
+        
+        return _concatenar_blocos(blocos, usecols)
+    
+    def _ler_csv_pyarrow(self, caminho_arquivo: str, colunas: Optional[List[str]],
+                         progresso: Optional[Callable[[float], None]],
+                         limite_bytes: Optional[int] = None) -> pd.DataFrame:
+        """Lê o CSV em lotes com o leitor de streaming do PyArrow"""
+        tipos_arrow = {
+            'category': pa.dictionary(pa.int32(), pa.string()),
+            'str': pa.string(),
+            'float64': pa.float64(),
+            'float32': pa.float32()
+        }
+        
+        with open(caminho_arquivo, 'rb') as arquivo_bruto:
+            arquivo, tamanho_total = _limitar_leitura(arquivo_bruto, limite_bytes)
+            
+            cabecalho = list(pd.read_csv(arquivo, nrows=0).columns)
+            arquivo.seek(0)
+            
+            tipos = {col: tipos_arrow[tipo] for col, tipo in CSV_CONFIG['tipos_colunas'].items()}
+            tipos.update({col: pa.timestamp('us') for col in CSV_CONFIG['colunas_data']})
+            
+            leitor = pa_csv.open_csv(
+                arquivo,
+                read_options=pa_csv.ReadOptions(block_size=CSV_CONFIG['tamanho_bloco_bytes_pyarrow']),
+                convert_options=pa_csv.ConvertOptions(
+                    column_types=tipos,
+                    include_columns=self._projetar_colunas(colunas, cabecalho)
+                )
+            )
+            
+            lotes = []
+            for lote in leitor:
+                lotes.append(lote)
+                if progresso:
+                    progresso(min(arquivo.tell() / tamanho_total, 1.0))
+            
+            tabela = pa.Table.from_batches(lotes, schema=leitor.schema)
+        
+        df = tabela.unify_dictionaries().to_pandas()
+        
+        # Mesma ordem de categorias do leitor do pandas
+        for col in df.columns:
+            if isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].cat.reorder_categories(df[col].cat.categories.sort_values())
+        
+        return df
+    
+    def carregar_dados_parquet(self, caminho_arquivo: str, colunas: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Carrega dados de um arquivo Parquet
+        
+        Apenas as colunas pedidas são lidas do disco. Os tipos gravados no arquivo
+        (datas e colunas categóricas) são preservados, sem conversões posteriores.
+        
+        Args:
+            caminho_arquivo: Caminho para o arquivo Parquet
+            colunas: Colunas a serem lidas (None lê todas)
+            
+        Returns:
+            DataFrame com os dados carregados
+        """
+        if not PYARROW_DISPONIVEL:
+            st.error("A leitura de arquivos Parquet requer o pacote 'pyarrow'")
+            return pd.DataFrame()
+        
+        try:
+            arquivo = pq.ParquetFile(caminho_arquivo, memory_map=True)
+            colunas = self._projetar_colunas(colunas, arquivo.schema_arrow.names)
+            return arquivo.read(columns=colunas).to_pandas()
+        except Exception as e:
+            st.error(f"Erro ao carregar arquivo Parquet: {str(e)}")
+            return pd.DataFrame()
+    
+    def carregar_dados_feather(self, caminho_arquivo: str, colunas: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Carrega dados de um arquivo Arrow IPC/Feather (mapeado em memória)
+        
+        Args:
+            caminho_arquivo: Caminho para o arquivo Arrow IPC/Feather
+            colunas: Colunas a serem lidas (None lê todas)
+            
+        Returns:
+            DataFrame com os dados carregados
+        """
+        if not PYARROW_DISPONIVEL:
+            st.error("A leitura de arquivos Arrow/Feather requer o pacote 'pyarrow'")
+            return pd.DataFrame()
+        
+        try:
+            tabela = feather.read_table(caminho_arquivo, memory_map=True)
+            colunas = self._projetar_colunas(colunas, tabela.column_names)
+            if colunas is not None:
+                tabela = tabela.select(colunas)
+            return tabela.to_pandas()
+        except Exception as e:
+            st.error(f"Erro ao carregar arquivo Arrow/Feather: {str(e)}")
+            return pd.DataFrame()
+    
+    def salvar_dados_colunares(self, df: pd.DataFrame, caminho_arquivo: str, formato: str = 'parquet'):
+        """
+        Salva um DataFrame em formato colunar (Parquet ou Arrow IPC/Feather)
+        
+        Útil para converter uma única vez exportações CSV/Excel grandes.
+        
+        Args:
+            df: DataFrame a ser salvo
+            caminho_arquivo: Caminho do arquivo de destino
+            formato: 'parquet' ou 'feather'
+        """
+        if not PYARROW_DISPONIVEL:
+            raise ImportError("A gravação em formato colunar requer o pacote 'pyarrow'")
+        
+        if formato == 'parquet':
+            df.to_parquet(caminho_arquivo, engine='pyarrow', index=False)
+        elif formato == 'feather':
+            df.reset_index(drop=True).to_feather(caminho_arquivo)
+        else:
+            raise ValueError(f"Formato colunar desconhecido: '{formato}'")
+    
+    def carregar_arquivo(self, caminho_arquivo: str, colunas: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Carrega um arquivo escolhendo o leitor pela extensão
+        
+        Args:
+            caminho_arquivo: Caminho para o arquivo (.csv, .parquet, .feather ou .xlsx)
+            colunas: Colunas a serem lidas (None lê todas)
+            
+        Returns:
+            DataFrame com os dados carregados
+        """
+        extensao = os.path.splitext(caminho_arquivo)[1].lower()
+        
+        if extensao == '.csv':
+            return self.carregar_dados_csv(caminho_arquivo, colunas)
+        elif extensao == '.parquet':
+            return self.carregar_dados_parquet(caminho_arquivo, colunas)
+        elif extensao in ('.feather', '.arrow'):
+            return self.carregar_dados_feather(caminho_arquivo, colunas)
+        elif extensao == '.xlsx':
+            return self.carregar_dados_excel(caminho_arquivo)
+        
+        st.error(f"Formato de arquivo não suportado: '{extensao}'")
+        return pd.DataFrame()
+    
+    def carregar_dados_particionados(self, diretorio: str, periodo: Optional[Tuple[date, date]] = None,
+                                     colunas: Optional[List[str]] = None,
+                                     max_workers: Optional[int] = None) -> pd.DataFrame:
+        """
+        Carrega um conjunto de dados particionado por mês (ano=YYYY/mes=MM/arquivos)
+        
+        Apenas as partições que se sobrepõem ao período são lidas, em paralelo.
+        As partições das bordas podem trazer registros fora do período; eles são
+        removidos depois pelo filtro de datas da barra lateral.
+        
+        Args:
+            diretorio: Diretório raiz do conjunto particionado
+            periodo: Tupla (data_inicio, data_fim); None lê todas as partições
+            colunas: Colunas a serem lidas (None lê todas)
+            max_workers: Número de threads de leitura
+            
+        Returns:
+            DataFrame com os dados das partições selecionadas
+        """
+        if max_workers is None:
+            max_workers = DATA_CONFIG['workers_leitura_particoes']
+        
+        particoes = listar_particoes(diretorio)
+        if periodo is not None:
+            data_inicio, data_fim = periodo
+            particoes = [p for p in particoes if p['fim'] >= data_inicio and p['inicio'] <= data_fim]
+        
+        arquivos = [arquivo for particao in particoes for arquivo in particao['arquivos']]
+        if not arquivos:
+            return pd.DataFrame()
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            blocos = list(executor.map(lambda arquivo: self.carregar_arquivo(arquivo, colunas), arquivos))
+        
+        blocos = [bloco for bloco in blocos if not bloco.empty]
+        if not blocos:
+            return pd.DataFrame()
+        return _concatenar_blocos(blocos, list(blocos[0].columns))
+    
+    @staticmethod
+    def _projetar_colunas(colunas: Optional[List[str]], disponiveis: List[str]) -> Optional[List[str]]:
+        """Mantém apenas as colunas pedidas que existem no arquivo"""
+        if colunas is None:
+            return None
+        return [col for col in colunas if col in disponiveis]
+
+
+class _LeituraLimitada(io.RawIOBase):
+    """Visão somente leitura de um arquivo aberto que termina em `limite` bytes"""
+    
+    def __init__(self, arquivo, limite: int):
+        self._arquivo = arquivo
+        self._limite = limite
+    
+    def readable(self) -> bool:
+        return True
+    
+    def seekable(self) -> bool:
+        return True
+    
+    def readinto(self, buffer) -> int:
+        restante = self._limite - self._arquivo.tell()
+        if restante <= 0:
+            return 0
+        dados = self._arquivo.read(min(len(buffer), restante))
+        buffer[:len(dados)] = dados
+        return len(dados)
+    
+    def seek(self, posicao: int, origem: int = io.SEEK_SET) -> int:
+        if origem == io.SEEK_END:
+            return self._arquivo.seek(self._limite + posicao)
+        return self._arquivo.seek(posicao, origem)
+    
+    def tell(self) -> int:
+        return self._arquivo.tell()
+
+
+def _limitar_leitura(arquivo, limite_bytes: Optional[int]) -> Tuple[io.BufferedIOBase, int]:
+    """
+    Restringe a leitura de um arquivo binário aos primeiros `limite_bytes`
+    
+    Args:
+        arquivo: Arquivo aberto em modo binário
+        limite_bytes: Último byte lido (None lê até o fim)
+        
+    Returns:
+        Tupla (arquivo para leitura, tamanho usado no progresso)
+    """
+    if limite_bytes is None:
+        return arquivo, max(os.fstat(arquivo.fileno()).st_size, 1)
+    return io.BufferedReader(_LeituraLimitada(arquivo, limite_bytes)), max(limite_bytes, 1)
+
+
+def _concatenar_blocos(blocos: List[pd.DataFrame], colunas: List[str]) -> pd.DataFrame:
+    """
+    Concatena blocos lidos separadamente preservando as colunas categóricas
+    
+    Cada bloco tem suas próprias categorias; elas são unificadas antes da
+    concatenação para que o resultado continue com dtype 'category'.
+    
+    Args:
+        blocos: DataFrames lidos em sequência
+        colunas: Colunas esperadas (usadas quando o arquivo não tem linhas)
+        
+    Returns:
+        DataFrame único com todos os blocos
+    """
+    if not blocos:
+        return pd.DataFrame(columns=colunas)
+    
+    # Os blocos de entrada não são alterados (podem estar compartilhados)
+    for col in blocos[0].columns:
+        if isinstance(blocos[0][col].dtype, pd.CategoricalDtype):
+            categorias = pd.Index([]).append([
+                bloco[col].cat.categories if isinstance(bloco[col].dtype, pd.CategoricalDtype)
+                else pd.Index(bloco[col].dropna().unique())
+                for bloco in blocos
+            ]).unique().sort_values()
+            tipo = pd.CategoricalDtype(categorias)
+            blocos = [bloco.assign(**{col: bloco[col].astype(tipo)}) for bloco in blocos]
+    
+    return pd.concat(blocos, ignore_index=True)
+
+
+def listar_particoes(diretorio: str) -> List[dict]:
+    """
+    Lista as partições mensais de um conjunto de dados particionado
+    
+    Args:
+        diretorio: Diretório raiz (com subdiretórios ano=YYYY/mes=MM)
+        
+    Returns:
+        Lista de dicionários com 'inicio', 'fim' (datas do mês) e 'arquivos',
+        em ordem cronológica
+    """
+    particoes = []
+    
+    if not os.path.isdir(diretorio):
+        return particoes
+    
+    for nome_ano in os.listdir(diretorio):
+        busca_ano = PADRAO_PARTICAO_ANO.match(nome_ano)
+        caminho_ano = os.path.join(diretorio, nome_ano)
+        if not busca_ano or not os.path.isdir(caminho_ano):
+            continue
+        
+        for nome_mes in os.listdir(caminho_ano):
+            busca_mes = PADRAO_PARTICAO_MES.match(nome_mes)
+            caminho_mes = os.path.join(caminho_ano, nome_mes)
+            if not busca_mes or not os.path.isdir(caminho_mes):
+                continue
+            
+            ano, mes = int(busca_ano.group(1)), int(busca_mes.group(1))
+            arquivos = sorted(
+                os.path.join(caminho_mes, nome) for nome in os.listdir(caminho_mes)
+                if nome.lower().endswith(EXTENSOES_DADOS)
+            )
+            if arquivos:
+                particoes.append({
+                    'inicio': date(ano, mes, 1),
+                    'fim': date(ano, mes, calendar.monthrange(ano, mes)[1]),
+                    'arquivos': arquivos
+                })
+    
+    return sorted(particoes, key=lambda p: p['inicio'])
+
+
+def limites_particoes(diretorio: str) -> Optional[Tuple[date, date]]:
+    """
+    Retorna o intervalo de datas coberto pelas partições (sem ler os arquivos)
+    
+    Args:
+        diretorio: Diretório raiz do conjunto particionado
+        
+    Returns:
+        Tupla (primeiro dia, último dia) ou None se não houver partições
+    """
+    particoes = listar_particoes(diretorio)
+    if not particoes:
+        return None
+    return particoes[0]['inicio'], particoes[-1]['fim']
+
+
+class CarregadorIncremental:
+    """
+    Carregador que acompanha um CSV em crescimento ou um diretório de entrada
+    
+    Após a carga inicial, cada atualização lê apenas o que chegou depois:
+    os bytes acrescentados ao final do CSV ou os arquivos novos do diretório.
+    Uma marca d'água (maior 'Data_Teste' e IDs já vistos nessa data) descarta
+    registros repetidos; registros com data anterior à marca são ignorados.
+    
+    A instância é compartilhada entre sessões (st.cache_resource), por isso
+    o DataFrame exposto nunca é alterado no lugar: cada atualização cria um novo.
+    
+    Cada atualização com registros novos recebe uma nova 'versao_dados', e o
+    motor de filtros, o cubo e os resultados em cache são refeitos sobre os
+    dados acumulados, não estendidos com o sufixo. A recarga só acontece quando
+    o usuário pede ("🔄 Recarregar Dados") e algo chegou, e refazer o motor custa
+    cerca de 0,4 s por milhão de registros (a estimativa que descarta o cubo,
+    ~40 ms). Isso é aceitável para bancadas que acrescentam resultados algumas
+    vezes por hora. Os resultados em cache também não seriam reaproveitáveis
+    como estão, pois os registros novos podem atender a qualquer filtro.
+    """
+    
+    def __init__(self, caminho: str, colunas: Optional[List[str]] = None):
+        self.caminho = caminho
+        self.colunas = colunas
+        self.generator = DataGenerator()
+        self.df = pd.DataFrame()
+        self.versao = 0
+        self._posicao_bytes = 0
+        self._cabecalho: List[str] = []
+        self._arquivos_processados = set()
+        self._marca_data = None
+        self._ids_na_marca = set()
+        self._lock = threading.Lock()
+    
+    @property
+    def eh_diretorio(self) -> bool:
+        return os.path.isdir(self.caminho)
+    
+    def atualizar(self) -> int:
+        """
+        Lê os registros novos e os incorpora aos dados em memória
+        
+        Returns:
+            Número de registros adicionados
+        """
+        with self._lock:
+            if self.eh_diretorio:
+                novos = self._ler_novos_arquivos()
+            else:
+                novos = self._ler_novas_linhas_csv()
+            
+            if novos is None:
+                # Arquivo truncado ou substituído: recomeça do zero
+                self._reiniciar()
+                novos = self._ler_novas_linhas_csv()
+            
+            novos = self._filtrar_pela_marca(novos)
+            if novos.empty:
+                return 0
+            
+            if not pd.api.types.is_datetime64_any_dtype(novos['Data_Teste']):
+                novos['Data_Teste'] = pd.to_datetime(novos['Data_Teste'])
+            novos = normalizar_schema(novos)
+            
+            atributos = dict(self.df.attrs) or dict(novos.attrs)
+            df = _concatenar_blocos([self.df, novos], list(novos.columns)) if not self.df.empty else novos
+            df.attrs = atributos
+            # Nova versão: índices, cubo e cache de resultados são refeitos (ver docstring da classe)
+            df.attrs['versao_dados'] = uuid.uuid4().hex
+            
+            self._atualizar_marca(df)
+            self.df = df
+            self.versao += 1
+            return len(novos)
+    
+    def _reiniciar(self):
+        """Descarta o estado e força uma nova carga completa"""
+        self.df = pd.DataFrame()
+        self._posicao_bytes = 0
+        self._arquivos_processados = set()
+        self._marca_data = None
+        self._ids_na_marca = set()
+    
+    def _ler_novas_linhas_csv(self) -> Optional[pd.DataFrame]:
+        """
+        Lê as linhas acrescentadas ao CSV desde a última leitura
+        
+        Returns:
+            DataFrame com as linhas novas ou None se o arquivo encolheu
+        """
+        tamanho_atual = os.path.getsize(self.caminho)
+        
+        if tamanho_atual < self._posicao_bytes:
+            return None
+        
+        if self._posicao_bytes == 0:
+            # Carga inicial em blocos, apenas até a última linha completa: uma linha
+            # ainda em gravação fica para a próxima leitura, como nas atualizações
+            fim_ultima_linha = self._fim_ultima_linha_completa(tamanho_atual)
+            if fim_ultima_linha == 0:
+                return pd.DataFrame()
+            df = self.generator.carregar_dados_csv(self.caminho, self.colunas, limite_bytes=fim_ultima_linha)
+            self._cabecalho = list(pd.read_csv(self.caminho, nrows=0).columns)
+            self._posicao_bytes = fim_ultima_linha
+            return df
+        
+        with open(self.caminho, 'rb') as arquivo:
+            arquivo.seek(self._posicao_bytes)
+            conteudo = arquivo.read(tamanho_atual - self._posicao_bytes)
+        
+        # Uma linha ainda em gravação (sem quebra de linha) fica para a próxima leitura
+        fim_ultima_linha = conteudo.rfind(b'\n') + 1
+        if fim_ultima_linha == 0:
+            return pd.DataFrame()
+        self._posicao_bytes += fim_ultima_linha
+        
+        usecols = DataGenerator._projetar_colunas(self.colunas, self._cabecalho) or self._cabecalho
+        return pd.read_csv(
+            io.BytesIO(conteudo[:fim_ultima_linha]),
+            header=None,
+            names=self._cabecalho,
+            usecols=usecols,
+            dtype={col: tipo for col, tipo in CSV_CONFIG['tipos_colunas'].items() if col in usecols},
+            parse_dates=[col for col in CSV_CONFIG['colunas_data'] if col in usecols]
+        )
+    
+    def _fim_ultima_linha_completa(self, tamanho: int) -> int:
+        """
+        Posição logo após a última quebra de linha dentro dos primeiros `tamanho` bytes
+        
+        O arquivo é lido de trás para frente em janelas de 64 KiB, até achar uma
+        quebra de linha (linhas longas ocupam várias janelas); 0 se não houver nenhuma.
+        """
+        with open(self.caminho, 'rb') as arquivo:
+            fim = tamanho
+            while fim > 0:
+                inicio = max(fim - 64 * 1024, 0)
+                arquivo.seek(inicio)
+                posicao = arquivo.read(fim - inicio).rfind(b'\n')
+                if posicao >= 0:
+                    return inicio + posicao + 1
+                fim = inicio
+        return 0
+    
+    def _ler_novos_arquivos(self) -> pd.DataFrame:
+        """Lê os arquivos do diretório de entrada que ainda não foram processados"""
+        novos_arquivos = sorted(
+            nome for nome in os.listdir(self.caminho)
+            if nome.lower().endswith(EXTENSOES_DADOS) and nome not in self._arquivos_processados
+        )
+        
+        blocos = []
+        for nome in novos_arquivos:
+            bloco = self.generator.carregar_arquivo(os.path.join(self.caminho, nome), self.colunas)
+            if not bloco.empty:
+                blocos.append(bloco)
+            self._arquivos_processados.add(nome)
+        
+        if not blocos:
+            return pd.DataFrame()
+        return _concatenar_blocos(blocos, list(blocos[0].columns))
+    
+    def _filtrar_pela_marca(self, novos: pd.DataFrame) -> pd.DataFrame:
+        """Mantém apenas registros posteriores à marca d'água"""
+        if novos.empty or self._marca_data is None:
+            return novos
+        
+        datas = pd.to_datetime(novos['Data_Teste'])
+        manter = (datas > self._marca_data) | (
+            (datas == self._marca_data) & ~novos['ID_Transformador'].isin(self._ids_na_marca)
+        )
+        return novos[manter]
+    
+    def _atualizar_marca(self, df: pd.DataFrame):
+        """Recalcula a marca d'água a partir dos dados consolidados"""
+        self._marca_data = df['Data_Teste'].max()
+        self._ids_na_marca = set(df.loc[df['Data_Teste'] == self._marca_data, 'ID_Transformador'])
+
+
+class LeitorCSV:
+    """
+    Leitura de um CSV compartilhada entre sessões, feita fora do cache de dados
+    
+    `st.cache_data` reproduz os elementos criados durante a função e não aceita
+    escrever em elementos criados fora dela; por isso a leitura acontece em
+    `carregar`, chamada pelo dashboard com o seu próprio indicador de progresso.
+    A instância vem de `obter_leitor_csv` e o DataFrame nunca é alterado no lugar.
+    """
+    
+    def __init__(self, caminho: str, colunas: Optional[List[str]] = None):
+        self.caminho = caminho
+        self.colunas = colunas
+        self.df: Optional[pd.DataFrame] = None
+        self._lock = threading.Lock()
+    
+    def carregar(self, progresso: Optional[Callable[[float], None]] = None) -> pd.DataFrame:
+        """
+        Lê o arquivo na primeira chamada; as seguintes retornam o mesmo DataFrame
+        
+        Args:
+            progresso: Função chamada com a fração do arquivo já lida (0 a 1)
+            
+        Returns:
+            DataFrame com os dados
+        """
+        with self._lock:
+            if self.df is None:
+                self.df = _preparar_dados(DataGenerator().carregar_dados_csv(self.caminho, self.colunas, progresso))
+            return self.df
+
+
+@st.cache_resource(max_entries=4)
+def obter_leitor_csv(caminho: str, colunas: Optional[List[str]] = None,
+                     tamanho: int = 0, mtime_ns: int = 0) -> LeitorCSV:
+    """
+    Retorna o leitor do CSV (um por versão do arquivo, compartilhado entre sessões)
+    
+    Args:
+        caminho: Caminho do arquivo CSV
+        colunas: Colunas a serem lidas (None lê todas)
+        tamanho, mtime_ns: Identificam a versão do arquivo (um arquivo alterado ganha um novo leitor)
+        
+    Returns:
+        LeitorCSV ainda sem leitura
+    """
+    return LeitorCSV(caminho, colunas)
+
+
+@st.cache_resource
+def obter_carregador_incremental(caminho: str, colunas: Optional[List[str]] = None) -> CarregadorIncremental:
+    """
+    Retorna o carregador incremental do caminho (um por processo, compartilhado entre sessões)
+    
+    Args:
+        caminho: CSV que recebe novas linhas ou diretório de entrada de arquivos
+        colunas: Colunas a serem lidas (None lê todas)
+        
+    Returns:
+        CarregadorIncremental já com a carga inicial feita
+    """
+    carregador = CarregadorIncremental(caminho, colunas)
+    carregador.atualizar()
+    return carregador
+
+
+def _gerar_bloco_processo(tarefa: tuple) -> pd.DataFrame:
+    """
+    Gera um bloco de dados fictícios (executável em um processo separado)
+    
+    Args:
+        tarefa: Tupla (inicio, num_registros, data_fim, semente_do_bloco)
+        
+    Returns:
+        DataFrame com o bloco gerado
+    """
+    inicio, num_registros, data_fim, semente = tarefa
+    rng = np.random.default_rng(semente)
+    return DataGenerator()._gerar_bloco(inicio, num_registros, data_fim, rng)
+
+
+def normalizar_schema(df: pd.DataFrame, economia_memoria: Optional[bool] = None) -> pd.DataFrame:
+    """
+    Aplica o esquema de tipos do dashboard a um DataFrame carregado
+    
+    - Colunas de texto com poucos valores distintos viram 'category'
+    - Medições viram float32 quando o modo de economia de memória está ativo
+    - Chaves inteiras de dia e mês são derivadas de 'Data_Teste'
+    
+    O uso de memória antes e depois é registrado em df.attrs['relatorio_memoria'].
+    
+    Args:
+        df: DataFrame carregado
+        economia_memoria: Força (ou desativa) a conversão para float32;
+            None usa SCHEMA_CONFIG['economia_memoria']
+        
+    Returns:
+        DataFrame com os tipos normalizados
+    """
+    if df.empty:
+        return df
+    
+    if economia_memoria is None:
+        economia_memoria = SCHEMA_CONFIG['economia_memoria']
+    
+    memoria_antes = df.memory_usage(deep=True).sum()
+    
+    # Colunas categóricas de baixa cardinalidade
+    for col in SCHEMA_CONFIG['colunas_categoricas']:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            if df[col].nunique() / len(df) <= SCHEMA_CONFIG['limite_cardinalidade']:
+                df[col] = df[col].astype('category')
+    
+    # Medições compactas (opcional)
+    if economia_memoria:
+        for col in SCHEMA_CONFIG['colunas_medicoes']:
+            if col in df.columns and pd.api.types.is_float_dtype(df[col]):
+                df[col] = df[col].astype(np.float32)
+    
+    # Chaves de data: dias desde 1970-01-01 e ano*100 + mês (-1 para datas ausentes)
+    if 'Data_Teste' in df.columns:
+        datas = df['Data_Teste'].to_numpy()
+        ausentes = np.isnat(datas)
+        dias = datas.astype('datetime64[D]').astype(np.int64)
+        meses = datas.astype('datetime64[M]').astype(np.int64)
+        df['Chave_Dia'] = np.where(ausentes, -1, dias).astype(np.int32)
+        df['Chave_Mes'] = np.where(ausentes, -1, (meses // 12 + 1970) * 100 + meses % 12 + 1).astype(np.int32)
+    
+    df.attrs['relatorio_memoria'] = {
+        'memoria_antes_mb': float(memoria_antes) / 1024 ** 2,
+        'memoria_depois_mb': float(df.memory_usage(deep=True).sum()) / 1024 ** 2
+    }
+    
+    return df
 
 
 @st.cache_data
-def obter_dados(fonte: str = 'ficticios', caminho_arquivo: str = None) -> pd.DataFrame:
+def obter_dados(fonte: str = 'ficticios', caminho_arquivo: str = None,
+                colunas: Optional[List[str]] = None,
+                periodo: Optional[Tuple[date, date]] = None) -> pd.DataFrame:
     """
     Função principal para obter dados (com cache do Streamlit)
     
     Args:
-        fonte: 'ficticios', 'excel' ou 'csv'
-        caminho_arquivo: Caminho para o arquivo (se fonte não for 'ficticios')
+        fonte: 'ficticios', 'excel', 'csv', 'parquet', 'feather' ou 'particionado'
+        caminho_arquivo: Caminho para o arquivo ou diretório (se fonte não for 'ficticios')
+        colunas: Colunas a serem lidas nas fontes CSV e colunares (None lê todas)
+        periodo: Período usado para descartar partições (fonte 'particionado')
         
     Returns:
         DataFrame com os dados
@@ -195,14 +1093,42 @@ def obter_dados(fonte: str = 'ficticios', caminho_arquivo: str = None) -> pd.Dat
     elif fonte == 'excel' and caminho_arquivo:
         df = generator.carregar_dados_excel(caminho_arquivo)
     elif fonte == 'csv' and caminho_arquivo:
-        df = generator.carregar_dados_csv(caminho_arquivo)
+        # Sem progresso: o dashboard lê CSVs por obter_leitor_csv, fora deste cache
+        df = generator.carregar_dados_csv(caminho_arquivo, colunas)
+    elif fonte == 'parquet' and caminho_arquivo:
+        df = generator.carregar_dados_parquet(caminho_arquivo, colunas)
+    elif fonte == 'feather' and caminho_arquivo:
+        df = generator.carregar_dados_feather(caminho_arquivo, colunas)
+    elif fonte == 'particionado' and caminho_arquivo:
+        df = generator.carregar_dados_particionados(caminho_arquivo, periodo, colunas)
     else:
         st.error("Fonte de dados inválida ou arquivo não especificado")
         return pd.DataFrame()
     
+    return _preparar_dados(df)
+
+
+def _preparar_dados(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converte a data, normaliza o esquema e identifica a carga com uma nova versão
+    
+    Args:
+        df: DataFrame lido da fonte
+        
+    Returns:
+        DataFrame pronto para o dashboard
+    """
     # Garante que a coluna de data está no formato correto
-    if not df.empty and 'Data_Teste' in df.columns:
+    # (fontes colunares já preservam o tipo datetime, dispensando a conversão)
+    if not df.empty and 'Data_Teste' in df.columns and \
+            not pd.api.types.is_datetime64_any_dtype(df['Data_Teste']):
         df['Data_Teste'] = pd.to_datetime(df['Data_Teste'])
     
+    # Tipos compactos e chaves de data pré-calculadas
+    df = normalizar_schema(df)
+    
+    # Identifica esta carga: os índices de filtro são reaproveitados enquanto ela não mudar
+    df.attrs['versao_dados'] = uuid.uuid4().hex
+    
     return df
 
@@ -0,0 +1,207 @@
+"""
+Módulo de banco de dados local
+Este módulo contém o backend SQLite, que persiste os testes com índices e
+executa os filtros da barra lateral diretamente no banco
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import timedelta
+from typing import Tuple, List, Optional, Dict, Any
+import pandas as pd
+import streamlit as st
+from config import DATABASE_CONFIG, COLUNAS_INTERNAS, FILTROS_LISTA, FILTROS_PERIODO, FILTROS_FAIXA
+from data_generator import normalizar_schema
+
+
+class DashboardDatabase:
+    """Classe responsável pelo armazenamento e consulta dos testes em SQLite"""
+    
+    FILTROS_LISTA = FILTROS_LISTA
+    FILTROS_FAIXA = FILTROS_FAIXA
+    
+    def __init__(self, caminho_banco: str):
+        self.caminho_banco = caminho_banco
+        self.tabela = DATABASE_CONFIG['tabela']
+        self._dominio = None
+        self._lock = threading.Lock()
+    
+    def _conectar(self) -> sqlite3.Connection:
+        """Abre uma conexão (uma por chamada, pois o objeto é compartilhado entre threads)"""
+        return sqlite3.connect(self.caminho_banco)
+    
+    def existe(self) -> bool:
+        """Verifica se o banco já contém a tabela de testes"""
+        if not os.path.exists(self.caminho_banco):
+            return False
+        
+        with closing(self._conectar()) as conexao:
+            resultado = conexao.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?", (self.tabela,)
+            ).fetchone()
+        return resultado is not None
+    
+    def importar_dataframe(self, df: pd.DataFrame, substituir: bool = True):
+        """
+        Grava os testes no banco e cria os índices das colunas filtradas
+        
+        Args:
+            df: DataFrame com os dados
+            substituir: Se True, recria a tabela; se False, acrescenta os registros
+        """
+        df = df.drop(columns=[col for col in COLUNAS_INTERNAS if col in df.columns])
+        
+        with self._lock, closing(self._conectar()) as conexao:
+            df.to_sql(
+                self.tabela,
+                conexao,
+                if_exists='replace' if substituir else 'append',
+                index=False,
+                chunksize=DATABASE_CONFIG['tamanho_bloco_importacao']
+            )
+            
+            for coluna in DATABASE_CONFIG['colunas_indexadas']:
+                conexao.execute(
+                    f'CREATE INDEX IF NOT EXISTS "idx_{self.tabela}_{coluna}" '
+                    f'ON "{self.tabela}" ("{coluna}")'
+                )
+            conexao.execute(f'ANALYZE "{self.tabela}"')
+            conexao.commit()
+            
+            self._dominio = None
+    
+    def compilar_filtros(self, filtros: dict) -> Tuple[str, List[Any]]:
+        """
+        Converte o dicionário de filtros em uma cláusula WHERE parametrizada
+        
+        Os valores nunca são interpolados no SQL; apenas os nomes das colunas,
+        que vêm das constantes da classe.
+        
+        Args:
+            filtros: Dicionário com os filtros selecionados
+        
+        Returns:
+            Tupla (cláusula WHERE, lista de parâmetros); a cláusula é vazia sem filtros
+        """
+        condicoes = []
+        parametros = []
+        
+        for chave, coluna in self.FILTROS_LISTA.items():
+            valores = filtros.get(chave)
+            if valores:
+                marcadores = ', '.join('?' * len(valores))
+                condicoes.append(f'"{coluna}" IN ({marcadores})')
+                parametros.extend(_valor_sql(valor) for valor in valores)
+        
+        for chave in FILTROS_PERIODO:
+            if filtros.get(chave) and len(filtros[chave]) == 2:
+                data_inicio, data_fim = filtros[chave]
+                # Datas são gravadas como texto ISO, que ordena como data
+                condicoes.append('"Data_Teste" >= ? AND "Data_Teste" < ?')
+                parametros.extend([data_inicio.isoformat(), (data_fim + timedelta(days=1)).isoformat()])
+        
+        for chave, coluna in self.FILTROS_FAIXA.items():
+            if filtros.get(chave):
+                valor_min, valor_max = filtros[chave]
+                condicoes.append(f'"{coluna}" BETWEEN ? AND ?')
+                parametros.extend([float(valor_min), float(valor_max)])
+        
+        if not condicoes:
+            return '', []
+        return 'WHERE ' + ' AND '.join(condicoes), parametros
+    
+    def consultar(self, filtros: dict, colunas: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Retorna apenas os registros que atendem aos filtros
+        
+        Args:
+            filtros: Dicionário com os filtros selecionados
+            colunas: Colunas a serem retornadas (None retorna todas)
+        
+        Returns:
+            DataFrame filtrado, com o esquema normalizado
+        """
+        where, parametros = self.compilar_filtros(filtros)
+        selecao = ', '.join(f'"{col}"' for col in colunas) if colunas else '*'
+        
+        with closing(self._conectar()) as conexao:
+            df = pd.read_sql_query(
+                f'SELECT {selecao} FROM "{self.tabela}" {where}',
+                conexao,
+                params=parametros,
+                parse_dates=['Data_Teste']
+            )
+        
+        return normalizar_schema(df)
+    
+    def contar(self, filtros: dict) -> int:
+        """
+        Conta os registros que atendem aos filtros sem materializá-los
+        
+        Args:
+            filtros: Dicionário com os filtros selecionados
+        
+        Returns:
+            Número de registros
+        """
+        where, parametros = self.compilar_filtros(filtros)
+        with closing(self._conectar()) as conexao:
+            return conexao.execute(f'SELECT COUNT(*) FROM "{self.tabela}" {where}', parametros).fetchone()[0]
+    
+    def esquema(self) -> pd.DataFrame:
+        """Retorna um DataFrame vazio com as colunas da tabela"""
+        with closing(self._conectar()) as conexao:
+            return pd.read_sql_query(f'SELECT * FROM "{self.tabela}" LIMIT 0', conexao)
+    
+    def obter_dominio(self) -> Dict[str, Any]:
+        """
+        Calcula (uma vez) os valores distintos e limites usados na barra lateral
+        
+        As consultas DISTINCT usam os índices e não leem a tabela inteira.
+        
+        Returns:
+            Dicionário com 'valores' (coluna -> lista ordenada) e
+            'limites' (coluna -> (mínimo, máximo))
+        """
+        if self._dominio is not None:
+            return self._dominio
+        
+        with closing(self._conectar()) as conexao:
+            valores = {}
+            for coluna in dict.fromkeys(self.FILTROS_LISTA.values()):
+                linhas = conexao.execute(
+                    f'SELECT DISTINCT "{coluna}" FROM "{self.tabela}" '
+                    f'WHERE "{coluna}" IS NOT NULL ORDER BY "{coluna}"'
+                ).fetchall()
+                valores[coluna] = [linha[0] for linha in linhas]
+            
+            limites = {}
+            for coluna in list(self.FILTROS_FAIXA.values()) + ['Data_Teste']:
+                limites[coluna] = conexao.execute(
+                    f'SELECT MIN("{coluna}"), MAX("{coluna}") FROM "{self.tabela}"'
+                ).fetchone()
+        
+        limites['Data_Teste'] = tuple(pd.Timestamp(valor) for valor in limites['Data_Teste'])
+        self._dominio = {'valores': valores, 'limites': limites}
+        return self._dominio
+
+
+def _valor_sql(valor: Any) -> Any:
+    """Converte escalares do NumPy/pandas em tipos aceitos pelo sqlite3"""
+    return valor.item() if hasattr(valor, 'item') else valor
+
+
+@st.cache_resource
+def obter_banco(caminho_banco: str) -> DashboardDatabase:
+    """
+    Retorna o banco de dados local (uma instância por processo, compartilhada entre sessões)
+    
+    Args:
+        caminho_banco: Caminho do arquivo SQLite
+    
+    Returns:
+        DashboardDatabase
+    """
+    return DashboardDatabase(caminho_banco)
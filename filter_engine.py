@@ -0,0 +1,906 @@
+"""
+Módulo do motor de filtros
+Este módulo contém os índices construídos uma vez por conjunto de dados,
+usados pelos filtros da barra lateral para evitar varreduras repetidas
+"""
+
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Callable, Dict, Hashable, List, Optional, Tuple, Union
+import hashlib
+import json
+import threading
+import numpy as np
+import pandas as pd
+import streamlit as st
+from config import (
+    FILTROS_LISTA, FILTROS_PERIODO, FILTROS_FAIXA, FILTROS_CACHE_CONFIG, FILTROS_PLANO_CONFIG,
+    SCHEMA_CONFIG
+)
+from filter_expression import compilar_expressao, normalizar_expressao
+
+
+class IndiceBitmap:
+    """
+    Índice bitmap de uma coluna: um bitset (np.packbits) por valor distinto
+    
+    A seleção de vários valores é o OU dos bitsets correspondentes; cada
+    bitset ocupa 1 bit por linha.
+    """
+    
+    def __init__(self, serie: pd.Series):
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            codigos = serie.cat.codes.to_numpy()
+            valores = serie.cat.categories
+        else:
+            codigos, valores = pd.factorize(serie, sort=True)
+        
+        self.num_linhas = len(serie)
+        self.valores = list(valores)
+        self.posicoes = {valor: i for i, valor in enumerate(valores)}
+        self.bitsets = [np.packbits(codigos == i) for i in range(len(valores))]
+        # Linhas por valor, usadas pelo planejador para estimar a seletividade
+        self.contagens = np.bincount(codigos[codigos >= 0], minlength=len(valores))
+        # Linhas sem valor não pertencem a nenhum bitset
+        self.tem_ausentes = bool((codigos < 0).any())
+    
+    def selecionar(self, valores: list) -> Optional[np.ndarray]:
+        """
+        Retorna o bitset das linhas cujo valor está na lista
+        
+        Args:
+            valores: Valores selecionados
+        
+        Returns:
+            Bitset compactado ou None quando a seleção cobre todas as linhas
+        """
+        indices = {self.posicoes[valor] for valor in valores if valor in self.posicoes}
+        
+        if len(indices) == len(self.bitsets) and not self.tem_ausentes:
+            return None
+        if not indices:
+            return np.zeros((self.num_linhas + 7) // 8, dtype=np.uint8)
+        
+        return np.bitwise_or.reduce([self.bitsets[i] for i in indices])
+    
+    def estimar(self, valores: list) -> float:
+        """Fração das linhas cujo valor está na lista (exata, pelas contagens)"""
+        indices = [self.posicoes[valor] for valor in set(valores) if valor in self.posicoes]
+        return float(self.contagens[indices].sum()) / max(self.num_linhas, 1)
+
+
+class IndiceDatas:
+    """
+    Índice ordenado de uma coluna de datas
+    
+    Guarda as posições das linhas ordenadas pela data e as datas ordenadas
+    (int64, em ns); um intervalo de datas vira um trecho contíguo dessas
+    posições, localizado por busca binária (np.searchsorted).
+    """
+    
+    def __init__(self, serie: pd.Series):
+        datas = serie.to_numpy(dtype='datetime64[ns]').view(np.int64)
+        self.datas = datas
+        # Datas ausentes (NaT) viram o menor int64 e ficam no início
+        self.ordem = np.argsort(datas, kind='stable')
+        self.datas_ordenadas = datas[self.ordem]
+        # Dados já em ordem cronológica: o trecho é um intervalo de posições
+        self.ja_ordenado = bool((self.ordem == np.arange(len(datas))).all())
+    
+    def posicoes_intervalo(self, inicio: Optional[Union[date, pd.Timestamp]] = None,
+                           fim: Optional[Union[date, pd.Timestamp]] = None) -> np.ndarray:
+        """
+        Retorna as posições (em ordem crescente) das linhas com inicio <= data < fim
+        
+        Args:
+            inicio: Limite inferior inclusivo (None: sem limite)
+            fim: Limite superior exclusivo (None: sem limite)
+        
+        Returns:
+            Array de posições das linhas
+        """
+        esquerda, direita = self._trecho(inicio, fim)
+        if self.ja_ordenado or direita - esquerda == len(self.ordem):
+            return np.arange(esquerda, max(esquerda, direita))
+        return np.sort(self.ordem[esquerda:direita])
+    
+    def _trecho(self, inicio: Optional[Union[date, pd.Timestamp]],
+                fim: Optional[Union[date, pd.Timestamp]]) -> Tuple[int, int]:
+        """Início e fim (exclusivo) do trecho das datas ordenadas com inicio <= data < fim"""
+        if inicio is None:
+            # Sem limite inferior, as datas ausentes (no início) continuam excluídas
+            esquerda = np.searchsorted(self.datas_ordenadas, np.iinfo(np.int64).min, 'right')
+        else:
+            esquerda = np.searchsorted(self.datas_ordenadas, _para_ns(inicio), 'left')
+        direita = len(self.datas_ordenadas) if fim is None else \
+            np.searchsorted(self.datas_ordenadas, _para_ns(fim), 'left')
+        return int(esquerda), int(direita)
+    
+    def limites(self) -> Tuple[pd.Timestamp, pd.Timestamp]:
+        """Menor e maior data (ignorando datas ausentes), lidas nas pontas do índice"""
+        esquerda, direita = self._trecho(None, None)
+        if esquerda >= direita:
+            return pd.NaT, pd.NaT
+        return pd.Timestamp(self.datas_ordenadas[esquerda]), pd.Timestamp(self.datas_ordenadas[direita - 1])
+    
+    def contar_periodo(self, data_inicio: date, data_fim: date) -> int:
+        """Número de linhas entre duas datas do calendário (duas buscas binárias, sem varredura)"""
+        esquerda, direita = self._trecho(data_inicio, pd.Timestamp(data_fim) + timedelta(days=1))
+        return max(0, direita - esquerda)
+    
+    def posicoes_periodo(self, data_inicio: date, data_fim: date) -> np.ndarray:
+        """Posições das linhas entre duas datas do calendário (ambas inclusivas)"""
+        return self.posicoes_intervalo(data_inicio, pd.Timestamp(data_fim) + timedelta(days=1))
+    
+    def filtrar_periodo(self, posicoes: np.ndarray, data_inicio: date, data_fim: date) -> np.ndarray:
+        """Mantém, entre as posições informadas, as linhas entre duas datas (ambas inclusivas)"""
+        datas = self.datas[posicoes]
+        fim = _para_ns(pd.Timestamp(data_fim) + timedelta(days=1))
+        return posicoes[(datas >= _para_ns(data_inicio)) & (datas < fim)]
+
+
+def _para_ns(valor: Union[date, pd.Timestamp]) -> int:
+    """Converte uma data em nanossegundos desde a época (mesma escala do índice)"""
+    return pd.Timestamp(valor).as_unit('ns').value
+
+
+class MotorFiltros:
+    """Classe responsável pelos índices de filtro de um conjunto de dados"""
+    
+    def __init__(self, df: pd.DataFrame):
+        """
+        Args:
+            df: DataFrame completo (não é alterado nem copiado)
+        """
+        self.num_linhas = len(df)
+        self.versao = df.attrs.get('versao_dados')
+        self.indices: Dict[str, IndiceBitmap] = {
+            coluna: IndiceBitmap(df[coluna])
+            for coluna in FILTROS_LISTA.values() if coluna in df.columns
+        }
+        self.indice_datas = IndiceDatas(df['Data_Teste']) if 'Data_Teste' in df.columns else None
+        
+        # Colunas numéricas (faixas e expressões): arrays do próprio DataFrame (sem cópia)
+        self.colunas_numericas = {
+            coluna: np.ascontiguousarray(df[coluna].to_numpy())
+            for coluna in dict.fromkeys(list(FILTROS_FAIXA.values()) + SCHEMA_CONFIG['colunas_medicoes'])
+            if coluna in df.columns and pd.api.types.is_numeric_dtype(df[coluna])
+        }
+        # Colunas dos filtros de faixa e seus limites, para ignorar faixas que
+        # cobrem a coluna inteira
+        self.colunas_faixa = {
+            coluna: self.colunas_numericas[coluna]
+            for coluna in FILTROS_FAIXA.values() if coluna in self.colunas_numericas
+        }
+        self.limites_faixa = {
+            coluna: (np.nanmin(valores), np.nanmax(valores), bool(np.isnan(valores).any()))
+            for coluna, valores in self.colunas_faixa.items()
+        }
+        self._dominio = None
+        
+        # Histogramas das colunas numéricas (bordas e fração acumulada de linhas) para o planejador
+        self.histogramas = {
+            coluna: _histograma(valores, self.num_linhas)
+            for coluna, valores in self.colunas_numericas.items()
+        }
+    
+    def obter_dominio(self) -> Dict[str, dict]:
+        """
+        Calcula (uma vez) os valores distintos, contagens e limites usados na barra lateral
+        
+        Tudo vem dos índices já construídos, sem novas varreduras do DataFrame;
+        o formato é o mesmo de `DashboardDatabase.obter_dominio`.
+        
+        Returns:
+            Dicionário com 'valores' (coluna -> lista ordenada), 'contagens'
+            (coluna -> {valor: linhas}) e 'limites' (coluna -> (mínimo, máximo))
+        """
+        if self._dominio is not None:
+            return self._dominio
+        
+        valores = {}
+        contagens = {}
+        for coluna, indice in self.indices.items():
+            presentes = {
+                valor: int(contagem)
+                for valor, contagem in zip(indice.valores, indice.contagens) if contagem > 0
+            }
+            valores[coluna] = sorted(presentes)
+            contagens[coluna] = presentes
+        
+        limites = {
+            coluna: (valor_min, valor_max)
+            for coluna, (valor_min, valor_max, _) in self.limites_faixa.items()
+        }
+        if self.indice_datas is not None:
+            limites['Data_Teste'] = self.indice_datas.limites()
+        
+        self._dominio = {'valores': valores, 'contagens': contagens, 'limites': limites}
+        return self._dominio
+    
+    def faixas_ativas(self, filtros: dict) -> List[Tuple[np.ndarray, float, float]]:
+        """
+        Lista os filtros de faixa que de fato restringem os dados
+        
+        Args:
+            filtros: Dicionário com os filtros selecionados
+        
+        Returns:
+            Lista de tuplas (valores da coluna, mínimo, máximo)
+        """
+        faixas = []
+        for chave, coluna in FILTROS_FAIXA.items():
+            if not filtros.get(chave) or coluna not in self.colunas_faixa:
+                continue
+            
+            valor_min, valor_max = filtros[chave]
+            coluna_min, coluna_max, tem_ausentes = self.limites_faixa[coluna]
+            if valor_min <= coluna_min and valor_max >= coluna_max and not tem_ausentes:
+                continue
+            faixas.append((self.colunas_faixa[coluna], valor_min, valor_max))
+        return faixas
+    
+    def posicoes(self, filtros: dict) -> Optional[np.ndarray]:
+        """
+        Resolve todos os filtros da barra lateral em uma única seleção de linhas
+        
+        Os predicados são ordenados pela seletividade estimada (ver `planejar`)
+        e avaliados nos índices e nos arrays originais das colunas.
+        
+        Args:
+            filtros: Dicionário com os filtros selecionados
+        
+        Returns:
+            Posições (em ordem crescente) das linhas selecionadas ou None
+            se nenhum filtro restringe os dados
+        """
+        return self.executar(self.planejar(self.entradas(filtros)))
+    
+    def estimar(self, chave: str, valor: tuple) -> float:
+        """
+        Estima a fração das linhas aceitas por um predicado
+        
+        Listas e período são exatos (contagens por valor e busca binária);
+        faixas usam o histograma da coluna, com interpolação linear, e
+        expressões combinam as estimativas de seus termos.
+        """
+        if chave in FILTROS_LISTA:
+            return self.indices[FILTROS_LISTA[chave]].estimar(list(valor))
+        if chave in FILTROS_PERIODO:
+            return self.indice_datas.contar_periodo(*valor) / max(self.num_linhas, 1)
+        if chave == 'expressao':
+            return compilar_expressao(valor).raiz.estimar(self)
+        
+        bordas, acumulado = self.histogramas[FILTROS_FAIXA[chave]]
+        valor_min, valor_max = valor
+        return max(0.0, float(np.interp(valor_max, bordas, acumulado) - np.interp(valor_min, bordas, acumulado)))
+    
+    def custo_bitset(self, chave: str, seletividade: float) -> float:
+        """Custo estimado (em elementos visitados) de avaliar um predicado sobre todas as linhas"""
+        if chave in FILTROS_LISTA:
+            return self.num_linhas / 8
+        if chave in FILTROS_PERIODO:
+            return seletividade * self.num_linhas + self.num_linhas / 8
+        return 2.0 * self.num_linhas
+    
+    def planejar(self, entradas: Dict[str, tuple]) -> dict:
+        """
+        Monta o plano de avaliação dos predicados
+        
+        Predicados que não restringem os dados são descartados e os demais são
+        ordenados do mais para o menos seletivo. Duas estratégias são comparadas
+        por um custo estimado em elementos visitados:
+        
+        - 'posicoes': o predicado mais seletivo é resolvido pelo índice (bitset,
+          busca binária ou varredura da faixa) e os seguintes são avaliados só
+          nas posições que restam;
+        - 'mascara': bitsets compactados das listas e do período intersectados
+          e faixas comparadas sobre a coluna inteira, em uma única máscara.
+        
+        Args:
+            entradas: Predicados, como em `entradas`
+        
+        Returns:
+            Dicionário com 'estrategia', 'predicados' (lista de tuplas
+            (chave, valor, seletividade)) e os custos estimados
+        """
+        predicados = []
+        for chave, valor in entradas.items():
+            if chave in FILTROS_FAIXA:
+                if not self.faixas_ativas({chave: valor}):
+                    continue
+                seletividade = self.estimar(chave, valor)
+            elif chave == 'expressao':
+                # Estimativa aproximada: a expressão nunca é descartada
+                seletividade = min(self.estimar(chave, valor), 1.0)
+            else:
+                seletividade = self.estimar(chave, valor)
+                if seletividade >= 1.0:
+                    continue
+            predicados.append((chave, valor, seletividade))
+        predicados.sort(key=lambda predicado: predicado[2])
+        
+        n = self.num_linhas
+        custo_mascara = 2.0 * n + sum(self.custo_bitset(chave, sel) for chave, _, sel in predicados)
+        
+        custo_posicoes = 0.0
+        if predicados:
+            chave, _, restante = predicados[0]
+            custo_posicoes = 2.0 * restante * n if chave in FILTROS_PERIODO else \
+                self.custo_bitset(chave, restante) + 2.0 * n
+            for _, _, seletividade in predicados[1:]:
+                custo_posicoes += restante * n * FILTROS_PLANO_CONFIG['custo_relativo_posicoes']
+                restante *= seletividade
+        
+        return {
+            'estrategia': 'posicoes' if custo_posicoes < custo_mascara else 'mascara',
+            'predicados': predicados,
+            'custo_posicoes': custo_posicoes,
+            'custo_mascara': custo_mascara
+        }
+    
+    def executar(self, plano: dict) -> Optional[np.ndarray]:
+        """
+        Executa um plano montado por `planejar`
+        
+        Returns:
+            Posições (em ordem crescente) das linhas selecionadas ou None
+            se nenhum predicado restringe os dados
+        """
+        predicados = plano['predicados']
+        if not predicados:
+            return None
+        
+        if plano['estrategia'] == 'posicoes':
+            chave, valor, _ = predicados[0]
+            posicoes = self.posicoes_predicado(chave, valor)
+            # Faixas consecutivas no plano são avaliadas juntas, em uma passada
+            faixas = []
+            for chave, valor, _ in predicados[1:] + [(None, None, None)]:
+                if chave in FILTROS_FAIXA:
+                    faixas.extend(self.faixas_ativas({chave: valor}))
+                    continue
+                if faixas and len(posicoes):
+                    posicoes = posicoes[avaliar_faixas(faixas, np.ones(len(posicoes), dtype=bool), posicoes)]
+                faixas = []
+                if chave is not None and len(posicoes):
+                    posicoes = self.filtrar_predicado(chave, valor, posicoes)
+            return posicoes
+        
+        bitset = None
+        faixas = []
+        for chave, valor, _ in predicados:
+            if chave in FILTROS_FAIXA:
+                faixas.extend(self.faixas_ativas({chave: valor}))
+                continue
+            selecao = self.bitset_predicado(chave, valor)
+            if selecao is not None:
+                bitset = selecao if bitset is None else np.bitwise_and(bitset, selecao)
+        
+        if bitset is None:
+            mascara = np.ones(self.num_linhas, dtype=bool)
+        else:
+            mascara = np.unpackbits(bitset, count=self.num_linhas).view(bool)
+        return np.flatnonzero(avaliar_faixas(faixas, mascara))
+    
+    def entradas(self, filtros: dict) -> Dict[str, tuple]:
+        """
+        Extrai os predicados que o motor sabe avaliar, em forma comparável
+        
+        Args:
+            filtros: Dicionário com os filtros selecionados
+        
+        Returns:
+            Dicionário chave do filtro -> valor (conjunto de valores, período ou faixa)
+        """
+        entradas = {}
+        for chave, coluna in FILTROS_LISTA.items():
+            if filtros.get(chave) and coluna in self.indices:
+                entradas[chave] = frozenset(filtros[chave])
+        for chave in FILTROS_PERIODO:
+            if filtros.get(chave) and len(filtros[chave]) == 2 and self.indice_datas is not None:
+                entradas[chave] = tuple(filtros[chave])
+        for chave, coluna in FILTROS_FAIXA.items():
+            if filtros.get(chave) and coluna in self.colunas_faixa:
+                entradas[chave] = tuple(filtros[chave])
+        if filtros.get('expressao'):
+            entradas['expressao'] = normalizar_expressao(filtros['expressao'])
+        return entradas
+    
+    def bitset_predicado(self, chave: str, valor: tuple) -> Optional[np.ndarray]:
+        """
+        Avalia um único predicado sobre todas as linhas
+        
+        Args:
+            chave: Chave do filtro (lista, período ou faixa)
+            valor: Valor do predicado, como em `entradas`
+        
+        Returns:
+            Bitset compactado das linhas aceitas ou None se o predicado não restringe os dados
+        """
+        if chave in FILTROS_LISTA:
+            return self.indices[FILTROS_LISTA[chave]].selecionar(list(valor))
+        
+        if chave in FILTROS_PERIODO:
+            posicoes = self.indice_datas.posicoes_periodo(*valor)
+            if len(posicoes) == self.num_linhas:
+                return None
+            mascara = np.zeros(self.num_linhas, dtype=bool)
+            mascara[posicoes] = True
+            return np.packbits(mascara)
+        
+        if chave == 'expressao':
+            return np.packbits(compilar_expressao(valor).raiz.mascara(self))
+        
+        faixas = self.faixas_ativas({chave: valor})
+        if not faixas:
+            return None
+        return np.packbits(avaliar_faixas(faixas, np.ones(self.num_linhas, dtype=bool)))
+    
+    def posicoes_predicado(self, chave: str, valor: tuple) -> np.ndarray:
+        """
+        Resolve um único predicado pelo índice correspondente
+        
+        Returns:
+            Posições (em ordem crescente) das linhas aceitas pelo predicado
+        """
+        if chave in FILTROS_PERIODO:
+            return self.indice_datas.posicoes_periodo(*valor)
+        
+        bitset = self.bitset_predicado(chave, valor)
+        if bitset is None:
+            return np.arange(self.num_linhas)
+        return np.flatnonzero(np.unpackbits(bitset, count=self.num_linhas).view(bool))
+    
+    def filtrar_predicado(self, chave: str, valor: tuple, posicoes: np.ndarray) -> np.ndarray:
+        """
+        Avalia um único predicado apenas nas posições informadas
+        
+        Args:
+            chave: Chave do filtro (lista, período ou faixa)
+            valor: Valor do predicado, como em `entradas`
+            posicoes: Posições (em ordem crescente) das linhas candidatas
+        
+        Returns:
+            Posições, entre as candidatas, das linhas aceitas pelo predicado
+        """
+        if chave in FILTROS_LISTA:
+            return posicoes[self.mascara_lista(FILTROS_LISTA[chave], list(valor), posicoes)]
+        
+        if chave in FILTROS_PERIODO:
+            return self.indice_datas.filtrar_periodo(posicoes, *valor)
+        
+        if chave == 'expressao':
+            return posicoes[compilar_expressao(valor).raiz.mascara(self, posicoes)]
+        
+        faixas = self.faixas_ativas({chave: valor})
+        if not faixas:
+            return posicoes
+        return posicoes[avaliar_faixas(faixas, np.ones(len(posicoes), dtype=bool), posicoes)]
+    
+    def mascara_lista(self, coluna: str, valores: list, posicoes: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Máscara das linhas cujo valor (coluna indexada) está na lista
+        
+        Args:
+            coluna: Coluna com índice bitmap
+            valores: Valores aceitos
+            posicoes: Posições avaliadas (None: todas as linhas)
+        
+        Returns:
+            Máscara booleana, uma posição por linha avaliada
+        """
+        bitset = self.indices[coluna].selecionar(valores)
+        tamanho = self.num_linhas if posicoes is None else len(posicoes)
+        if bitset is None:
+            return np.ones(tamanho, dtype=bool)
+        if posicoes is None:
+            return np.unpackbits(bitset, count=self.num_linhas).view(bool)
+        bits = (bitset[posicoes >> 3] >> (7 - (posicoes & 7)).astype(np.uint8)) & 1
+        return bits.view(bool)
+    
+    def _valores_coluna(self, coluna: str) -> np.ndarray:
+        """Array de uma coluna numérica ou das datas (int64, em ns)"""
+        if coluna == 'Data_Teste':
+            return self.indice_datas.datas
+        return self.colunas_numericas[coluna]
+    
+    def mascara_comparacao(self, coluna: str, operador: str, valor,
+                           posicoes: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Máscara de uma comparação entre uma coluna (numérica ou de datas) e uma constante
+        
+        Args:
+            coluna: Coluna numérica ou 'Data_Teste' (constante em ns)
+            operador: '==', '!=', '<', '<=', '>' ou '>='
+            valor: Constante comparada
+            posicoes: Posições avaliadas (None: todas as linhas)
+        
+        Returns:
+            Máscara booleana, uma posição por linha avaliada
+        """
+        valores = self._valores_coluna(coluna)
+        if posicoes is not None:
+            valores = valores[posicoes]
+        mascara = OPERADORES_COMPARACAO[operador](valores, valor)
+        if coluna == 'Data_Teste':
+            # Datas ausentes (NaT) nunca atendem a uma comparação
+            mascara &= valores != np.iinfo(np.int64).min
+        return mascara
+    
+    def estimar_comparacao(self, coluna: str, operador: str, valor) -> float:
+        """Fração estimada das linhas que atendem a uma comparação (índice de datas ou histograma)"""
+        if coluna == 'Data_Teste':
+            datas = self.indice_datas.datas_ordenadas
+            ausentes = np.searchsorted(datas, np.iinfo(np.int64).min, 'right')
+            antes = (np.searchsorted(datas, valor, 'left') - ausentes) / max(self.num_linhas, 1)
+            ate = (np.searchsorted(datas, valor, 'right') - ausentes) / max(self.num_linhas, 1)
+            validas = (len(datas) - ausentes) / max(self.num_linhas, 1)
+        else:
+            bordas, acumulado = self.histogramas[coluna]
+            antes = ate = float(np.interp(valor, bordas, acumulado))
+            validas = float(acumulado[-1])
+        
+        if operador == '<':
+            return antes
+        if operador == '<=':
+            return ate
+        if operador == '>':
+            return validas - ate
+        if operador == '>=':
+            return validas - antes
+        if operador == '==':
+            # Igualdade em coluna contínua: o histograma não resolve, estimativa fixa de 1%
+            return max(ate - antes, 0.01 * validas)
+        return validas
+
+
+# Operadores das comparações das expressões de filtro
+OPERADORES_COMPARACAO = {
+    '==': np.equal, '!=': np.not_equal, '<': np.less,
+    '<=': np.less_equal, '>': np.greater, '>=': np.greater_equal
+}
+
+
+def avaliar_faixas(faixas: List[Tuple[np.ndarray, float, float]], mascara: np.ndarray,
+                   posicoes: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Intersecta na máscara várias faixas [mínimo, máximo] de colunas numéricas
+    
+    As linhas são percorridas uma vez, em blocos que cabem no cache: em cada
+    bloco todas as faixas são testadas com ufuncs do NumPy escrevendo em
+    buffers reaproveitados (`out=`), sem arrays temporários por comparação.
+    
+    Args:
+        faixas: Lista de tuplas (valores da coluna, mínimo, máximo)
+        mascara: Máscara pré-alocada (alterada no lugar), uma posição por linha avaliada
+        posicoes: Posições das linhas avaliadas (None: todas as linhas, em ordem)
+    
+    Returns:
+        A própria máscara
+    """
+    tamanho_bloco = FILTROS_PLANO_CONFIG['tamanho_bloco_faixas']
+    num_linhas = len(mascara)
+    comparacao = np.empty(min(tamanho_bloco, num_linhas), dtype=bool)
+    # Buffers para os valores lidos por posição (um por tipo de coluna)
+    buffers = {}
+    if posicoes is not None:
+        for valores, _, _ in faixas:
+            if valores.dtype not in buffers:
+                buffers[valores.dtype] = np.empty(len(comparacao), dtype=valores.dtype)
+    
+    for inicio in range(0, num_linhas, tamanho_bloco):
+        fim = min(inicio + tamanho_bloco, num_linhas)
+        trecho = mascara[inicio:fim]
+        temporario = comparacao[:fim - inicio]
+        for valores, valor_min, valor_max in faixas:
+            if posicoes is None:
+                bloco = valores[inicio:fim]
+            else:
+                bloco = np.take(valores, posicoes[inicio:fim], out=buffers[valores.dtype][:fim - inicio])
+            np.greater_equal(bloco, valor_min, out=temporario)
+            np.logical_and(trecho, temporario, out=trecho)
+            np.less_equal(bloco, valor_max, out=temporario)
+            np.logical_and(trecho, temporario, out=trecho)
+    return mascara
+
+
+def _histograma(valores: np.ndarray, num_linhas: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Bordas do histograma de uma coluna e fração acumulada das linhas até cada borda"""
+    validos = valores[~np.isnan(valores)]
+    if len(validos) == 0:
+        return np.array([0.0, 1.0]), np.zeros(2)
+    contagens, bordas = np.histogram(validos, bins=FILTROS_PLANO_CONFIG['bins_histograma'])
+    acumulado = np.concatenate([[0], np.cumsum(contagens)]) / max(num_linhas, 1)
+    return bordas, acumulado
+
+
+def descrever_plano(plano: Optional[dict]) -> str:
+    """
+    Descreve um plano de avaliação dos filtros em uma linha (para depuração)
+    
+    Args:
+        plano: Plano montado por `MotorFiltros.planejar` ou registrado pela avaliação incremental
+    
+    Returns:
+        Texto com a estratégia e os predicados na ordem de avaliação
+    """
+    if not plano:
+        return "sem plano"
+    if plano['estrategia'] == 'cache':
+        return "cache: resultado reaproveitado"
+    passos = " -> ".join(
+        f"{chave} ({seletividade:.1%})" for chave, _, seletividade in plano['predicados']
+    ) or "nenhum filtro restringe os dados"
+    return f"{plano['estrategia']}: {passos}"
+
+
+def _restringe(chave: str, anterior: Optional[tuple], novo: tuple) -> bool:
+    """Indica se o novo valor de um predicado só pode remover linhas do resultado anterior"""
+    if anterior is None:
+        return True
+    if chave == 'expressao':
+        return False
+    if chave in FILTROS_LISTA:
+        return novo <= anterior
+    return novo[0] >= anterior[0] and novo[1] <= anterior[1]
+
+
+class AvaliacaoIncremental:
+    """
+    Reavaliação incremental dos filtros de uma sessão
+    
+    Guarda o último resultado e o bitset de cada predicado. Quando só um
+    predicado muda e a mudança apenas estreita a seleção (faixa menor,
+    menos valores, período contido no anterior), ele é avaliado somente nas
+    linhas do resultado anterior; nos demais casos, só os predicados
+    alterados são recalculados e os bitsets são intersectados de novo, a
+    menos que o plano do motor (`MotorFiltros.planejar`) saia mais barato.
+    Os bitsets são calculados sob demanda, na primeira reintersecção.
+    
+    O plano usado na última avaliação fica em `plano` (para depuração).
+    """
+    
+    def __init__(self, motor: MotorFiltros):
+        self.motor = motor
+        self.entradas: Optional[Dict[str, tuple]] = None
+        self.resultado: Optional[np.ndarray] = None
+        self.bitsets: Dict[str, Optional[np.ndarray]] = {}
+        self.plano: Optional[dict] = None
+    
+    def posicoes(self, filtros: dict) -> Optional[np.ndarray]:
+        """
+        Resolve os filtros, reaproveitando o estado anterior e o cache de resultados
+        
+        Args:
+            filtros: Dicionário com os filtros selecionados
+        
+        Returns:
+            Posições (em ordem crescente) das linhas selecionadas ou None
+            se nenhum filtro restringe os dados
+        """
+        entradas = self.motor.entradas(filtros)
+        if entradas == self.entradas:
+            return self.resultado
+        
+        if self.motor.versao is None:
+            return self._avaliar(entradas)
+        
+        resultado = obter_cache_resultados().obter(
+            (self.motor.versao, impressao_filtros(filtros)), lambda: self._avaliar(entradas)
+        )
+        if entradas != self.entradas:
+            # Resultado vindo do cache: os bitsets dos predicados alterados ficam pendentes
+            self.plano = {'estrategia': 'cache', 'predicados': []}
+            self._registrar(entradas, resultado)
+        return resultado
+    
+    def _avaliar(self, entradas: Dict[str, tuple]) -> Optional[np.ndarray]:
+        """Calcula o resultado a partir do estado anterior e atualiza o estado"""
+        if self.entradas is None:
+            self.plano = self.motor.planejar(entradas)
+            resultado = self.motor.executar(self.plano)
+        else:
+            alteradas = [
+                chave for chave in set(entradas) | set(self.entradas)
+                if entradas.get(chave) != self.entradas.get(chave)
+            ]
+            chave = alteradas[0]
+            if len(alteradas) == 1 and chave in entradas and \
+                    _restringe(chave, self.entradas.get(chave), entradas[chave]):
+                anterior = self.resultado if self.resultado is not None else np.arange(self.motor.num_linhas)
+                resultado = self.motor.filtrar_predicado(chave, entradas[chave], anterior)
+                if len(resultado) == self.motor.num_linhas:
+                    resultado = None
+                self.plano = {
+                    'estrategia': 'refinamento',
+                    'predicados': [(chave, entradas[chave], self.motor.estimar(chave, entradas[chave]))]
+                }
+            else:
+                self.plano = self.motor.planejar(entradas)
+                # Reintersecção: só os bitsets alterados ou ainda não calculados custam
+                custo_reintersecao = 2.0 * self.motor.num_linhas + sum(
+                    self.motor.custo_bitset(chave, seletividade)
+                    for chave, _, seletividade in self.plano['predicados']
+                    if chave in alteradas or chave not in self.bitsets
+                )
+                if custo_reintersecao <= min(self.plano['custo_posicoes'], self.plano['custo_mascara']):
+                    self.plano['estrategia'] = 'reintersecao'
+                    resultado = self._reintersectar(entradas, alteradas)
+                else:
+                    resultado = self.motor.executar(self.plano)
+        
+        self._registrar(entradas, resultado)
+        return resultado
+    
+    def _reintersectar(self, entradas: Dict[str, tuple], alteradas: List[str]) -> Optional[np.ndarray]:
+        """Recalcula os bitsets alterados ou pendentes e intersecta todos"""
+        for chave in alteradas:
+            self.bitsets.pop(chave, None)
+        
+        bitset = None
+        for chave, valor in entradas.items():
+            if chave not in self.bitsets:
+                self.bitsets[chave] = self.motor.bitset_predicado(chave, valor)
+            if self.bitsets[chave] is not None:
+                bitset = self.bitsets[chave] if bitset is None else np.bitwise_and(bitset, self.bitsets[chave])
+        
+        if bitset is None:
+            return None
+        return np.flatnonzero(np.unpackbits(bitset, count=self.motor.num_linhas).view(bool))
+    
+    def _registrar(self, entradas: Dict[str, tuple], resultado: Optional[np.ndarray]):
+        """Guarda o novo estado; bitsets de predicados alterados deixam de valer"""
+        anteriores = self.entradas or {}
+        for chave in set(entradas) | set(anteriores):
+            if entradas.get(chave) != anteriores.get(chave):
+                self.bitsets.pop(chave, None)
+        self.entradas = entradas
+        self.resultado = resultado
+
+
+def obter_avaliacao_incremental(motor: MotorFiltros) -> AvaliacaoIncremental:
+    """
+    Retorna a avaliação incremental da sessão atual para o motor informado
+    
+    O estado fica em st.session_state (cada sessão ajusta seus próprios filtros)
+    e é descartado quando os dados mudam.
+    """
+    avaliacao = st.session_state.get('avaliacao_filtros')
+    if avaliacao is None or avaliacao.motor is not motor:
+        avaliacao = AvaliacaoIncremental(motor)
+        st.session_state['avaliacao_filtros'] = avaliacao
+    return avaliacao
+
+
+def impressao_filtros(filtros: dict) -> str:
+    """
+    Calcula uma impressão digital canônica do dicionário de filtros
+    
+    Filtros vazios são ignorados e a ordem das seleções não importa, de modo
+    que combinações equivalentes geram a mesma impressão.
+    
+    Args:
+        filtros: Dicionário com os filtros selecionados
+    
+    Returns:
+        Hash SHA-256 (hexadecimal) dos filtros
+    """
+    canonico = {}
+    for chave, valor in filtros.items():
+        if valor is None or (isinstance(valor, (list, tuple, str)) and not valor):
+            continue
+        if chave in FILTROS_LISTA:
+            valor = sorted({_valor_canonico(item) for item in valor})
+        elif chave == 'expressao':
+            valor = normalizar_expressao(valor)
+        elif isinstance(valor, (list, tuple)):
+            valor = [_valor_canonico(item) for item in valor]
+        else:
+            valor = _valor_canonico(valor)
+        canonico[chave] = valor
+    
+    texto = json.dumps(canonico, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+def _valor_canonico(valor) -> str:
+    """Representação textual estável de um valor de filtro (números, datas e textos)"""
+    if isinstance(valor, (date, pd.Timestamp)):
+        return pd.Timestamp(valor).isoformat()
+    if isinstance(valor, (int, float, np.number)) and not isinstance(valor, bool):
+        return repr(float(valor))
+    return str(valor)
+
+
+class CacheResultados:
+    """
+    Cache LRU das posições selecionadas por cada combinação de filtros
+    
+    Limitado pela memória ocupada pelos arrays de posições: ao passar do
+    limite, as entradas usadas há mais tempo são descartadas. Compartilhado
+    entre sessões, por isso os arrays guardados são somente leitura.
+    """
+    
+    def __init__(self, memoria_maxima_bytes: int):
+        self.memoria_maxima_bytes = memoria_maxima_bytes
+        self.memoria_bytes = 0
+        self.acertos = 0
+        self.falhas = 0
+        self._entradas: 'OrderedDict[Hashable, Optional[np.ndarray]]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def obter(self, chave: Hashable, calcular: Callable[[], Optional[np.ndarray]]) -> Optional[np.ndarray]:
+        """
+        Retorna o resultado guardado para a chave ou o calcula e guarda
+        
+        Args:
+            chave: Identificação do resultado (versão dos dados, impressão dos filtros)
+            calcular: Função que calcula o resultado em caso de falha
+        
+        Returns:
+            Posições das linhas selecionadas (ou None: nenhum filtro restringe os dados)
+        """
+        with self._lock:
+            if chave in self._entradas:
+                self._entradas.move_to_end(chave)
+                self.acertos += 1
+                return self._entradas[chave]
+            self.falhas += 1
+        
+        resultado = calcular()
+        if resultado is not None:
+            resultado.setflags(write=False)
+        tamanho = 0 if resultado is None else resultado.nbytes
+        if tamanho > self.memoria_maxima_bytes:
+            return resultado
+        
+        with self._lock:
+            if chave not in self._entradas:
+                self._entradas[chave] = resultado
+                self.memoria_bytes += tamanho
+            while self.memoria_bytes > self.memoria_maxima_bytes:
+                _, removido = self._entradas.popitem(last=False)
+                self.memoria_bytes -= 0 if removido is None else removido.nbytes
+        return resultado
+    
+    def estatisticas(self) -> Dict[str, float]:
+        """Contadores de acertos e falhas, entradas guardadas e memória ocupada (MB)"""
+        with self._lock:
+            return {
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'entradas': len(self._entradas),
+                'memoria_mb': self.memoria_bytes / 1024 ** 2
+            }
+
+
+@st.cache_resource
+def obter_cache_resultados() -> CacheResultados:
+    """Retorna o cache de resultados dos filtros (um por processo, compartilhado entre sessões)"""
+    return CacheResultados(int(FILTROS_CACHE_CONFIG['memoria_maxima_mb'] * 1024 ** 2))
+
+
+def obter_motor_filtros(df: pd.DataFrame) -> MotorFiltros:
+    """
+    Retorna o motor de filtros do DataFrame, reaproveitado entre reruns e sessões
+    
+    O motor é identificado por df.attrs['versao_dados'] (definido no carregamento);
+    sem versão, os índices são construídos a cada chamada.
+    
+    Args:
+        df: DataFrame completo
+    
+    Returns:
+        MotorFiltros
+    """
+    versao = df.attrs.get('versao_dados')
+    if versao is None:
+        return MotorFiltros(df)
+    return _motor_em_cache(versao, len(df), df)
+
+
+@st.cache_resource(max_entries=4)
+def _motor_em_cache(versao: str, num_linhas: int, _df: pd.DataFrame) -> MotorFiltros:
+    """Constrói o motor uma vez por versão dos dados (o DataFrame não entra na chave)"""
+    return MotorFiltros(_df)
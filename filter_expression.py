@@ -0,0 +1,354 @@
+"""
+Módulo da linguagem de expressões de filtro
+Este módulo converte expressões digitadas pelo usuário, como
+"Modelo in ('TSEA-5000', 'TSEA-7500') and Perdas_Totais_kW > 25", em uma
+árvore de predicados avaliada pelo motor de filtros (filter_engine.py)
+
+A expressão é lida com ast.parse (apenas análise sintática, nunca eval) e só
+um conjunto fixo de construções é aceito: comparações, 'in'/'not in' com
+listas de constantes, 'and', 'or', 'not' e parênteses.
+"""
+
+import ast
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import FrozenSet, List
+import numpy as np
+import pandas as pd
+import streamlit as st
+from config import FILTROS_LISTA, SCHEMA_CONFIG, FILTROS_EXPRESSAO_CONFIG
+
+
+# Colunas aceitas nas expressões, por tipo
+COLUNA_DATA = 'Data_Teste'
+COLUNAS_NUMERICAS = list(SCHEMA_CONFIG['colunas_medicoes'])
+COLUNAS_TEXTO = [
+    coluna for coluna in dict.fromkeys(FILTROS_LISTA.values()) if coluna not in COLUNAS_NUMERICAS
+]
+# Colunas com índice bitmap no motor ('in' vira uma consulta ao índice)
+COLUNAS_INDEXADAS = list(dict.fromkeys(FILTROS_LISTA.values()))
+
+OPERADORES = {
+    ast.Eq: '==', ast.NotEq: '!=', ast.Lt: '<', ast.LtE: '<=', ast.Gt: '>', ast.GtE: '>='
+}
+# Operador equivalente com os lados trocados (constante à esquerda)
+OPERADORES_INVERTIDOS = {'==': '==', '!=': '!=', '<': '>', '<=': '>=', '>': '<', '>=': '<='}
+
+
+class NoExpressao(ABC):
+    """
+    Nó da árvore de predicados; avaliado pelo motor sobre todas as linhas ou em posições
+    
+    Subclasses que não implementam `mascara` e `estimar` falham ao serem
+    instanciadas (TypeError), e não apenas quando a expressão é avaliada.
+    """
+    
+    @abstractmethod
+    def mascara(self, motor, posicoes=None) -> np.ndarray:
+        """Máscara booleana das linhas aceitas (todas as linhas ou só as posições informadas)"""
+    
+    @abstractmethod
+    def estimar(self, motor) -> float:
+        """Fração estimada das linhas aceitas"""
+
+
+class Pertinencia(NoExpressao):
+    """Coluna indexada com valor em uma lista (resolvido pelo índice bitmap)"""
+    
+    def __init__(self, coluna: str, valores: FrozenSet, negado: bool = False):
+        self.coluna = coluna
+        self.valores = valores
+        self.negado = negado
+    
+    def _selecionados(self, motor) -> list:
+        """Valores selecionados; 'not in' vira a lista dos demais valores (linhas sem valor ficam de fora)"""
+        if not self.negado:
+            return list(self.valores)
+        return [valor for valor in motor.indices[self.coluna].valores if valor not in self.valores]
+    
+    def mascara(self, motor, posicoes=None) -> np.ndarray:
+        return motor.mascara_lista(self.coluna, self._selecionados(motor), posicoes)
+    
+    def estimar(self, motor) -> float:
+        return motor.indices[self.coluna].estimar(self._selecionados(motor))
+
+
+class Comparacao(NoExpressao):
+    """Comparação de uma coluna numérica ou de datas com uma constante"""
+    
+    def __init__(self, coluna: str, operador: str, valor):
+        self.coluna = coluna
+        self.operador = operador
+        self.valor = valor
+    
+    def mascara(self, motor, posicoes=None) -> np.ndarray:
+        return motor.mascara_comparacao(self.coluna, self.operador, self.valor, posicoes)
+    
+    def estimar(self, motor) -> float:
+        return motor.estimar_comparacao(self.coluna, self.operador, self.valor)
+
+
+class IntervaloDatas(NoExpressao):
+    """Datas em [inicio, fim) (em ns), estimado pela busca binária no índice de datas"""
+    
+    def __init__(self, inicio: int, fim: int):
+        self.inicio = inicio
+        self.fim = fim
+    
+    def mascara(self, motor, posicoes=None) -> np.ndarray:
+        mascara = motor.mascara_comparacao(COLUNA_DATA, '>=', self.inicio, posicoes)
+        mascara &= motor.mascara_comparacao(COLUNA_DATA, '<', self.fim, posicoes)
+        return mascara
+    
+    def estimar(self, motor) -> float:
+        return motor.estimar_comparacao(COLUNA_DATA, '<', self.fim) - \
+            motor.estimar_comparacao(COLUNA_DATA, '<', self.inicio)
+
+
+class Conjuncao(NoExpressao):
+    """'and': nas posições, cada termo só é avaliado nas linhas que passaram pelos anteriores"""
+    
+    def __init__(self, termos: List[NoExpressao]):
+        self.termos = termos
+    
+    def mascara(self, motor, posicoes=None) -> np.ndarray:
+        termos = sorted(self.termos, key=lambda termo: termo.estimar(motor))
+        mascara = termos[0].mascara(motor, posicoes)
+        for termo in termos[1:]:
+            restantes = np.flatnonzero(mascara)
+            if len(restantes) == 0:
+                break
+            mascara[restantes] = termo.mascara(
+                motor, restantes if posicoes is None else posicoes[restantes]
+            )
+        return mascara
+    
+    def estimar(self, motor) -> float:
+        return float(np.prod([termo.estimar(motor) for termo in self.termos]))
+
+
+class Disjuncao(NoExpressao):
+    """'or'"""
+    
+    def __init__(self, termos: List[NoExpressao]):
+        self.termos = termos
+    
+    def mascara(self, motor, posicoes=None) -> np.ndarray:
+        mascara = self.termos[0].mascara(motor, posicoes)
+        for termo in self.termos[1:]:
+            np.logical_or(mascara, termo.mascara(motor, posicoes), out=mascara)
+        return mascara
+    
+    def estimar(self, motor) -> float:
+        fora = 1.0
+        for termo in self.termos:
+            fora *= 1.0 - termo.estimar(motor)
+        return 1.0 - fora
+
+
+class Negacao(NoExpressao):
+    """'not'"""
+    
+    def __init__(self, termo: NoExpressao):
+        self.termo = termo
+    
+    def mascara(self, motor, posicoes=None) -> np.ndarray:
+        return np.logical_not(self.termo.mascara(motor, posicoes))
+    
+    def estimar(self, motor) -> float:
+        return 1.0 - self.termo.estimar(motor)
+
+
+class ExpressaoFiltro:
+    """Expressão compilada: texto normalizado, árvore de predicados e colunas usadas"""
+    
+    def __init__(self, texto: str, raiz: NoExpressao, colunas: FrozenSet[str]):
+        self.texto = texto
+        self.raiz = raiz
+        self.colunas = colunas
+
+
+def normalizar_expressao(texto: str) -> str:
+    """
+    Normaliza o texto de uma expressão (espaços, aspas e parênteses redundantes)
+    
+    Args:
+        texto: Expressão digitada pelo usuário
+    
+    Returns:
+        Texto normalizado, usado como chave do cache de expressões compiladas
+    """
+    if len(texto) > FILTROS_EXPRESSAO_CONFIG['tamanho_maximo']:
+        raise ValueError(
+            f"a expressão tem mais de {FILTROS_EXPRESSAO_CONFIG['tamanho_maximo']} caracteres"
+        )
+    try:
+        arvore = ast.parse(texto.strip(), mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f"sintaxe inválida ({e.msg})") from None
+    return ast.unparse(arvore)
+
+
+def compilar_expressao(texto: str) -> ExpressaoFiltro:
+    """
+    Compila uma expressão de filtro (com cache pelo texto normalizado)
+    
+    Args:
+        texto: Expressão digitada pelo usuário
+    
+    Returns:
+        ExpressaoFiltro
+    
+    Raises:
+        ValueError: Sintaxe inválida, construção não permitida, coluna
+            desconhecida ou constante incompatível com a coluna
+    """
+    return _compilar_normalizada(normalizar_expressao(texto))
+
+
+@st.cache_resource(max_entries=256)
+def _compilar_normalizada(texto: str) -> ExpressaoFiltro:
+    """Compila um texto já normalizado (uma vez por texto, compartilhado entre sessões)"""
+    colunas = set()
+    raiz = _compilar_no(ast.parse(texto, mode='eval').body, colunas)
+    return ExpressaoFiltro(texto, raiz, frozenset(colunas))
+
+
+def _compilar_no(no: ast.AST, colunas: set) -> NoExpressao:
+    """Converte um nó da árvore sintática em um nó de predicado, validando-o"""
+    if isinstance(no, ast.BoolOp):
+        termos = [_compilar_no(valor, colunas) for valor in no.values]
+        return Conjuncao(termos) if isinstance(no.op, ast.And) else Disjuncao(termos)
+    
+    if isinstance(no, ast.UnaryOp) and isinstance(no.op, ast.Not):
+        return Negacao(_compilar_no(no.operand, colunas))
+    
+    if isinstance(no, ast.Compare):
+        # Comparações encadeadas (20 < Perdas_Totais_kW <= 30) viram um 'and'
+        termos = []
+        esquerda = no.left
+        for operador, direita in zip(no.ops, no.comparators):
+            termos.append(_compilar_comparacao(esquerda, operador, direita, colunas))
+            esquerda = direita
+        return termos[0] if len(termos) == 1 else Conjuncao(termos)
+    
+    raise ValueError(f"construção não permitida: '{ast.unparse(no)}'")
+
+
+def _compilar_comparacao(esquerda: ast.AST, operador: ast.cmpop, direita: ast.AST,
+                         colunas: set) -> NoExpressao:
+    """Compila uma comparação simples entre uma coluna e uma constante (ou lista)"""
+    if isinstance(operador, (ast.In, ast.NotIn)):
+        coluna = _coluna(esquerda)
+        valores = _lista_constantes(direita)
+        colunas.add(coluna)
+        return _compilar_pertinencia(coluna, valores, isinstance(operador, ast.NotIn))
+    
+    if type(operador) not in OPERADORES:
+        comparacao = ast.Compare(left=esquerda, ops=[operador], comparators=[direita])
+        raise ValueError(f"operador não permitido em '{ast.unparse(comparacao)}'")
+    simbolo = OPERADORES[type(operador)]
+    
+    if isinstance(esquerda, ast.Name) or not isinstance(direita, ast.Name):
+        coluna, constante = _coluna(esquerda), _constante(direita)
+    else:
+        coluna, constante = _coluna(direita), _constante(esquerda)
+        simbolo = OPERADORES_INVERTIDOS[simbolo]
+    colunas.add(coluna)
+    
+    if coluna in COLUNAS_TEXTO:
+        if simbolo not in ('==', '!='):
+            raise ValueError(f"a coluna '{coluna}' só aceita ==, !=, in e not in")
+        return _compilar_pertinencia(coluna, [constante], simbolo == '!=')
+    
+    if coluna == COLUNA_DATA:
+        return _compilar_data(simbolo, constante)
+    
+    if coluna in COLUNAS_INDEXADAS and simbolo in ('==', '!='):
+        return _compilar_pertinencia(coluna, [constante], simbolo == '!=')
+    return Comparacao(coluna, simbolo, _numero(coluna, constante))
+
+
+def _compilar_pertinencia(coluna: str, valores: list, negado: bool) -> NoExpressao:
+    """'in'/'not in' (e ==/!= em texto): índice bitmap ou comparações numéricas"""
+    if coluna == COLUNA_DATA:
+        raise ValueError(f"use comparações (>=, <=) com a coluna '{coluna}'")
+    if coluna in COLUNAS_NUMERICAS:
+        valores = [_numero(coluna, valor) for valor in valores]
+        if coluna not in COLUNAS_INDEXADAS:
+            termos = [Comparacao(coluna, '==', valor) for valor in valores]
+            no = termos[0] if len(termos) == 1 else Disjuncao(termos)
+            return Negacao(no) if negado else no
+    elif any(not isinstance(valor, str) for valor in valores):
+        raise ValueError(f"a coluna '{coluna}' só aceita textos entre aspas")
+    return Pertinencia(coluna, frozenset(valores), negado)
+
+
+def _compilar_data(simbolo: str, constante) -> NoExpressao:
+    """
+    Comparação com 'Data_Teste'; uma data sem horário representa o dia inteiro
+    ('> 2025-01-01' começa no dia seguinte, '== 2025-01-01' é o dia todo)
+    
+    Só datas ISO absolutas e sem fuso são aceitas: termos relativos como 'now'
+    ou 'today' ficariam fixos no cache de expressões compiladas.
+    """
+    if not isinstance(constante, str):
+        raise ValueError(f"compare '{COLUNA_DATA}' com uma data entre aspas, como '2025-01-01'")
+    try:
+        instante = datetime.fromisoformat(constante)
+    except ValueError:
+        raise ValueError(f"data inválida: '{constante}' (use o formato AAAA-MM-DD)") from None
+    if instante.tzinfo is not None:
+        raise ValueError(f"data inválida: '{constante}' (sem fuso horário)")
+    instante = pd.Timestamp(instante)
+    
+    inicio = instante.as_unit('ns').value
+    if instante != instante.normalize():
+        return Comparacao(COLUNA_DATA, simbolo, inicio)
+    
+    fim = (instante + timedelta(days=1)).as_unit('ns').value
+    if simbolo == '==':
+        return IntervaloDatas(inicio, fim)
+    if simbolo == '!=':
+        return Disjuncao([Comparacao(COLUNA_DATA, '<', inicio), Comparacao(COLUNA_DATA, '>=', fim)])
+    if simbolo == '>':
+        return Comparacao(COLUNA_DATA, '>=', fim)
+    if simbolo == '<=':
+        return Comparacao(COLUNA_DATA, '<', fim)
+    return Comparacao(COLUNA_DATA, simbolo, inicio)
+
+
+def _coluna(no: ast.AST) -> str:
+    """Nome de coluna conhecida"""
+    if not isinstance(no, ast.Name):
+        raise ValueError(f"esperava o nome de uma coluna em '{ast.unparse(no)}'")
+    if no.id not in COLUNAS_TEXTO + COLUNAS_NUMERICAS + [COLUNA_DATA]:
+        validas = ', '.join(COLUNAS_TEXTO + COLUNAS_NUMERICAS + [COLUNA_DATA])
+        raise ValueError(f"coluna desconhecida: '{no.id}' (colunas válidas: {validas})")
+    return no.id
+
+
+def _constante(no: ast.AST):
+    """Número ou texto literal (números negativos incluídos)"""
+    if isinstance(no, ast.UnaryOp) and isinstance(no.op, (ast.USub, ast.UAdd)):
+        valor = _constante(no.operand)
+        if isinstance(valor, (int, float)):
+            return -valor if isinstance(no.op, ast.USub) else valor
+    elif isinstance(no, ast.Constant) and isinstance(no.value, (int, float, str)) \
+            and not isinstance(no.value, bool):
+        return no.value
+    raise ValueError(f"esperava um número ou um texto entre aspas em '{ast.unparse(no)}'")
+
+
+def _lista_constantes(no: ast.AST) -> list:
+    """Lista, tupla ou conjunto de constantes (lado direito de 'in')"""
+    if not isinstance(no, (ast.Tuple, ast.List, ast.Set)) or not no.elts:
+        raise ValueError(f"'in' espera uma lista de valores, como ('A', 'B'), em '{ast.unparse(no)}'")
+    return [_constante(elemento) for elemento in no.elts]
+
+
+def _numero(coluna: str, valor) -> float:
+    """Valida uma constante numérica para uma coluna numérica"""
+    if not isinstance(valor, (int, float)):
+        raise ValueError(f"a coluna '{coluna}' só aceita números")
+    return float(valor)
@@ -7,15 +7,60 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime, date
 from typing import Tuple, List, Optional
-from config import TEXTOS_INTERFACE, DATA_CONFIG
+from config import TEXTOS_INTERFACE, DATA_CONFIG, FILTROS_PERIODO
+from filter_engine import (
+    obter_motor_filtros, obter_avaliacao_incremental, obter_cache_resultados, impressao_filtros,
+    descrever_plano
+)
+from filter_expression import compilar_expressao
+
+
+# Rótulos dos filtros rápidos (usados no resumo dos filtros)
+ROTULOS_FILTROS_RAPIDOS = {
+    'aprovados': 'Apenas Aprovados',
+    'reprovados': 'Apenas Reprovados',
+    'ultimo_mes': 'Último Mês'
+}
 
 
 class DashboardFilters:
     """Classe responsável pela criação e aplicação de filtros"""
     
-    def __init__(self, df: pd.DataFrame):
+    def __init__(self, df: pd.DataFrame, limites_datas: Optional[Tuple[date, date]] = None,
+                 periodo_padrao: Optional[Tuple[date, date]] = None, banco=None):
+        """
+        Args:
+            df: DataFrame com os dados
+            limites_datas: Datas mínima e máxima do seletor de período; quando os
+                dados foram carregados só em parte (fonte particionada), vêm das partições
+            periodo_padrao: Período selecionado inicialmente (padrão: todo o intervalo)
+            banco: DashboardDatabase opcional; quando informado, as opções da barra
+                lateral e os filtros são resolvidos no banco e `df` pode estar vazio
+        """
+        # Sem cópias: `df` pode ser compartilhado (column store mapeado em memória)
         self.df = df
-        self.df_filtrado = df.copy()
+        self.df_filtrado = df
+        self.limites_datas = limites_datas
+        self.periodo_padrao = periodo_padrao
+        self.banco = banco
+        # Índices dos filtros (construídos uma vez por versão dos dados) e o estado
+        # da reavaliação incremental desta sessão
+        self.motor = obter_motor_filtros(df) if banco is None and not df.empty else None
+        self.avaliacao = obter_avaliacao_incremental(self.motor) if self.motor is not None else None
+    
+    def _dominio(self) -> dict:
+        """Domínio dos filtros (calculado uma vez por versão dos dados), do banco ou do motor"""
+        if self.banco is not None:
+            return self.banco.obter_dominio()
+        return self.motor.obter_dominio()
+    
+    def _valores_unicos(self, coluna: str) -> list:
+        """Valores distintos (ordenados) de uma coluna"""
+        return self._dominio()['valores'][coluna]
+    
+    def _limites(self, coluna: str) -> tuple:
+        """Valores mínimo e máximo de uma coluna"""
+        return self._dominio()['limites'][coluna]
     
     def criar_filtros_sidebar(self) -> dict:
         """
@@ -29,46 +74,52 @@ class DashboardFilters:
         filtros = {}
         
         # Filtro por Modelo do Transformador
+        modelos = self._valores_unicos('Modelo')
         filtros['modelos'] = st.sidebar.multiselect(
             "🔧 Selecione o(s) Modelo(s):",
-            options=sorted(self.df['Modelo'].unique()),
-            default=sorted(self.df['Modelo'].unique()),
+            options=modelos,
+            default=modelos,
             help="Selecione um ou mais modelos de transformadores para análise"
         )
         
         # Filtro por Status de Aprovação
+        status = self._valores_unicos('Status_Aprovacao')
         filtros['status'] = st.sidebar.multiselect(
             "✅ Status da Aprovação:",
-            options=self.df['Status_Aprovacao'].unique(),
-            default=self.df['Status_Aprovacao'].unique(),
+            options=status,
+            default=status,
             help="Filtre por status de aprovação dos testes"
         )
         
         # Filtro por Tipo de Ensaio
+        tipos_ensaio = self._valores_unicos('Tipo_Ensaio')
         filtros['tipos_ensaio'] = st.sidebar.multiselect(
             "🧪 Tipo de Ensaio:",
-            options=sorted(self.df['Tipo_Ensaio'].unique()),
-            default=sorted(self.df['Tipo_Ensaio'].unique()),
+            options=tipos_ensaio,
+            default=tipos_ensaio,
             help="Selecione os tipos de ensaio para análise"
         )
         
         # Filtro por Intervalo de Datas
-        data_min = self.df['Data_Teste'].min().date()
-        data_max = self.df['Data_Teste'].max().date()
+        if self.limites_datas:
+            data_min, data_max = self.limites_datas
+        else:
+            data_min, data_max = (data.date() for data in self._limites('Data_Teste'))
         
         filtros['periodo'] = st.sidebar.date_input(
             "📅 Selecione o Período:",
-            value=(data_min, data_max),
+            value=self.periodo_padrao or (data_min, data_max),
             min_value=data_min,
             max_value=data_max,
             format=DATA_CONFIG['formato_data'],
+            key='filtro_periodo',
             help="Defina o período de análise dos testes"
         )
         
         # Filtros avançados (expansível)
         with st.sidebar.expander("🔍 Filtros Avançados", expanded=False):
             # Filtro por faixa de eficiência
-            efic_min, efic_max = float(self.df['Eficiencia_Percentual'].min()), float(self.df['Eficiencia_Percentual'].max())
+            efic_min, efic_max = (float(valor) for valor in self._limites('Eficiencia_Percentual'))
             filtros['eficiencia_range'] = st.slider(
                 "Faixa de Eficiência (%):",
                 min_value=efic_min,
@@ -79,7 +130,7 @@ class DashboardFilters:
             )
             
             # Filtro por faixa de temperatura
-            temp_min, temp_max = float(self.df['Elevacao_Temperatura_C'].min()), float(self.df['Elevacao_Temperatura_C'].max())
+            temp_min, temp_max = (float(valor) for valor in self._limites('Elevacao_Temperatura_C'))
             filtros['temperatura_range'] = st.slider(
                 "Faixa de Temperatura (°C):",
                 min_value=temp_min,
@@ -90,7 +141,7 @@ class DashboardFilters:
             )
             
             # Filtro por faixa de perdas
-            perdas_min, perdas_max = float(self.df['Perdas_Totais_kW'].min()), float(self.df['Perdas_Totais_kW'].max())
+            perdas_min, perdas_max = (float(valor) for valor in self._limites('Perdas_Totais_kW'))
             filtros['perdas_range'] = st.slider(
                 "Faixa de Perdas (kW):",
                 min_value=perdas_min,
@@ -102,20 +153,56 @@ class DashboardFilters:
             
             # Filtro por potência nominal
             if 'Potencia_Nominal_MVA' in self.df.columns:
-                potencias_disponiveis = sorted(self.df['Potencia_Nominal_MVA'].unique())
+                potencias_disponiveis = self._valores_unicos('Potencia_Nominal_MVA')
                 filtros['potencias'] = st.multiselect(
                     "Potência Nominal (MVA):",
                     options=potencias_disponiveis,
                     default=potencias_disponiveis,
                     help="Selecione as potências nominais"
                 )
+            
+            # Expressão de filtro livre (avaliada pelo motor de filtros; indisponível com banco)
+            if self.banco is None:
+                filtros['expressao'] = st.text_input(
+                    "Expressão de filtro:",
+                    placeholder="Modelo in ('TSEA-5000', 'TSEA-7500') and Perdas_Totais_kW > 25",
+                    help="Combine colunas com ==, !=, <, <=, >, >=, in, not in, and, or e not. "
+                         "Datas entre aspas, como Data_Teste >= '2025-01-01'"
+                ).strip()
         
         # Botão para limpar filtros
         if st.sidebar.button("🔄 Limpar Todos os Filtros"):
+            st.session_state.pop('filtro_rapido', None)
             st.rerun()
         
         return filtros
     
+    def combinar_filtros_rapidos(self, filtros: dict, filtros_rapidos: dict) -> dict:
+        """
+        Acrescenta o filtro rápido ativo aos filtros da barra lateral
+        
+        O filtro rápido vira predicados comuns ('status_rapido', 'periodo_rapido'),
+        avaliados no mesmo plano, com os mesmos índices e o mesmo cache.
+        
+        Args:
+            filtros: Dicionário com os filtros selecionados na barra lateral
+            filtros_rapidos: Filtro rápido selecionado (ver `criar_filtros_rapidos`)
+        
+        Returns:
+            Novo dicionário com todos os filtros
+        """
+        tipo = filtros_rapidos.get('tipo')
+        if not tipo:
+            return filtros
+        
+        data_maxima = self._limites('Data_Teste')[1]
+        data_maxima = pd.Timestamp(data_maxima).date() if pd.notna(data_maxima) else None
+        
+        combinados = dict(filtros)
+        combinados['filtro_rapido'] = tipo
+        combinados.update(predicados_filtro_rapido(tipo, data_maxima))
+        return combinados
+    
     def aplicar_filtros(self, filtros: dict) -> pd.DataFrame:
         """
         Aplica os filtros selecionados ao DataFrame
@@ -126,59 +213,68 @@ class DashboardFilters:
         Returns:
             DataFrame filtrado
         """
-        df_filtrado = self.df.copy()
+        # Com banco de dados, os filtros viram uma cláusula WHERE e só as linhas
+        # selecionadas são lidas
+        if self.banco is not None:
+            self.df_filtrado = self.banco.consultar(filtros, list(self.df.columns))
+            return self.df_filtrado
         
         # Verifica se há dados para filtrar
-        if df_filtrado.empty:
-            return df_filtrado
+        if self.df.empty:
+            return self.df
         
-        # Filtro por modelos
-        if filtros.get('modelos'):
-            df_filtrado = df_filtrado[df_filtrado['Modelo'].isin(filtros['modelos'])]
+        # Todos os filtros são avaliados nos índices e nos arrays originais,
+        # e o resultado é materializado uma única vez (sem cópias intermediárias);
+        # combinações já vistas vêm do cache de resultados e, quando só um filtro
+        # muda, apenas ele é reavaliado
+        posicoes = self.avaliacao.posicoes(filtros)
+        df_filtrado = self.df if posicoes is None else self.df.iloc[posicoes]
         
-        # Filtro por status
-        if filtros.get('status'):
-            df_filtrado = df_filtrado[df_filtrado['Status_Aprovacao'].isin(filtros['status'])]
+        self.df_filtrado = df_filtrado
+        return df_filtrado
+    
+    def aplicar_filtros_periodo(self, filtros: dict, periodo: Tuple[date, date]) -> pd.DataFrame:
+        """
+        Aplica os filtros trocando os filtros de período pelo período informado
         
-        # Filtro por tipos de ensaio
-        if filtros.get('tipos_ensaio'):
-            df_filtrado = df_filtrado[df_filtrado['Tipo_Ensaio'].isin(filtros['tipos_ensaio'])]
+        Usado na comparação entre períodos; não altera o estado da avaliação
+        incremental da sessão (o resultado passa pelo cache de resultados).
         
-        # Filtro por período
-        if filtros.get('periodo') and len(filtros['periodo']) == 2:
-            data_inicio, data_fim = filtros['periodo']
-            df_filtrado = df_filtrado[
-                (df_filtrado['Data_Teste'].dt.date >= data_inicio) &
-                (df_filtrado['Data_Teste'].dt.date <= data_fim)
-            ]
-        
-        # Filtros avançados
-        if filtros.get('eficiencia_range'):
-            efic_min, efic_max = filtros['eficiencia_range']
-            df_filtrado = df_filtrado[
-                (df_filtrado['Eficiencia_Percentual'] >= efic_min) &
-                (df_filtrado['Eficiencia_Percentual'] <= efic_max)
-            ]
-        
-        if filtros.get('temperatura_range'):
-            temp_min, temp_max = filtros['temperatura_range']
-            df_filtrado = df_filtrado[
-                (df_filtrado['Elevacao_Temperatura_C'] >= temp_min) &
-                (df_filtrado['Elevacao_Temperatura_C'] <= temp_max)
-            ]
-        
-        if filtros.get('perdas_range'):
-            perdas_min, perdas_max = filtros['perdas_range']
-            df_filtrado = df_filtrado[
-                (df_filtrado['Perdas_Totais_kW'] >= perdas_min) &
-                (df_filtrado['Perdas_Totais_kW'] <= perdas_max)
-            ]
-        
-        if filtros.get('potencias'):
-            df_filtrado = df_filtrado[df_filtrado['Potencia_Nominal_MVA'].isin(filtros['potencias'])]
+        Args:
+            filtros: Dicionário com os filtros selecionados
+            periodo: Período (início, fim) que substitui os filtros de período
+            
+        Returns:
+            DataFrame filtrado
+        """
+        filtros_periodo = {chave: valor for chave, valor in filtros.items() if chave not in FILTROS_PERIODO}
+        filtros_periodo['periodo'] = periodo
         
-        self.df_filtrado = df_filtrado
-        return df_filtrado
+        if self.banco is not None:
+            return self.banco.consultar(filtros_periodo, list(self.df.columns))
+        
+        if self.df.empty:
+            return self.df
+        
+        if self.motor.versao is None:
+            posicoes = self.motor.posicoes(filtros_periodo)
+        else:
+            posicoes = obter_cache_resultados().obter(
+                (self.motor.versao, impressao_filtros(filtros_periodo)),
+                lambda: self.motor.posicoes(filtros_periodo)
+            )
+        return self.df if posicoes is None else self.df.iloc[posicoes]
+    
+    def obter_plano_filtros(self) -> str:
+        """
+        Descreve o plano usado na última aplicação dos filtros (para depuração)
+        
+        Returns:
+            String com a estratégia e a ordem de avaliação dos filtros
+        """
+        if self.banco is not None:
+            return "filtros executados no banco de dados"
+        return descrever_plano(self.avaliacao.plano if self.avaliacao is not None else None)
     
     def obter_resumo_filtros(self, filtros: dict) -> str:
         """
@@ -192,19 +288,25 @@ class DashboardFilters:
         """
         resumo_partes = []
         
-        if filtros.get('modelos') and len(filtros['modelos']) < len(self.df['Modelo'].unique()):
+        if filtros.get('modelos') and len(filtros['modelos']) < len(self._valores_unicos('Modelo')):
             resumo_partes.append(f"Modelos: {', '.join(filtros['modelos'])}")
         
-        if filtros.get('status') and len(filtros['status']) < len(self.df['Status_Aprovacao'].unique()):
+        if filtros.get('status') and len(filtros['status']) < len(self._valores_unicos('Status_Aprovacao')):
             resumo_partes.append(f"Status: {', '.join(filtros['status'])}")
         
-        if filtros.get('tipos_ensaio') and len(filtros['tipos_ensaio']) < len(self.df['Tipo_Ensaio'].unique()):
+        if filtros.get('tipos_ensaio') and len(filtros['tipos_ensaio']) < len(self._valores_unicos('Tipo_Ensaio')):
             resumo_partes.append(f"Ensaios: {', '.join(filtros['tipos_ensaio'])}")
         
         if filtros.get('periodo') and len(filtros['periodo']) == 2:
             data_inicio, data_fim = filtros['periodo']
             resumo_partes.append(f"Período: {data_inicio} a {data_fim}")
         
+        if filtros.get('expressao'):
+            resumo_partes.append(f"Expressão: {filtros['expressao']}")
+        
+        if filtros.get('filtro_rapido') in ROTULOS_FILTROS_RAPIDOS:
+            resumo_partes.append(f"Filtro rápido: {ROTULOS_FILTROS_RAPIDOS[filtros['filtro_rapido']]}")
+        
         if not resumo_partes:
             return "Todos os dados estão sendo exibidos (nenhum filtro aplicado)"
         
@@ -232,6 +334,16 @@ class DashboardFilters:
         if not filtros.get('status'):
             return False, "Selecione pelo menos um status de aprovação"
         
+        # Verifica a expressão de filtro (sintaxe, colunas e constantes)
+        if filtros.get('expressao'):
+            try:
+                expressao = compilar_expressao(filtros['expressao'])
+            except ValueError as e:
+                return False, f"Expressão de filtro inválida: {e}"
+            ausentes = sorted(expressao.colunas - set(self.df.columns))
+            if ausentes:
+                return False, f"Expressão de filtro inválida: colunas ausentes nos dados ({', '.join(ausentes)})"
+        
         return True, ""
 
 
@@ -239,6 +351,9 @@ def criar_filtros_rapidos(df: pd.DataFrame) -> dict:
     """
     Cria filtros rápidos na área principal
     
+    O filtro escolhido fica em st.session_state e continua ativo nos reruns
+    seguintes, até que "Todos os Dados" (ou "Limpar Todos os Filtros") seja usado.
+    
     Args:
         df: DataFrame com os dados
         
@@ -249,25 +364,46 @@ def criar_filtros_rapidos(df: pd.DataFrame) -> dict:
     
     col1, col2, col3, col4 = st.columns(4)
     
-    filtros_rapidos = {}
-    
     with col1:
         if st.button("📊 Todos os Dados", help="Exibir todos os dados disponíveis"):
-            filtros_rapidos['tipo'] = 'todos'
+            st.session_state.pop('filtro_rapido', None)
     
     with col2:
         if st.button("✅ Apenas Aprovados", help="Exibir apenas testes aprovados"):
-            filtros_rapidos['tipo'] = 'aprovados'
+            st.session_state.filtro_rapido = 'aprovados'
     
     with col3:
         if st.button("❌ Apenas Reprovados", help="Exibir apenas testes reprovados"):
-            filtros_rapidos['tipo'] = 'reprovados'
+            st.session_state.filtro_rapido = 'reprovados'
     
     with col4:
         if st.button("📅 Último Mês", help="Exibir dados do último mês"):
-            filtros_rapidos['tipo'] = 'ultimo_mes'
+            st.session_state.filtro_rapido = 'ultimo_mes'
+    
+    tipo = st.session_state.get('filtro_rapido')
+    return {'tipo': tipo} if tipo else {}
+
+
+def predicados_filtro_rapido(tipo: Optional[str], data_maxima: Optional[date] = None) -> dict:
+    """
+    Converte um filtro rápido em predicados do dicionário de filtros
     
-    return filtros_rapidos
+    Args:
+        tipo: Tipo do filtro rápido ('todos', 'aprovados', 'reprovados' ou 'ultimo_mes')
+        data_maxima: Data mais recente dos dados (fim do período de 'ultimo_mes')
+        
+    Returns:
+        Dicionário com os predicados ('status_rapido' ou 'periodo_rapido'); vazio para 'todos'
+    """
+    if tipo == 'aprovados':
+        return {'status_rapido': ['Aprovado']}
+    if tipo == 'reprovados':
+        return {'status_rapido': ['Reprovado']}
+    if tipo == 'ultimo_mes':
+        # Início em dias inteiros: o filtro se repete entre reruns e aproveita o cache
+        inicio = (datetime.now() - pd.Timedelta(days=30)).date()
+        return {'periodo_rapido': (inicio, max(inicio, data_maxima or date.today()))}
+    return {}
 
 
 def aplicar_filtros_rapidos(df: pd.DataFrame, filtros_rapidos: dict) -> pd.DataFrame:
@@ -281,20 +417,13 @@ def aplicar_filtros_rapidos(df: pd.DataFrame, filtros_rapidos: dict) -> pd.DataF
     Returns:
         DataFrame filtrado
     """
-    if not filtros_rapidos.get('tipo'):
+    if not filtros_rapidos.get('tipo') or df.empty:
         return df
     
-    tipo_filtro = filtros_rapidos['tipo']
-    
-    if tipo_filtro == 'todos':
-        return df
-    elif tipo_filtro == 'aprovados':
-        return df[df['Status_Aprovacao'] == 'Aprovado']
-    elif tipo_filtro == 'reprovados':
-        return df[df['Status_Aprovacao'] == 'Reprovado']
-    elif tipo_filtro == 'ultimo_mes':
-        data_limite = datetime.now() - pd.Timedelta(days=30)
-        return df[df['Data_Teste'] >= data_limite]
+    motor = obter_motor_filtros(df)
+    data_maxima = motor.obter_dominio()['limites'].get('Data_Teste', (None, None))[1]
+    data_maxima = pd.Timestamp(data_maxima).date() if pd.notna(data_maxima) else None
     
-    return df
+    posicoes = motor.posicoes(predicados_filtro_rapido(filtros_rapidos['tipo'], data_maxima))
+    return df if posicoes is None else df.iloc[posicoes]
 
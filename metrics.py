@@ -6,16 +6,115 @@ Este módulo contém todas as funções para calcular e exibir métricas do dash
 import streamlit as st
 import pandas as pd
 import numpy as np
-from typing import Dict, Any
-from config import METRICAS_CONFIG, TEXTOS_INTERFACE
+from datetime import date
+from typing import Dict, Any, Optional, Callable, Tuple, Union
+from config import METRICAS_CONFIG, QUANTIS_CONFIG, COMPARACAO_CONFIG, FILTROS_PERIODO, TEXTOS_INTERFACE
+from metrics_engine import (
+    CuboMetricas, calcular_agregados, calcular_agregados_janelas, calcular_conformidade, calcular_kpis,
+    calcular_quartis, esboco_linhas, janelas_comparacao, metricas_basicas, metricas_avancadas
+)
+from quantile_sketch import EsbocoQuantis
+
+
+# Referências das variações exibidas nos cards (modo -> rótulo)
+MODOS_COMPARACAO = {
+    'metas': 'Metas de especificação',
+    'periodo_anterior': 'Período anterior',
+    'ano_anterior': 'Mesmo período do ano anterior',
+    'janela_movel': 'Últimos N dias vs. N dias anteriores'
+}
+
+# Métricas comparadas entre períodos
+METRICAS_COMPARADAS = [
+    'total_testes', 'eficiencia_media', 'taxa_aprovacao', 'temperatura_media',
+    'perdas_medias', 'potencia_media', 'corrente_media', 'conformidade'
+]
 
 
 class DashboardMetrics:
     """Classe responsável pelo cálculo e exibição de métricas"""
     
-    def __init__(self, df: pd.DataFrame):
+    def __init__(self, df: pd.DataFrame, cubo: Optional[CuboMetricas] = None,
+                 filtros: Optional[dict] = None):
+        """
+        Args:
+            df: DataFrame com os dados filtrados
+            cubo: Cubo de métricas do DataFrame completo (opcional)
+            filtros: Filtros que produziram df (necessários para consultar o cubo)
+        """
         self.df = df
+        self.cubo = cubo
+        self.filtros = filtros or {}
         self.metricas = {}
+        self.origem_agregados = None
+        self._agregados = None
+        self._quartis_eficiencia = None
+        self._esbocos = {}
+        self._comparacoes = {}
+    
+    def obter_agregados(self) -> Dict[str, Any]:
+        """
+        Calcula (uma vez por instância) os agregados de todas as métricas
+        
+        Com apenas filtros de lista e de período, os agregados saem das células
+        do cubo; caso contrário, cada coluna é lida em uma única passada. As
+        métricas básicas e avançadas, chamadas várias vezes por execução,
+        apenas consultam o resultado.
+        
+        Returns:
+            Dicionário retornado por calcular_agregados
+        """
+        if self._agregados is None:
+            if self.cubo is not None and self.cubo.responde(self.filtros):
+                agregados = self.cubo.agregados(self.filtros)
+                # O cubo deve descrever exatamente as linhas filtradas
+                if agregados['total'] == len(self.df):
+                    self._agregados = agregados
+                    self.origem_agregados = 'cubo'
+            
+            if self._agregados is None:
+                self._agregados = calcular_agregados(self.df)
+                self.origem_agregados = 'linhas'
+        return self._agregados
+    
+    def obter_esboco(self, coluna: str, por: Optional[str] = None) -> Optional[EsbocoQuantis]:
+        """
+        Retorna (uma vez por instância) o esboço de quantis de uma coluna
+        
+        Quando as métricas vêm do cubo, o esboço é a combinação dos esboços das
+        células selecionadas; caso contrário, é construído a partir das linhas.
+        
+        Args:
+            coluna: Coluna numérica
+            por: Coluna categórica que define os grupos (None: um único grupo)
+        
+        Returns:
+            EsbocoQuantis ou None no modo exato (QUANTIS_CONFIG['modo'])
+        """
+        if QUANTIS_CONFIG['modo'] != 'esboco':
+            return None
+        
+        chave = (coluna, por)
+        if chave not in self._esbocos:
+            self.obter_agregados()
+            esboco = None
+            if self.origem_agregados == 'cubo':
+                esboco = self.cubo.esboco(self.filtros, coluna, por)
+            if esboco is None:
+                esboco = esboco_linhas(self.df, coluna, por)
+            self._esbocos[chave] = esboco
+        return self._esbocos[chave]
+    
+    def obter_quartis_eficiencia(self) -> tuple:
+        """Calcula (uma vez por instância) o Q1 e o Q3 da eficiência, pelo esboço ou exatos"""
+        if self._quartis_eficiencia is None:
+            esboco = self.obter_esboco('Eficiencia_Percentual')
+            if esboco is None:
+                self._quartis_eficiencia = calcular_quartis(self.df['Eficiencia_Percentual'].to_numpy())
+            else:
+                q25, q75 = esboco.quantis([0.25, 0.75])[0]
+                self._quartis_eficiencia = (float(q25), float(q75))
+        return self._quartis_eficiencia
     
     def calcular_metricas_basicas(self) -> Dict[str, Any]:
         """
@@ -33,20 +132,7 @@ class DashboardMetrics:
                 'perdas_medias': 0
             }
         
-        metricas = {
-            'total_testes': len(self.df),
-            'eficiencia_media': self.df['Eficiencia_Percentual'].mean(),
-            'taxa_aprovacao': (self.df['Status_Aprovacao'].value_counts(normalize=True).get('Aprovado', 0)) * 100,
-            'temperatura_media': self.df['Elevacao_Temperatura_C'].mean(),
-            'perdas_medias': self.df['Perdas_Totais_kW'].mean()
-        }
-        
-        # Métricas adicionais se as colunas existirem
-        if 'Potencia_Nominal_MVA' in self.df.columns:
-            metricas['potencia_media'] = self.df['Potencia_Nominal_MVA'].mean()
-        
-        if 'Corrente_Excitacao_A' in self.df.columns:
-            metricas['corrente_media'] = self.df['Corrente_Excitacao_A'].mean()
+        metricas = metricas_basicas(self.obter_agregados())
         
         self.metricas = metricas
         return metricas
@@ -61,35 +147,7 @@ class DashboardMetrics:
         if self.df.empty:
             return {}
         
-        metricas_avancadas = {
-            # Estatísticas de eficiência
-            'eficiencia_std': self.df['Eficiencia_Percentual'].std(),
-            'eficiencia_min': self.df['Eficiencia_Percentual'].min(),
-            'eficiencia_max': self.df['Eficiencia_Percentual'].max(),
-            'eficiencia_q25': self.df['Eficiencia_Percentual'].quantile(0.25),
-            'eficiencia_q75': self.df['Eficiencia_Percentual'].quantile(0.75),
-            
-            # Estatísticas de temperatura
-            'temperatura_std': self.df['Elevacao_Temperatura_C'].std(),
-            'temperatura_min': self.df['Elevacao_Temperatura_C'].min(),
-            'temperatura_max': self.df['Elevacao_Temperatura_C'].max(),
-            
-            # Estatísticas de perdas
-            'perdas_std': self.df['Perdas_Totais_kW'].std(),
-            'perdas_min': self.df['Perdas_Totais_kW'].min(),
-            'perdas_max': self.df['Perdas_Totais_kW'].max(),
-            
-            # Contagens por categoria
-            'testes_por_modelo': self.df['Modelo'].value_counts().to_dict(),
-            'testes_por_tipo': self.df['Tipo_Ensaio'].value_counts().to_dict(),
-            
-            # Métricas de qualidade
-            'testes_fora_spec_temp': len(self.df[self.df['Elevacao_Temperatura_C'] > METRICAS_CONFIG['temperatura_maxima']]),
-            'testes_fora_spec_efic': len(self.df[self.df['Eficiencia_Percentual'] < METRICAS_CONFIG['eficiencia_minima']]),
-            'testes_fora_spec_perdas': len(self.df[self.df['Perdas_Totais_kW'] > METRICAS_CONFIG['perdas_maximas']])
-        }
-        
-        return metricas_avancadas
+        return metricas_avancadas(self.obter_agregados(), self.obter_quartis_eficiencia())
     
     def card_metric(self, titulo, valor, variacao=None, cor_fundo="#222", cor_borda="#1ecb4f", icone="", cor_texto="#fff", sufixo_variacao="", help_text=None):
         """Exibe um card de métrica customizado"""
@@ -107,16 +165,66 @@ class DashboardMetrics:
         if help_text:
             st.caption(help_text)
 
-    def exibir_metricas_principais(self):
-        """Exibe as métricas principais em colunas com cards customizados"""
+    def selecionar_comparacao(self, filtrar_periodo: Optional[Callable[[tuple], pd.DataFrame]] = None
+                              ) -> Optional[Dict[str, Any]]:
+        """
+        Exibe o seletor da referência das variações dos cards e calcula a comparação
+        
+        Args:
+            filtrar_periodo: Ver `comparar_periodos`
+        
+        Returns:
+            Resultado de `comparar_periodos` ou None quando as variações são
+            calculadas em relação às metas
+        """
+        modos = list(MODOS_COMPARACAO)
+        col_modo, col_dias = st.columns([3, 1])
+        with col_modo:
+            modo = st.selectbox(
+                "Variações em relação a:",
+                options=modos,
+                index=modos.index(COMPARACAO_CONFIG['modo_padrao']),
+                format_func=MODOS_COMPARACAO.get,
+                key='modo_comparacao'
+            )
+        
+        num_dias = COMPARACAO_CONFIG['dias_janela_movel']
+        if modo == 'janela_movel':
+            with col_dias:
+                num_dias = int(st.number_input("Dias:", min_value=1, max_value=365, value=num_dias, key='dias_comparacao'))
+        
+        if modo == 'metas':
+            return None
+        
+        comparacao = self.comparar_periodos(modo, num_dias, filtrar_periodo)
+        if not comparacao or comparacao['referencia'] is None:
+            st.caption("Sem registros no período de referência para os filtros selecionados.")
+        else:
+            (inicio_atual, fim_atual), (inicio_ref, fim_ref) = comparacao['janelas']
+            st.caption(
+                f"Variações de {inicio_atual:%d/%m/%Y}–{fim_atual:%d/%m/%Y} em relação a "
+                f"{inicio_ref:%d/%m/%Y}–{fim_ref:%d/%m/%Y}"
+            )
+        return comparacao
+    
+    def exibir_metricas_principais(self, filtrar_periodo: Optional[Callable[[tuple], pd.DataFrame]] = None):
+        """
+        Exibe as métricas principais em colunas com cards customizados
+        
+        Args:
+            filtrar_periodo: Função que aplica os demais filtros com outro período
+                (usada na comparação entre períodos quando o cubo não responde)
+        """
         metricas = self.calcular_metricas_basicas()
         st.header(TEXTOS_INTERFACE['metricas_titulo'])
+        comparacao = self.selecionar_comparacao(filtrar_periodo)
         # Primeira linha de métricas
         col1, col2, col3, col4 = st.columns(4)
         with col1:
             self.card_metric(
                 "📊 Total de Testes",
                 f"{metricas['total_testes']:,}",
+                **_variacao_card(comparacao, 'total_testes'),
                 cor_fundo="#23272e",
                 cor_borda="#6c63ff",
                 icone="📊",
@@ -128,8 +236,7 @@ class DashboardMetrics:
             self.card_metric(
                 "⚡ Eficiência Média",
                 f"{eficiencia:.2f}%",
-                variacao=f"{delta_eficiencia:+.2f}",
-                sufixo_variacao="%",
+                **_variacao_card(comparacao, 'eficiencia_media', f"{delta_eficiencia:+.2f}"),
                 cor_fundo="#1ecb4f22",
                 cor_borda="#1ecb4f",
                 icone="⚡",
@@ -141,8 +248,7 @@ class DashboardMetrics:
             self.card_metric(
                 "✅ Taxa de Aprovação",
                 f"{taxa_aprovacao:.1f}%",
-                variacao=f"{delta_aprov:+.1f}",
-                sufixo_variacao="%",
+                **_variacao_card(comparacao, 'taxa_aprovacao', f"{delta_aprov:+.1f}"),
                 cor_fundo="#1e90ff22",
                 cor_borda="#1e90ff",
                 icone="✅",
@@ -154,8 +260,7 @@ class DashboardMetrics:
             self.card_metric(
                 "🌡️ Temperatura Média",
                 f"{temperatura:.1f}°C",
-                variacao=f"{delta_temp:+.1f}",
-                sufixo_variacao="°C",
+                **_variacao_card(comparacao, 'temperatura_media', f"{delta_temp:+.1f}", "°C"),
                 cor_fundo="#ff4b4b22",
                 cor_borda="#ff4b4b",
                 icone="🌡️",
@@ -168,6 +273,7 @@ class DashboardMetrics:
             self.card_metric(
                 "⚠️ Perdas Médias",
                 f"{perdas:.2f} kW",
+                **_variacao_card(comparacao, 'perdas_medias'),
                 cor_fundo="#f7b73122",
                 cor_borda="#f7b731",
                 icone="⚠️",
@@ -178,6 +284,7 @@ class DashboardMetrics:
                 self.card_metric(
                     "🔌 Potência Média",
                     f"{metricas['potencia_media']:.1f} MVA",
+                    **_variacao_card(comparacao, 'potencia_media'),
                     cor_fundo="#00b89422",
                     cor_borda="#00b894",
                     icone="🔌",
@@ -188,6 +295,7 @@ class DashboardMetrics:
                 self.card_metric(
                     "🔄 Corrente Média",
                     f"{metricas['corrente_media']:.2f} A",
+                    **_variacao_card(comparacao, 'corrente_media'),
                     cor_fundo="#0984e322",
                     cor_borda="#0984e3",
                     icone="🔄",
@@ -205,8 +313,7 @@ class DashboardMetrics:
             self.card_metric(
                 "📋 Conformidade",
                 f"{conformidade:.1f}%",
-                variacao=f"{delta_conformidade:+.1f}",
-                sufixo_variacao="%",
+                **_variacao_card(comparacao, 'conformidade', f"{delta_conformidade:+.1f}"),
                 cor_fundo="#a29bfe22",
                 cor_borda="#a29bfe",
                 icone="📋",
@@ -364,9 +471,97 @@ class DashboardMetrics:
         
         return relatorio
     
-    def comparar_periodos(self, df_anterior: pd.DataFrame) -> Dict[str, float]:
+    def periodo_atual(self) -> Optional[Tuple[date, date]]:
+        """
+        Período selecionado: interseção dos filtros de período ou, sem eles,
+        as datas mínima e máxima dos dados filtrados
+        """
+        periodos = [
+            self.filtros[chave] for chave in FILTROS_PERIODO
+            if self.filtros.get(chave) and len(self.filtros[chave]) == 2
+        ]
+        if periodos:
+            return (
+                max(pd.Timestamp(inicio) for inicio, _ in periodos).date(),
+                min(pd.Timestamp(fim) for _, fim in periodos).date()
+            )
+        
+        datas = self.df['Data_Teste']
+        if datas.isna().all():
+            return None
+        return datas.min().date(), datas.max().date()
+    
+    def comparar_periodos(self, modo: Union[str, pd.DataFrame], num_dias: Optional[int] = None,
+                          filtrar_periodo: Optional[Callable[[tuple], pd.DataFrame]] = None) -> Dict[str, Any]:
         """
-        Compara métricas com período anterior
+        Compara as métricas do período selecionado com um período de referência
+        
+        Os dois períodos são agregados juntos: pelo cubo, quando ele responde
+        aos filtros, ou em uma única passada agrupada sobre as linhas que
+        atendem aos demais filtros. O resultado fica guardado na instância.
+        
+        A forma anterior, comparar_periodos(df_anterior), continua aceita: com
+        um DataFrame no lugar do modo, retorna apenas as variações percentuais
+        em relação a ele, como antes.
+        
+        Args:
+            modo: 'periodo_anterior', 'ano_anterior' ou 'janela_movel' (ver MODOS_COMPARACAO),
+                ou o DataFrame do período anterior (forma anterior)
+            num_dias: Tamanho das janelas do modo 'janela_movel'
+            filtrar_periodo: Função que recebe um período (início, fim) e retorna as
+                linhas que atendem aos demais filtros nesse período
+                (ex.: DashboardFilters.aplicar_filtros_periodo)
+        
+        Returns:
+            Dicionário com 'janelas' (atual, referência), 'atual' e 'referencia'
+            (métricas de cada período, None sem registros) e as variações
+            percentuais '{metrica}_variacao'; vazio quando não é possível comparar
+        """
+        if isinstance(modo, pd.DataFrame):
+            return self._comparar_com_df(modo)
+        
+        num_dias = num_dias or COMPARACAO_CONFIG['dias_janela_movel']
+        chave = (modo, num_dias)
+        if chave in self._comparacoes:
+            return self._comparacoes[chave]
+        
+        periodo = self.periodo_atual() if not self.df.empty else None
+        if periodo is None:
+            return {}
+        janelas = janelas_comparacao(modo, periodo[0], periodo[1], num_dias)
+        
+        # As janelas só saem do cubo quando as métricas principais também saíram
+        self.obter_agregados()
+        if self.origem_agregados == 'cubo':
+            agregados = self.cubo.agregados_janelas(self.filtros, list(janelas))
+        elif filtrar_periodo is not None:
+            # Uma única seleção cobre as duas janelas; a passada agrupada as separa
+            inicio = min(janela[0] for janela in janelas)
+            fim = max(janela[1] for janela in janelas)
+            agregados = calcular_agregados_janelas(filtrar_periodo((inicio, fim)), list(janelas))
+        else:
+            return {}
+        
+        atual, referencia = [
+            None if agregado is None else {
+                **metricas_basicas(agregado), 'conformidade': calcular_conformidade(agregado)
+            }
+            for agregado in agregados
+        ]
+        
+        comparacao = {'janelas': janelas, 'atual': atual, 'referencia': referencia}
+        if atual is not None and referencia is not None:
+            for metrica in METRICAS_COMPARADAS:
+                valor_ref = referencia.get(metrica)
+                if metrica in atual and valor_ref and not np.isnan(valor_ref):
+                    comparacao[f'{metrica}_variacao'] = (atual[metrica] - valor_ref) / valor_ref * 100
+        
+        self._comparacoes[chave] = comparacao
+        return comparacao
+    
+    def _comparar_com_df(self, df_anterior: pd.DataFrame) -> Dict[str, float]:
+        """
+        Compara métricas com período anterior (forma anterior de `comparar_periodos`)
         
         Args:
             df_anterior: DataFrame do período anterior
@@ -390,35 +585,53 @@ class DashboardMetrics:
         return comparacao
 
 
+def _variacao_card(comparacao: Optional[Dict[str, Any]], metrica: str,
+                   variacao_meta: Optional[str] = None, sufixo_meta: str = "%") -> Dict[str, Any]:
+    """
+    Argumentos de variação de um card
+    
+    Sem comparação, usa a diferença em relação à meta (quando houver); com
+    comparação, a variação percentual em relação ao período de referência.
+    """
+    if comparacao is None:
+        return {'variacao': variacao_meta, 'sufixo_variacao': sufixo_meta if variacao_meta else ""}
+    
+    variacao = comparacao.get(f'{metrica}_variacao')
+    if variacao is None:
+        return {}
+    return {'variacao': f"{variacao:+.1f}", 'sufixo_variacao': "%"}
+
+
 def calcular_kpis_personalizados(df: pd.DataFrame, configuracao: Dict[str, Any]) -> Dict[str, float]:
     """
     Calcula KPIs personalizados baseados em configuração do usuário
     
+    Todos os KPIs são avaliados juntos por calcular_kpis, com contagens por
+    código de categoria e faixa, em vez de uma máscara por modelo e por faixa.
+    
     Args:
         df: DataFrame com os dados
-        configuracao: Dicionário com configuração dos KPIs
+        configuracao: Dicionário com configuração dos KPIs: 'eficiencia_faixas'
+            (nome -> (min, max)), 'conformidade_por_modelo' (bool) e 'kpis'
+            (nome -> definição, ver metrics_engine.calcular_kpis), por exemplo
+            {'perdas_por_tipo': {'agregacao': 'media', 'coluna': 'Perdas_Totais_kW', 'por': 'Tipo_Ensaio'}}
         
     Returns:
         Dicionário com os KPIs calculados
     """
-    kpis = {}
-    
-    if df.empty:
-        return kpis
+    definicoes = {}
     
     # KPI de eficiência por faixa
-    if configuracao.get('eficiencia_faixas'):
-        for faixa, (min_val, max_val) in configuracao['eficiencia_faixas'].items():
-            mask = (df['Eficiencia_Percentual'] >= min_val) & (df['Eficiencia_Percentual'] < max_val)
-            kpis[f'eficiencia_{faixa}'] = len(df[mask])
+    for faixa, (min_val, max_val) in (configuracao.get('eficiencia_faixas') or {}).items():
+        definicoes[f'eficiencia_{faixa}'] = {
+            'agregacao': 'contagem', 'coluna': 'Eficiencia_Percentual', 'faixa': (min_val, max_val)
+        }
     
     # KPI de conformidade por modelo
     if configuracao.get('conformidade_por_modelo'):
-        for modelo in df['Modelo'].unique():
-            df_modelo = df[df['Modelo'] == modelo]
-            aprovados = len(df_modelo[df_modelo['Status_Aprovacao'] == 'Aprovado'])
-            total = len(df_modelo)
-            kpis[f'conformidade_{modelo}'] = (aprovados / total * 100) if total > 0 else 0
+        definicoes['conformidade'] = {'agregacao': 'taxa_aprovacao', 'por': 'Modelo'}
     
-    return kpis
-
+    # KPIs definidos pelo usuário, avaliados na mesma passada
+    definicoes.update(configuracao.get('kpis') or {})
+    
+    return calcular_kpis(df, definicoes)
@@ -0,0 +1,1045 @@
+"""
+Módulo do motor de agregação das métricas
+Este módulo contém os agregados combináveis (contagem, média, soma dos
+quadrados dos desvios, mínimo, máximo e testes fora de especificação)
+calculados em uma única passada por coluna e usados pelos KPIs, e o cubo
+pré-agregado que responde às métricas sem ler as linhas
+"""
+
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+import streamlit as st
+from config import (
+    AGREGACAO_CONFIG, METRICAS_CONFIG, QUANTIS_CONFIG, FILTROS_LISTA, FILTROS_PERIODO, FILTROS_FAIXA
+)
+from quantile_sketch import EsbocoQuantis, construir_esboco, definir_faixas, indices_faixas
+
+
+# Colunas numéricas agregadas para os KPIs
+COLUNAS_AGREGADAS = [
+    'Eficiencia_Percentual',
+    'Elevacao_Temperatura_C',
+    'Perdas_Totais_kW',
+    'Potencia_Nominal_MVA',
+    'Corrente_Excitacao_A'
+]
+
+# Colunas categóricas cujas contagens são usadas nos KPIs e no relatório
+COLUNAS_CONTADAS = ['Modelo', 'Tipo_Ensaio', 'Status_Aprovacao']
+
+# Dimensões do cubo de métricas (além do dia de 'Data_Teste')
+DIMENSOES_CUBO = ['Modelo', 'Tipo_Ensaio', 'Status_Aprovacao', 'Potencia_Nominal_MVA']
+
+# Colunas com esboço de quantis (percentis da eficiência e boxplot de temperatura)
+COLUNAS_QUANTIS = ['Eficiencia_Percentual', 'Elevacao_Temperatura_C']
+
+# Agregações aceitas nas definições de KPIs (ver calcular_kpis)
+AGREGACOES_KPI = ['contagem', 'taxa_aprovacao', 'soma', 'media', 'minimo', 'maximo', 'desvio_padrao']
+
+# Critério de especificação por coluna: (operador que indica falha, chave em METRICAS_CONFIG)
+ESPECIFICACOES = {
+    'Eficiencia_Percentual': ('<', 'eficiencia_minima'),
+    'Elevacao_Temperatura_C': ('>', 'temperatura_maxima'),
+    'Perdas_Totais_kW': ('>', 'perdas_maximas')
+}
+
+
+class AgregadosColuna:
+    """
+    Agregados de uma coluna numérica, com um elemento por grupo
+    
+    Os grupos podem ser combinados (fórmula de Chan para a variância) sem
+    reler as linhas: a média e o desvio padrão de qualquer união de grupos
+    saem apenas dos agregados.
+    """
+    
+    def __init__(self, contagem: np.ndarray, media: np.ndarray, m2: np.ndarray,
+                 minimo: np.ndarray, maximo: np.ndarray, fora_spec: np.ndarray):
+        self.contagem = contagem
+        self.media = media
+        self.m2 = m2
+        self.minimo = minimo
+        self.maximo = maximo
+        self.fora_spec = fora_spec
+    
+    def combinar(self, selecao: Optional[np.ndarray] = None) -> 'AgregadosColuna':
+        """
+        Combina os grupos selecionados em um único grupo
+        
+        Args:
+            selecao: Índices ou máscara dos grupos (None combina todos)
+        
+        Returns:
+            AgregadosColuna com um único grupo
+        """
+        contagem = self.contagem if selecao is None else self.contagem[selecao]
+        media = self.media if selecao is None else self.media[selecao]
+        m2 = self.m2 if selecao is None else self.m2[selecao]
+        minimo = self.minimo if selecao is None else self.minimo[selecao]
+        maximo = self.maximo if selecao is None else self.maximo[selecao]
+        fora_spec = self.fora_spec if selecao is None else self.fora_spec[selecao]
+        
+        total = contagem.sum()
+        com_dados = contagem > 0
+        if total == 0:
+            return AgregadosColuna(
+                np.zeros(1, dtype=np.int64), np.full(1, np.nan), np.zeros(1),
+                np.full(1, np.nan), np.full(1, np.nan), np.zeros(1, dtype=np.int64)
+            )
+        
+        media_total = np.dot(contagem[com_dados], media[com_dados]) / total
+        desvios = media[com_dados] - media_total
+        m2_total = m2[com_dados].sum() + np.dot(contagem[com_dados], desvios * desvios)
+        
+        return AgregadosColuna(
+            np.array([total], dtype=np.int64),
+            np.array([media_total]),
+            np.array([m2_total]),
+            np.array([minimo[com_dados].min()]),
+            np.array([maximo[com_dados].max()]),
+            np.array([fora_spec.sum()], dtype=np.int64)
+        )
+    
+    def combinar_por(self, grupos: np.ndarray, num_grupos: int) -> 'AgregadosColuna':
+        """
+        Combina os grupos em novos grupos de uma vez (um `combinar` por grupo novo)
+        
+        Args:
+            grupos: Grupo novo de cada grupo atual (-1 descarta o grupo)
+            num_grupos: Número de grupos novos
+        
+        Returns:
+            AgregadosColuna com num_grupos grupos (vazios com contagem 0 e NaN)
+        """
+        validos = (grupos >= 0) & (self.contagem > 0)
+        destino = grupos[validos]
+        contagem = self.contagem[validos]
+        media = self.media[validos]
+        
+        total = np.bincount(destino, weights=contagem, minlength=num_grupos)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            media_total = np.bincount(destino, weights=contagem * media, minlength=num_grupos) / total
+        desvios = media - media_total[destino]
+        m2_total = np.bincount(destino, weights=self.m2[validos] + contagem * desvios * desvios,
+                               minlength=num_grupos)
+        
+        minimo = np.full(num_grupos, np.inf)
+        maximo = np.full(num_grupos, -np.inf)
+        np.minimum.at(minimo, destino, self.minimo[validos])
+        np.maximum.at(maximo, destino, self.maximo[validos])
+        
+        vazios = total == 0
+        media_total[vazios] = np.nan
+        minimo[vazios] = np.nan
+        maximo[vazios] = np.nan
+        
+        return AgregadosColuna(
+            total.astype(np.int64), media_total, m2_total, minimo, maximo,
+            np.bincount(destino, weights=self.fora_spec[validos], minlength=num_grupos).astype(np.int64)
+        )
+    
+    def desvio_padrao(self) -> np.ndarray:
+        """Desvio padrão amostral (ddof=1, como no pandas) de cada grupo"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.contagem > 1, np.sqrt(self.m2 / (self.contagem - 1)), np.nan)
+
+
+def _falhas(valores: np.ndarray, coluna: str) -> int:
+    """Conta os valores fora de especificação (NaN nunca conta como falha)"""
+    if coluna not in ESPECIFICACOES:
+        return 0
+    operador, chave = ESPECIFICACOES[coluna]
+    limite = METRICAS_CONFIG[chave]
+    return int(np.count_nonzero(valores < limite if operador == '<' else valores > limite))
+
+
+def agregar_coluna(valores: np.ndarray, coluna: str) -> AgregadosColuna:
+    """
+    Calcula os agregados de uma coluna em uma única passada por blocos
+    
+    Cada bloco cabe no cache do processador: contagem, média, desvios,
+    mínimo, máximo e falhas são calculados sobre o bloco já carregado, e os
+    blocos são combinados no final.
+    
+    Args:
+        valores: Valores da coluna
+        coluna: Nome da coluna (define o critério de especificação)
+    
+    Returns:
+        AgregadosColuna com um único grupo
+    """
+    tamanho_bloco = AGREGACAO_CONFIG['tamanho_bloco']
+    num_blocos = max(1, -(-len(valores) // tamanho_bloco))
+    
+    contagem = np.zeros(num_blocos, dtype=np.int64)
+    media = np.zeros(num_blocos)
+    m2 = np.zeros(num_blocos)
+    minimo = np.full(num_blocos, np.nan)
+    maximo = np.full(num_blocos, np.nan)
+    fora_spec = np.zeros(num_blocos, dtype=np.int64)
+    
+    for i in range(num_blocos):
+        bloco = np.asarray(valores[i * tamanho_bloco:(i + 1) * tamanho_bloco], dtype=np.float64)
+        bloco = bloco[~np.isnan(bloco)]
+        if len(bloco) == 0:
+            continue
+        
+        contagem[i] = len(bloco)
+        media[i] = bloco.mean()
+        desvios = bloco - media[i]
+        m2[i] = np.dot(desvios, desvios)
+        minimo[i] = bloco.min()
+        maximo[i] = bloco.max()
+        fora_spec[i] = _falhas(bloco, coluna)
+    
+    return AgregadosColuna(contagem, media, m2, minimo, maximo, fora_spec).combinar()
+
+
+def _codigos(serie: pd.Series) -> Tuple[np.ndarray, Any]:
+    """Códigos (-1 para ausentes) e valores ordenados de uma coluna"""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.cat.codes.to_numpy(), serie.cat.categories
+    return pd.factorize(serie, sort=True)
+
+
+def _contagens_ordenadas(contagens: np.ndarray, valores) -> Dict[Any, int]:
+    """Dicionário valor -> quantidade, em ordem decrescente, sem valores zerados"""
+    ordem = np.argsort(-contagens, kind='stable')
+    return {valores[i]: int(contagens[i]) for i in ordem if contagens[i] > 0}
+
+
+def _tabela_modelo_status(modelos: np.ndarray, status: np.ndarray, pesos: Optional[np.ndarray],
+                          valores_modelo, valores_status) -> pd.DataFrame:
+    """
+    Tabela de contagens Modelo × Status_Aprovacao (apenas combinações observadas)
+    
+    Args:
+        modelos: Códigos do modelo (-1 para ausentes)
+        status: Códigos do status (-1 para ausentes)
+        pesos: Registros representados por cada elemento (None: um por elemento)
+        valores_modelo: Modelos na ordem dos códigos
+        valores_status: Status na ordem dos códigos
+    
+    Returns:
+        DataFrame com um modelo por linha e um status por coluna
+    """
+    validos = (modelos >= 0) & (status >= 0)
+    num_status = len(valores_status)
+    contagens = np.bincount(
+        modelos[validos] * num_status + status[validos],
+        weights=None if pesos is None else pesos[validos],
+        minlength=len(valores_modelo) * num_status
+    ).astype(np.int64).reshape(len(valores_modelo), num_status)
+    
+    tabela = pd.DataFrame(contagens, index=pd.Index(valores_modelo, name='Modelo'),
+                          columns=pd.Index(valores_status, name='Status_Aprovacao'))
+    return tabela.loc[tabela.sum(axis=1) > 0, tabela.sum(axis=0) > 0]
+
+
+def contar_categorias(serie: pd.Series) -> Dict[Any, int]:
+    """
+    Conta os registros por valor com np.bincount sobre os códigos
+    
+    Args:
+        serie: Coluna categórica ou de texto
+    
+    Returns:
+        Dicionário valor -> quantidade, em ordem decrescente, sem valores zerados
+    """
+    codigos, valores = _codigos(serie)
+    return _contagens_ordenadas(np.bincount(codigos[codigos >= 0], minlength=len(valores)), valores)
+
+
+def calcular_agregados(df: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Calcula, varrendo as linhas, todos os agregados usados pelas métricas
+    
+    Args:
+        df: DataFrame com os dados filtrados
+    
+    Returns:
+        Dicionário com 'total' (registros), 'colunas' (coluna -> AgregadosColuna),
+        'categorias' (coluna -> contagens) e 'modelo_status' (tabela de contagens)
+    """
+    colunas = {
+        coluna: agregar_coluna(df[coluna].to_numpy(), coluna)
+        for coluna in COLUNAS_AGREGADAS if coluna in df.columns
+    }
+    categorias = {
+        coluna: contar_categorias(df[coluna])
+        for coluna in COLUNAS_CONTADAS if coluna in df.columns
+    }
+    
+    codigos_modelo, valores_modelo = _codigos(df['Modelo'])
+    codigos_status, valores_status = _codigos(df['Status_Aprovacao'])
+    
+    return {
+        'total': len(df),
+        'colunas': colunas,
+        'categorias': categorias,
+        'modelo_status': _tabela_modelo_status(
+            codigos_modelo, codigos_status, None, valores_modelo, valores_status
+        )
+    }
+
+
+def taxa_aprovacao_por_modelo(agregados: Dict[str, Any]) -> pd.DataFrame:
+    """
+    Contagens por modelo e status com as colunas 'Total' e 'Taxa_Aprovacao'
+    
+    Args:
+        agregados: Resultado de calcular_agregados ou de CuboMetricas.agregados
+    
+    Returns:
+        DataFrame no formato usado pelo gráfico de aprovação por modelo
+    """
+    aprovacao_modelo = agregados['modelo_status'].copy()
+    aprovacao_modelo['Total'] = aprovacao_modelo.sum(axis=1)
+    aprovacao_modelo['Taxa_Aprovacao'] = (aprovacao_modelo.get('Aprovado', 0) / aprovacao_modelo['Total']) * 100
+    return aprovacao_modelo
+
+
+def esboco_linhas(df: pd.DataFrame, coluna: str, por: Optional[str] = None) -> EsbocoQuantis:
+    """
+    Constrói o esboço de quantis de uma coluna varrendo as linhas
+    
+    Args:
+        df: DataFrame com os dados filtrados
+        coluna: Coluna numérica
+        por: Coluna categórica que define os grupos (None: um único grupo)
+    
+    Returns:
+        EsbocoQuantis
+    """
+    if por is None:
+        return construir_esboco(df[coluna].to_numpy())
+    codigos, valores = _codigos(df[por])
+    return construir_esboco(df[coluna].to_numpy(), codigos, list(valores))
+
+
+def calcular_quartis(valores: np.ndarray) -> Tuple[float, float]:
+    """Q1 e Q3 (interpolação linear, como no pandas) com uma única seleção parcial"""
+    valores = np.asarray(valores, dtype=np.float64)
+    valores = valores[~np.isnan(valores)]
+    if len(valores) == 0:
+        return np.nan, np.nan
+    q25, q75 = np.quantile(valores, [0.25, 0.75])
+    return float(q25), float(q75)
+
+
+def metricas_basicas(agregados: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Monta as métricas básicas a partir dos agregados
+    
+    Args:
+        agregados: Resultado de calcular_agregados
+    
+    Returns:
+        Dicionário com as mesmas chaves de DashboardMetrics.calcular_metricas_basicas
+    """
+    colunas = agregados['colunas']
+    status = agregados['categorias']['Status_Aprovacao']
+    total_status = sum(status.values())
+    
+    metricas = {
+        'total_testes': agregados['total'],
+        'eficiencia_media': float(colunas['Eficiencia_Percentual'].media[0]),
+        'taxa_aprovacao': (status.get('Aprovado', 0) / total_status * 100) if total_status else 0,
+        'temperatura_media': float(colunas['Elevacao_Temperatura_C'].media[0]),
+        'perdas_medias': float(colunas['Perdas_Totais_kW'].media[0])
+    }
+    
+    # Métricas adicionais se as colunas existirem
+    if 'Potencia_Nominal_MVA' in colunas:
+        metricas['potencia_media'] = float(colunas['Potencia_Nominal_MVA'].media[0])
+    
+    if 'Corrente_Excitacao_A' in colunas:
+        metricas['corrente_media'] = float(colunas['Corrente_Excitacao_A'].media[0])
+    
+    return metricas
+
+
+def metricas_avancadas(agregados: Dict[str, Any], quartis_eficiencia: Tuple[float, float]) -> Dict[str, Any]:
+    """
+    Monta as métricas avançadas a partir dos agregados
+    
+    Args:
+        agregados: Resultado de calcular_agregados
+        quartis_eficiencia: Q1 e Q3 da eficiência
+    
+    Returns:
+        Dicionário com as mesmas chaves de DashboardMetrics.calcular_metricas_avancadas
+    """
+    colunas = agregados['colunas']
+    eficiencia = colunas['Eficiencia_Percentual']
+    temperatura = colunas['Elevacao_Temperatura_C']
+    perdas = colunas['Perdas_Totais_kW']
+    q25, q75 = quartis_eficiencia
+    
+    return {
+        # Estatísticas de eficiência
+        'eficiencia_std': float(eficiencia.desvio_padrao()[0]),
+        'eficiencia_min': float(eficiencia.minimo[0]),
+        'eficiencia_max': float(eficiencia.maximo[0]),
+        'eficiencia_q25': q25,
+        'eficiencia_q75': q75,
+        
+        # Estatísticas de temperatura
+        'temperatura_std': float(temperatura.desvio_padrao()[0]),
+        'temperatura_min': float(temperatura.minimo[0]),
+        'temperatura_max': float(temperatura.maximo[0]),
+        
+        # Estatísticas de perdas
+        'perdas_std': float(perdas.desvio_padrao()[0]),
+        'perdas_min': float(perdas.minimo[0]),
+        'perdas_max': float(perdas.maximo[0]),
+        
+        # Contagens por categoria (categorias sem testes já são descartadas)
+        'testes_por_modelo': dict(agregados['categorias']['Modelo']),
+        'testes_por_tipo': dict(agregados['categorias']['Tipo_Ensaio']),
+        
+        # Métricas de qualidade
+        'testes_fora_spec_temp': int(temperatura.fora_spec[0]),
+        'testes_fora_spec_efic': int(eficiencia.fora_spec[0]),
+        'testes_fora_spec_perdas': int(perdas.fora_spec[0])
+    }
+
+
+def calcular_conformidade(agregados: Dict[str, Any]) -> float:
+    """
+    Percentual de testes dentro das especificações (mesmo critério do card de conformidade)
+    
+    Args:
+        agregados: Resultado de calcular_agregados
+    
+    Returns:
+        Conformidade em %
+    """
+    total_fora_spec = sum(
+        int(agregados['colunas'][coluna].fora_spec[0])
+        for coluna in ESPECIFICACOES if coluna in agregados['colunas']
+    )
+    return (agregados['total'] - total_fora_spec) / max(agregados['total'], 1) * 100
+
+
+def calcular_kpis(df: pd.DataFrame, definicoes: Dict[str, dict]) -> Dict[str, Any]:
+    """
+    Calcula KPIs declarados pelo usuário em uma única passada agrupada
+    
+    Cada definição tem a 'agregacao' (ver AGREGACOES_KPI) e, conforme o caso:
+    'coluna' (obrigatória, exceto em 'contagem' e 'taxa_aprovacao'), 'faixa'
+    (min, max), com min inclusivo, max exclusivo e None sem limite, avaliada
+    sobre 'coluna_faixa' (padrão: 'coluna'), e 'por' (coluna categórica: um
+    KPI '{nome}_{valor}' por valor, na ordem em que aparecem).
+    
+    Definições com o mesmo 'por' e a mesma coluna de faixa compartilham as
+    células grupo × faixa: os limites de todas as faixas entram em uma única
+    np.digitize, as contagens saem de np.bincount e cada coluna é agregada uma
+    vez por célula. Cada KPI apenas combina células, sem reler as linhas.
+    
+    Args:
+        df: DataFrame com os dados
+        definicoes: Dicionário nome -> definição
+    
+    Returns:
+        Dicionário com os KPIs calculados, na ordem das definições
+    """
+    for nome, definicao in definicoes.items():
+        _validar_definicao_kpi(df, nome, definicao)
+    
+    if df.empty:
+        return {}
+    
+    planos = {}
+    for nome, definicao in definicoes.items():
+        coluna_faixa = definicao.get('coluna_faixa', definicao.get('coluna')) if definicao.get('faixa') else None
+        planos.setdefault((definicao.get('por'), coluna_faixa), {})[nome] = definicao
+    
+    resultados = {}
+    for (por, coluna_faixa), definicoes_plano in planos.items():
+        resultados.update(_kpis_celulas(df, por, coluna_faixa, definicoes_plano))
+    
+    kpis = {}
+    for nome in definicoes:
+        kpis.update(resultados[nome])
+    return kpis
+
+
+def _validar_definicao_kpi(df: pd.DataFrame, nome: str, definicao: dict):
+    """
+    Verifica uma definição de KPI antes de montar as células
+    
+    Args:
+        df: DataFrame com os dados
+        nome: Nome do KPI (usado nas mensagens de erro)
+        definicao: Definição do KPI (ver calcular_kpis)
+    
+    Raises:
+        ValueError: Se a agregação for desconhecida, faltar a coluna exigida,
+            a faixa não for um par (min, max) ou uma coluna não existir nos dados
+    """
+    agregacao = definicao.get('agregacao')
+    if agregacao not in AGREGACOES_KPI:
+        raise ValueError(f"Agregação de KPI desconhecida em '{nome}': {agregacao}")
+    if agregacao not in ('contagem', 'taxa_aprovacao') and not definicao.get('coluna'):
+        raise ValueError(f"KPI '{nome}': a agregação '{agregacao}' exige 'coluna'")
+    
+    faixa = definicao.get('faixa')
+    if faixa:
+        if not isinstance(faixa, (tuple, list)) or len(faixa) != 2:
+            raise ValueError(f"KPI '{nome}': 'faixa' deve ser um par (min, max), recebido {faixa!r}")
+        if not definicao.get('coluna_faixa', definicao.get('coluna')):
+            raise ValueError(f"KPI '{nome}': 'faixa' exige 'coluna_faixa' ou 'coluna'")
+    
+    for chave in ('coluna', 'coluna_faixa', 'por'):
+        coluna = definicao.get(chave)
+        if coluna is not None and coluna not in df.columns:
+            raise ValueError(f"KPI '{nome}': coluna '{coluna}' ('{chave}') não existe nos dados")
+
+
+def _kpis_celulas(df: pd.DataFrame, por: Optional[str], coluna_faixa: Optional[str],
+                  definicoes: Dict[str, dict]) -> Dict[str, Dict[str, Any]]:
+    """
+    Avalia as definições que compartilham o agrupamento e a coluna de faixa
+    
+    Args:
+        df: DataFrame com os dados (não vazio)
+        por: Coluna que define os grupos (None: um único grupo)
+        coluna_faixa: Coluna das faixas (None: definições sem faixa)
+        definicoes: Dicionário nome -> definição
+    
+    Returns:
+        Dicionário nome -> KPIs da definição
+    """
+    # Grupos na ordem em que aparecem (como em Series.unique); ausentes ficam de fora
+    if por is None:
+        grupos, rotulos = np.zeros(len(df), dtype=np.int64), [None]
+    else:
+        grupos, rotulos = pd.factorize(df[por])
+        grupos, rotulos = np.asarray(grupos, dtype=np.int64), list(rotulos)
+    
+    # Uma faixa elementar entre cada par de limites consecutivos; NaN não entra em nenhuma
+    limites = np.array([])
+    faixas = np.zeros(len(df), dtype=np.int64)
+    if coluna_faixa is not None:
+        limites = np.unique(np.array([
+            limite for definicao in definicoes.values() for limite in definicao['faixa'] if limite is not None
+        ], dtype=np.float64))
+        valores = np.asarray(df[coluna_faixa].to_numpy(), dtype=np.float64)
+        faixas = np.where(np.isnan(valores), -1, np.digitize(valores, limites))
+    num_faixas = len(limites) + 1
+    
+    validas = (grupos >= 0) & (faixas >= 0)
+    celula_linha = grupos[validas] * num_faixas + faixas[validas]
+    num_celulas = len(rotulos) * num_faixas
+    linhas = np.bincount(celula_linha, minlength=num_celulas)
+    
+    aprovados = None
+    if any(definicao['agregacao'] == 'taxa_aprovacao' for definicao in definicoes.values()):
+        aprovacoes = (df['Status_Aprovacao'] == 'Aprovado').to_numpy()[validas]
+        aprovados = np.bincount(celula_linha, weights=aprovacoes, minlength=num_celulas)
+    
+    # Agregados por célula ocupada das colunas numéricas, com as linhas ordenadas uma única vez
+    colunas_numericas = {
+        definicao['coluna'] for definicao in definicoes.values()
+        if definicao['agregacao'] not in ('contagem', 'taxa_aprovacao')
+    }
+    ocupadas = np.flatnonzero(linhas)
+    colunas = {}
+    if colunas_numericas and len(ocupadas) > 0:
+        ordem = np.flatnonzero(validas)[np.argsort(celula_linha, kind='stable')]
+        inicios = np.concatenate(([0], np.cumsum(linhas[ocupadas])[:-1]))
+        colunas = {
+            coluna: agregar_celulas(df[coluna].to_numpy()[ordem], inicios, coluna)
+            for coluna in colunas_numericas
+        }
+    
+    resultados = {}
+    for nome, definicao in definicoes.items():
+        agregacao = definicao['agregacao']
+        limite_min, limite_max = definicao.get('faixa') or (None, None)
+        primeira = 0 if limite_min is None else int(np.searchsorted(limites, limite_min)) + 1
+        ultima = num_faixas if limite_max is None else int(np.searchsorted(limites, limite_max)) + 1
+        
+        if agregacao in ('contagem', 'taxa_aprovacao'):
+            total = linhas.reshape(-1, num_faixas)[:, primeira:ultima].sum(axis=1)
+            if agregacao == 'contagem':
+                valores = [int(valor) for valor in total]
+            else:
+                aprovados_grupo = aprovados.reshape(-1, num_faixas)[:, primeira:ultima].sum(axis=1)
+                valores = [
+                    float(aprovado / quantidade * 100) if quantidade > 0 else 0
+                    for aprovado, quantidade in zip(aprovados_grupo, total)
+                ]
+        else:
+            if definicao['coluna'] in colunas:
+                faixa_celula = ocupadas % num_faixas
+                destino = np.where((faixa_celula >= primeira) & (faixa_celula < ultima),
+                                   ocupadas // num_faixas, -1)
+                agregados = colunas[definicao['coluna']].combinar_por(destino, len(rotulos))
+            else:
+                vazios = np.zeros(len(rotulos), dtype=np.int64)
+                agregados = AgregadosColuna(vazios, np.full(len(rotulos), np.nan), np.zeros(len(rotulos)),
+                                            np.full(len(rotulos), np.nan), np.full(len(rotulos), np.nan), vazios)
+            valores = {
+                'soma': np.where(agregados.contagem > 0, agregados.contagem * agregados.media, 0.0),
+                'media': agregados.media,
+                'minimo': agregados.minimo,
+                'maximo': agregados.maximo,
+                'desvio_padrao': agregados.desvio_padrao()
+            }[agregacao]
+            valores = [float(valor) for valor in valores]
+        
+        if por is None:
+            resultados[nome] = {nome: valores[0]}
+        else:
+            resultados[nome] = {f'{nome}_{rotulo}': valor for rotulo, valor in zip(rotulos, valores)}
+    
+    return resultados
+
+
+def janelas_comparacao(modo: str, data_inicio: date, data_fim: date,
+                       num_dias: int) -> Tuple[Tuple[date, date], Tuple[date, date]]:
+    """
+    Define o período atual e o de referência de uma comparação
+    
+    Args:
+        modo: 'periodo_anterior', 'ano_anterior' ou 'janela_movel'
+        data_inicio: Início do período selecionado
+        data_fim: Fim do período selecionado
+        num_dias: Tamanho das janelas do modo 'janela_movel'
+    
+    Returns:
+        Tupla (período atual, período de referência), cada um como (início, fim)
+    """
+    if modo == 'periodo_anterior':
+        duracao = data_fim - data_inicio + timedelta(days=1)
+        return (data_inicio, data_fim), (data_inicio - duracao, data_inicio - timedelta(days=1))
+    if modo == 'ano_anterior':
+        um_ano = pd.DateOffset(years=1)
+        return (data_inicio, data_fim), (
+            (pd.Timestamp(data_inicio) - um_ano).date(), (pd.Timestamp(data_fim) - um_ano).date()
+        )
+    if modo == 'janela_movel':
+        atual = (data_fim - timedelta(days=num_dias - 1), data_fim)
+        return atual, (atual[0] - timedelta(days=num_dias), atual[0] - timedelta(days=1))
+    raise ValueError(f"Modo de comparação desconhecido: {modo}")
+
+
+def calcular_agregados_janelas(df: pd.DataFrame,
+                               janelas: List[Tuple[date, date]]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Agregados de cada janela de datas em uma única passada agrupada
+    
+    Cada linha recebe o índice da janela que contém sua data; as linhas são
+    ordenadas uma vez por janela e cada coluna é agregada por grupo.
+    
+    Args:
+        df: DataFrame com os demais filtros já aplicados
+        janelas: Lista de períodos (início, fim), ambos inclusivos
+    
+    Returns:
+        Lista com os agregados de cada janela (None para janelas sem registros),
+        com as chaves 'total', 'colunas' e 'categorias'
+    """
+    # Janelas sobrepostas (ex.: seleção maior que um ano vs. ano anterior) são agregadas separadamente
+    ordenadas = sorted(janelas)
+    if any(anterior[1] >= seguinte[0] for anterior, seguinte in zip(ordenadas, ordenadas[1:])):
+        return [calcular_agregados_janelas(df, [janela])[0] for janela in janelas]
+    
+    dias = _chaves_dia(df)
+    rotulos = np.full(len(df), -1, dtype=np.int64)
+    for i, (data_inicio, data_fim) in enumerate(janelas):
+        rotulos[(dias >= 0) & (dias >= _dia(data_inicio)) & (dias <= _dia(data_fim))] = i
+    
+    selecionadas = np.flatnonzero(rotulos >= 0)
+    ordem = selecionadas[np.argsort(rotulos[selecionadas], kind='stable')]
+    contagens = np.bincount(rotulos[selecionadas], minlength=len(janelas))
+    ocupadas = np.flatnonzero(contagens > 0)
+    if len(ocupadas) == 0:
+        return [None] * len(janelas)
+    inicios = np.concatenate(([0], np.cumsum(contagens[ocupadas])[:-1]))
+    
+    colunas = {
+        coluna: agregar_celulas(df[coluna].to_numpy()[ordem], inicios, coluna)
+        for coluna in COLUNAS_AGREGADAS if coluna in df.columns
+    }
+    
+    categorias = {}
+    for coluna in COLUNAS_CONTADAS:
+        if coluna in df.columns:
+            codigos, valores = _codigos(df[coluna])
+            codigos = np.asarray(codigos[selecionadas], dtype=np.int64)
+            validos = codigos >= 0
+            matriz = np.bincount(
+                rotulos[selecionadas][validos] * len(valores) + codigos[validos],
+                minlength=len(janelas) * len(valores)
+            ).reshape(len(janelas), len(valores))
+            categorias[coluna] = (matriz, valores)
+    
+    resultado = [None] * len(janelas)
+    for grupo, janela in enumerate(ocupadas):
+        resultado[janela] = {
+            'total': int(contagens[janela]),
+            'colunas': {coluna: agregados.combinar([grupo]) for coluna, agregados in colunas.items()},
+            'categorias': {
+                coluna: _contagens_ordenadas(matriz[janela], valores)
+                for coluna, (matriz, valores) in categorias.items()
+            }
+        }
+    return resultado
+
+
+def agregar_celulas(valores: np.ndarray, inicios: np.ndarray, coluna: str) -> AgregadosColuna:
+    """
+    Calcula os agregados de cada célula do cubo
+    
+    Args:
+        valores: Valores da coluna, ordenados por célula
+        inicios: Posição da primeira linha de cada célula (células não vazias)
+        coluna: Nome da coluna (define o critério de especificação)
+    
+    Returns:
+        AgregadosColuna com um grupo por célula
+    """
+    valores = np.asarray(valores, dtype=np.float64)
+    validos = ~np.isnan(valores)
+    contagem = np.add.reduceat(validos.astype(np.int64), inicios)
+    
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media = np.add.reduceat(np.where(validos, valores, 0.0), inicios) / contagem
+    media = np.where(contagem > 0, media, 0.0)
+    
+    tamanhos = np.diff(np.append(inicios, len(valores)))
+    desvios = np.where(validos, valores - np.repeat(media, tamanhos), 0.0)
+    m2 = np.add.reduceat(desvios * desvios, inicios)
+    
+    minimo = np.minimum.reduceat(np.where(validos, valores, np.inf), inicios)
+    maximo = np.maximum.reduceat(np.where(validos, valores, -np.inf), inicios)
+    minimo[contagem == 0] = np.nan
+    maximo[contagem == 0] = np.nan
+    
+    if coluna in ESPECIFICACOES:
+        operador, chave = ESPECIFICACOES[coluna]
+        limite = METRICAS_CONFIG[chave]
+        falhas = valores < limite if operador == '<' else valores > limite
+        fora_spec = np.add.reduceat(falhas.astype(np.int64), inicios)
+    else:
+        fora_spec = np.zeros(len(inicios), dtype=np.int64)
+    
+    return AgregadosColuna(contagem, media, m2, minimo, maximo, fora_spec)
+
+
+def _chaves_dia(df: pd.DataFrame) -> np.ndarray:
+    """Dias desde 1970-01-01 (-1 para datas ausentes), reaproveitando 'Chave_Dia'"""
+    if 'Chave_Dia' in df.columns:
+        return df['Chave_Dia'].to_numpy().astype(np.int64)
+    datas = df['Data_Teste'].to_numpy()
+    return np.where(np.isnat(datas), -1, datas.astype('datetime64[D]').astype(np.int64))
+
+
+def _dia(valor) -> int:
+    """Converte uma data do filtro em dias desde 1970-01-01"""
+    return int(pd.Timestamp(valor).to_datetime64().astype('datetime64[D]').astype(np.int64))
+
+
+class CuboMetricas:
+    """
+    Cubo pré-agregado Modelo × Tipo_Ensaio × Status_Aprovacao × Potencia_Nominal_MVA × dia
+    
+    Cada célula não vazia guarda os agregados combináveis das colunas
+    numéricas. Filtros de lista e de período apenas selecionam células, e as
+    métricas saem da combinação das células selecionadas, sem ler as linhas.
+    Filtros de faixa e expressões não são representáveis no cubo.
+    """
+    
+    def __init__(self, df: pd.DataFrame):
+        self.num_linhas = len(df)
+        self.dimensoes = [dim for dim in DIMENSOES_CUBO if dim in df.columns]
+        self.valores = {}
+        self.posicoes = {}
+        
+        codigos = []
+        tamanhos = []
+        for dim in self.dimensoes:
+            codigos_dim, valores = _codigos(df[dim])
+            self.valores[dim] = list(valores)
+            self.posicoes[dim] = {valor: i for i, valor in enumerate(valores)}
+            # Ausentes recebem um código próprio (não selecionado por nenhum filtro)
+            codigos.append(np.where(codigos_dim < 0, len(valores), codigos_dim))
+            tamanhos.append(len(valores) + 1)
+        
+        self.tem_datas = 'Data_Teste' in df.columns
+        dias = _chaves_dia(df) if self.tem_datas else np.full(self.num_linhas, -1, dtype=np.int64)
+        self.dia_inicial = int(dias[dias >= 0].min()) if (dias >= 0).any() else 0
+        codigos.append(np.where(dias < 0, 0, dias - self.dia_inicial + 1))
+        tamanhos.append(int(codigos[-1].max(initial=0)) + 1)
+        
+        chaves = np.ravel_multi_index(codigos, tamanhos)
+        celulas, inverso, self.contagem = np.unique(chaves, return_inverse=True, return_counts=True)
+        
+        # Sem redução suficiente (ex.: potências contínuas), varrer as linhas é mais barato
+        self.viavel = len(celulas) <= AGREGACAO_CONFIG['limite_celulas_cubo'] * max(self.num_linhas, 1)
+        if not self.viavel:
+            return
+        
+        coordenadas = np.unravel_index(celulas, tamanhos)
+        self.coordenadas = {
+            dim: np.where(coordenada == len(self.valores[dim]), -1, coordenada)
+            for dim, coordenada in zip(self.dimensoes, coordenadas)
+        }
+        self.dias = np.where(coordenadas[-1] == 0, -1, coordenadas[-1] + self.dia_inicial - 1)
+        
+        ordem = np.argsort(inverso.ravel(), kind='stable')
+        inicios = np.concatenate(([0], np.cumsum(self.contagem)[:-1]))
+        self.colunas = {
+            coluna: agregar_celulas(df[coluna].to_numpy()[ordem], inicios, coluna)
+            for coluna in COLUNAS_AGREGADAS if coluna in df.columns
+        }
+        
+        # Esboços de quantis por célula, guardados apenas nas combinações (célula, faixa) ocupadas
+        self.esbocos = {}
+        if QUANTIS_CONFIG['modo'] == 'esboco':
+            celula_linha = np.repeat(np.arange(self.num_celulas, dtype=np.int64), self.contagem)
+            for coluna in COLUNAS_QUANTIS:
+                if coluna in df.columns:
+                    self.esbocos[coluna] = _esboco_celulas(df[coluna].to_numpy()[ordem], celula_linha)
+        
+        # Limites das colunas de faixa, para reconhecer sliders que não restringem nada
+        self.limites_faixa = {}
+        for coluna in FILTROS_FAIXA.values():
+            if coluna in self.colunas:
+                total = self.colunas[coluna].combinar()
+                self.limites_faixa[coluna] = (
+                    total.minimo[0], total.maximo[0], total.contagem[0] < self.num_linhas
+                )
+    
+    @property
+    def num_celulas(self) -> int:
+        """Número de células não vazias"""
+        return len(self.contagem)
+    
+    def responde(self, filtros: dict) -> bool:
+        """
+        Verifica se os filtros podem ser resolvidos apenas com as células do cubo
+        
+        Args:
+            filtros: Dicionário com os filtros selecionados
+        
+        Returns:
+            True quando só há filtros de lista e de período ativos
+        """
+        if not self.viavel or filtros.get('expressao'):
+            return False
+        
+        for chave, coluna in FILTROS_FAIXA.items():
+            if not filtros.get(chave) or coluna not in self.limites_faixa:
+                continue
+            valor_min, valor_max = filtros[chave]
+            coluna_min, coluna_max, tem_ausentes = self.limites_faixa[coluna]
+            if not (valor_min <= coluna_min and valor_max >= coluna_max and not tem_ausentes):
+                return False
+        return True
+    
+    def selecionar(self, filtros: dict, com_periodo: bool = True) -> np.ndarray:
+        """
+        Seleciona as células que atendem aos filtros de lista e de período
+        
+        Args:
+            filtros: Dicionário com os filtros selecionados
+            com_periodo: Se False, os filtros de período são ignorados
+        
+        Returns:
+            Máscara booleana sobre as células
+        """
+        mascara = np.ones(self.num_celulas, dtype=bool)
+        
+        for chave, coluna in FILTROS_LISTA.items():
+            if filtros.get(chave) and coluna in self.coordenadas:
+                codigos = [self.posicoes[coluna][valor] for valor in filtros[chave] if valor in self.posicoes[coluna]]
+                mascara &= np.isin(self.coordenadas[coluna], codigos)
+        
+        for chave in FILTROS_PERIODO if com_periodo else []:
+            if filtros.get(chave) and len(filtros[chave]) == 2 and self.tem_datas:
+                data_inicio, data_fim = filtros[chave]
+                mascara &= (self.dias >= 0) & (self.dias >= _dia(data_inicio)) & (self.dias <= _dia(data_fim))
+        
+        return mascara
+    
+    def agregados(self, filtros: dict) -> Dict[str, Any]:
+        """
+        Combina as células selecionadas nos mesmos agregados de calcular_agregados
+        
+        Args:
+            filtros: Dicionário com os filtros selecionados (ver `responde`)
+        
+        Returns:
+            Dicionário com 'total', 'colunas', 'categorias' e 'modelo_status'
+        """
+        return self._combinar(self.selecionar(filtros))
+    
+    def agregados_janelas(self, filtros: dict, janelas: List[Tuple[date, date]]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Agregados de cada janela de datas, com os demais filtros aplicados
+        
+        Os filtros de período são ignorados: cada janela substitui o período.
+        
+        Args:
+            filtros: Dicionário com os filtros selecionados (ver `responde`)
+            janelas: Lista de períodos (início, fim), ambos inclusivos
+        
+        Returns:
+            Lista com os agregados de cada janela (None para janelas sem registros)
+        """
+        base = self.selecionar(filtros, com_periodo=False) & (self.dias >= 0)
+        
+        resultado = []
+        for data_inicio, data_fim in janelas:
+            mascara = base & (self.dias >= _dia(data_inicio)) & (self.dias <= _dia(data_fim))
+            resultado.append(self._combinar(mascara) if mascara.any() else None)
+        return resultado
+    
+    def _combinar(self, mascara: np.ndarray) -> Dict[str, Any]:
+        """Combina as células da máscara nos agregados usados pelas métricas"""
+        contagem = self.contagem[mascara]
+        
+        categorias = {}
+        for coluna in COLUNAS_CONTADAS:
+            if coluna in self.coordenadas:
+                codigos = self.coordenadas[coluna][mascara]
+                validos = codigos >= 0
+                contagens = np.bincount(
+                    codigos[validos], weights=contagem[validos], minlength=len(self.valores[coluna])
+                ).astype(np.int64)
+                categorias[coluna] = _contagens_ordenadas(contagens, self.valores[coluna])
+        
+        return {
+            'total': int(contagem.sum()),
+            'colunas': {coluna: agregados.combinar(mascara) for coluna, agregados in self.colunas.items()},
+            'categorias': categorias,
+            'modelo_status': _tabela_modelo_status(
+                self.coordenadas['Modelo'][mascara], self.coordenadas['Status_Aprovacao'][mascara],
+                contagem, self.valores['Modelo'], self.valores['Status_Aprovacao']
+            )
+        }
+    
+    def esboco(self, filtros: dict, coluna: str, por: Optional[str] = None) -> Optional[EsbocoQuantis]:
+        """
+        Combina os esboços de quantis das células selecionadas
+        
+        Args:
+            filtros: Dicionário com os filtros selecionados (ver `responde`)
+            coluna: Coluna numérica (ver COLUNAS_QUANTIS)
+            por: Dimensão do cubo que define os grupos (None: um único grupo)
+        
+        Returns:
+            EsbocoQuantis ou None quando a coluna não tem esboço no cubo
+        """
+        if coluna not in self.esbocos or (por is not None and por not in self.coordenadas):
+            return None
+        
+        esbocos = self.esbocos[coluna]
+        num_faixas = esbocos['num_faixas']
+        selecionadas = self.selecionar(filtros)[esbocos['celulas']]
+        faixas = esbocos['faixas'][selecionadas]
+        pesos = esbocos['contagens'][selecionadas]
+        
+        if por is None:
+            num_grupos, rotulos = 1, None
+            chaves = faixas
+        else:
+            num_grupos, rotulos = len(self.valores[por]), self.valores[por]
+            grupos = self.coordenadas[por][esbocos['celulas'][selecionadas]]
+            validos = grupos >= 0
+            chaves, pesos = grupos[validos] * num_faixas + faixas[validos], pesos[validos]
+        
+        contagens = np.bincount(chaves, weights=pesos, minlength=num_grupos * num_faixas).astype(np.int64)
+        return EsbocoQuantis(
+            esbocos['inicio'], esbocos['largura'], contagens.reshape(num_grupos, num_faixas), rotulos
+        )
+
+
+def _esboco_celulas(valores: np.ndarray, celula_linha: np.ndarray) -> dict:
+    """
+    Contagens esparsas (célula, faixa) do esboço de quantis de uma coluna
+    
+    Args:
+        valores: Valores da coluna, ordenados por célula
+        celula_linha: Célula de cada linha
+    
+    Returns:
+        Dicionário com as faixas ('inicio', 'largura', 'num_faixas') e os
+        arrays 'celulas', 'faixas' e 'contagens' das combinações ocupadas
+    """
+    valores = np.asarray(valores, dtype=np.float64)
+    inicio, largura, num_faixas = definir_faixas(valores)
+    faixas = indices_faixas(valores, inicio, largura, num_faixas)
+    
+    validos = faixas >= 0
+    chaves, contagens = np.unique(celula_linha[validos] * num_faixas + faixas[validos], return_counts=True)
+    
+    return {
+        'inicio': inicio,
+        'largura': largura,
+        'num_faixas': num_faixas,
+        'celulas': (chaves // num_faixas).astype(np.int32),
+        'faixas': (chaves % num_faixas).astype(np.int32),
+        'contagens': contagens.astype(np.int32)
+    }
+
+
+def obter_cubo_metricas(df: pd.DataFrame) -> Optional[CuboMetricas]:
+    """
+    Retorna o cubo de métricas do DataFrame, reaproveitado entre reruns e sessões
+    
+    Como o motor de filtros, o cubo é identificado por df.attrs['versao_dados'];
+    sem versão, com o cubo desativado ou quando ele não reduz os registros o
+    suficiente (ver AGREGACAO_CONFIG['limite_celulas_cubo']), retorna None e as
+    métricas varrem as linhas.
+    
+    Args:
+        df: DataFrame completo
+    
+    Returns:
+        CuboMetricas viável ou None
+    """
+    versao = df.attrs.get('versao_dados')
+    if versao is None or not AGREGACAO_CONFIG['usar_cubo'] or df.empty:
+        return None
+    if not all(coluna in df.columns for coluna in ['Modelo', 'Status_Aprovacao']):
+        return None
+    return _cubo_em_cache(versao, len(df), df)
+
+
+@st.cache_resource(max_entries=4)
+def _cubo_em_cache(versao: str, num_linhas: int, _df: pd.DataFrame) -> Optional[CuboMetricas]:
+    """Constrói o cubo uma vez por versão dos dados (o DataFrame não entra na chave)"""
+    # Descarta o cubo sem construí-lo quando nem os pares (dia, potência) reduzem os registros
+    if _celulas_minimas(_df) > AGREGACAO_CONFIG['limite_celulas_cubo'] * num_linhas:
+        return None
+    cubo = CuboMetricas(_df)
+    return cubo if cubo.viavel else None
+
+
+def _celulas_minimas(df: pd.DataFrame) -> int:
+    """
+    Limite inferior barato do número de células do cubo: pares (dia, potência) distintos
+    
+    Os pares são contados com np.bincount sobre códigos pequenos, sem ordenar
+    as linhas nem codificar as colunas de texto.
+    """
+    dias = _chaves_dia(df) if 'Data_Teste' in df.columns else np.full(len(df), -1, dtype=np.int64)
+    validos = dias >= 0
+    chaves = np.where(validos, dias - (dias[validos].min() if validos.any() else 0) + 1, 0)
+    tamanho = int(chaves.max(initial=0)) + 1
+    
+    if 'Potencia_Nominal_MVA' in df.columns:
+        codigos, valores = _codigos(df['Potencia_Nominal_MVA'])
+        chaves = chaves * (len(valores) + 1) + np.where(codigos < 0, len(valores), codigos)
+        tamanho *= len(valores) + 1
+    
+    if tamanho > 4 * len(df) + 65536:
+        return len(pd.unique(chaves))
+    return int(np.count_nonzero(np.bincount(chaves, minlength=tamanho)))
@@ -0,0 +1,167 @@
+"""
+Módulo dos esboços de quantis
+Este módulo contém o esboço combinável (histograma de faixas fixas) usado
+nos percentis da eficiência e no boxplot de temperatura, com erro máximo
+configurável em QUANTIS_CONFIG
+"""
+
+import math
+from typing import List, Optional, Tuple
+import numpy as np
+from config import QUANTIS_CONFIG
+
+
+class EsbocoQuantis:
+    """
+    Esboço de quantis: contagens por faixa de largura fixa, uma linha por grupo
+    
+    Esboços com as mesmas faixas são combinados somando as contagens, em
+    qualquer ordem. Cada quantil fica a no máximo meia largura de faixa do
+    valor exato, ou seja, erro_relativo × amplitude da coluna.
+    """
+    
+    def __init__(self, inicio: float, largura: float, contagens: np.ndarray,
+                 rotulos: Optional[list] = None):
+        """
+        Args:
+            inicio: Limite inferior da primeira faixa
+            largura: Largura das faixas (0 quando a coluna tem um único valor)
+            contagens: Matriz grupos × faixas
+            rotulos: Nome de cada grupo (None para um único grupo)
+        """
+        self.inicio = inicio
+        self.largura = largura
+        self.contagens = contagens
+        self.rotulos = rotulos
+    
+    def centros(self) -> np.ndarray:
+        """Valor representativo (centro) de cada faixa"""
+        return self.inicio + (np.arange(self.contagens.shape[1]) + 0.5) * self.largura
+    
+    def totais(self) -> np.ndarray:
+        """Número de valores de cada grupo"""
+        return self.contagens.sum(axis=1)
+    
+    def quantis(self, probabilidades: List[float]) -> np.ndarray:
+        """
+        Estima os quantis de cada grupo (interpolação linear, como no pandas)
+        
+        Args:
+            probabilidades: Probabilidades entre 0 e 1
+        
+        Returns:
+            Matriz grupos × probabilidades (NaN para grupos vazios)
+        """
+        acumulado = np.cumsum(self.contagens, axis=1)
+        totais = acumulado[:, -1]
+        centros = self.centros()
+        
+        resultado = np.full((len(totais), len(probabilidades)), np.nan)
+        com_dados = totais > 0
+        acumulado = acumulado[com_dados]
+        totais = totais[com_dados]
+        
+        for j, probabilidade in enumerate(probabilidades):
+            posicao = probabilidade * (totais - 1)
+            ordem = np.floor(posicao)
+            fracao = posicao - ordem
+            # A faixa que contém o k-ésimo valor é a primeira com acumulado > k
+            faixa = (acumulado <= ordem[:, None]).sum(axis=1)
+            faixa_seguinte = (acumulado <= np.minimum(ordem + 1, totais - 1)[:, None]).sum(axis=1)
+            resultado[com_dados, j] = centros[faixa] + fracao * (centros[faixa_seguinte] - centros[faixa])
+        
+        return resultado
+    
+    def cercas(self, q1: np.ndarray, q3: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Limites dos bigodes do boxplot (critério de Tukey: 1,5 × IQR)
+        
+        Args:
+            q1: Primeiro quartil de cada grupo
+            q3: Terceiro quartil de cada grupo
+        
+        Returns:
+            Tupla (cerca inferior, cerca superior) de cada grupo
+        """
+        centros = self.centros()
+        iqr = q3 - q1
+        ocupadas = self.contagens > 0
+        
+        dentro_inferior = ocupadas & (centros >= (q1 - 1.5 * iqr)[:, None])
+        dentro_superior = ocupadas & (centros <= (q3 + 1.5 * iqr)[:, None])
+        inferior = np.where(dentro_inferior, centros, np.inf).min(axis=1)
+        superior = np.where(dentro_superior, centros, -np.inf).max(axis=1)
+        return inferior, superior
+
+
+def definir_faixas(valores: np.ndarray) -> Tuple[float, float, int]:
+    """
+    Define as faixas do esboço de uma coluna a partir da sua amplitude
+    
+    Args:
+        valores: Valores da coluna (NaN é ignorado)
+    
+    Returns:
+        Tupla (início, largura, número de faixas)
+    """
+    num_faixas = math.ceil(1 / (2 * QUANTIS_CONFIG['erro_relativo']))
+    validos = valores[~np.isnan(valores)]
+    if len(validos) == 0:
+        return 0.0, 0.0, num_faixas
+    
+    minimo, maximo = float(validos.min()), float(validos.max())
+    return minimo, (maximo - minimo) / num_faixas, num_faixas
+
+
+def indices_faixas(valores: np.ndarray, inicio: float, largura: float, num_faixas: int) -> np.ndarray:
+    """
+    Converte valores em índices de faixa
+    
+    Args:
+        valores: Valores da coluna
+        inicio: Limite inferior da primeira faixa
+        largura: Largura das faixas
+        num_faixas: Número de faixas
+    
+    Returns:
+        Índice da faixa de cada valor (-1 para NaN)
+    """
+    valores = np.asarray(valores, dtype=np.float64)
+    ausentes = np.isnan(valores)
+    if largura == 0:
+        return np.where(ausentes, -1, 0)
+    
+    with np.errstate(invalid='ignore'):
+        faixas = np.floor((valores - inicio) / largura)
+    faixas = np.clip(np.where(ausentes, 0, faixas), 0, num_faixas - 1).astype(np.int64)
+    return np.where(ausentes, -1, faixas)
+
+
+def construir_esboco(valores: np.ndarray, grupos: Optional[np.ndarray] = None,
+                     rotulos: Optional[list] = None) -> EsbocoQuantis:
+    """
+    Constrói o esboço de uma coluna diretamente das linhas
+    
+    Args:
+        valores: Valores da coluna
+        grupos: Código do grupo de cada linha (-1 para ausentes; None: um único grupo)
+        rotulos: Nome de cada grupo (obrigatório quando há grupos)
+    
+    Returns:
+        EsbocoQuantis
+    """
+    valores = np.asarray(valores, dtype=np.float64)
+    inicio, largura, num_faixas = definir_faixas(valores)
+    faixas = indices_faixas(valores, inicio, largura, num_faixas)
+    
+    num_grupos = 1 if grupos is None else len(rotulos)
+    validos = faixas >= 0
+    if grupos is None:
+        chaves = faixas
+    else:
+        grupos = np.asarray(grupos, dtype=np.int64)
+        chaves = grupos * num_faixas + faixas
+        validos &= grupos >= 0
+    
+    contagens = np.bincount(chaves[validos], minlength=num_grupos * num_faixas)
+    return EsbocoQuantis(inicio, largura, contagens.reshape(num_grupos, num_faixas), rotulos)
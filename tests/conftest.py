@@ -0,0 +1,62 @@
+"""
+Configuração dos testes
+Os módulos do dashboard ficam na raiz do repositório; os testes rodam sem o
+servidor do Streamlit (os caches e o session_state funcionam em modo bare)
+"""
+
+import os
+import sys
+import uuid
+from typing import Optional
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import streamlit as st
+from data_generator import DataGenerator, normalizar_schema
+
+
+@pytest.fixture(autouse=True)
+def limpar_estado_streamlit():
+    """Cada teste começa sem motores, cubos, resultados em cache ou estado de sessão"""
+    st.cache_resource.clear()
+    st.session_state.clear()
+    yield
+    st.cache_resource.clear()
+    st.session_state.clear()
+
+
+@pytest.fixture
+def criar_dados():
+    """
+    Fábrica de DataFrames normalizados, com versão de dados e valores ausentes
+    
+    Args (da função retornada):
+        num_registros: Número de registros
+        fracao_ausentes: Fração de NaN/NaT/categorias ausentes em cada coluna filtrável
+        ordenar: Ordena os registros por 'Data_Teste' (caminho do índice de datas já ordenado)
+        semente: Semente dos valores ausentes
+        num_dias: Concentra as datas nos últimos N dias (None mantém os dois anos gerados)
+    """
+    def criar(num_registros: int = 3000, fracao_ausentes: float = 0.05,
+              ordenar: bool = False, semente: int = 7, num_dias: Optional[int] = None) -> pd.DataFrame:
+        df = DataGenerator().gerar_dados_ficticios(num_registros)
+        rng = np.random.default_rng(semente)
+        
+        if num_dias is not None:
+            fim = df['Data_Teste'].max().normalize()
+            df['Data_Teste'] = fim - pd.to_timedelta(rng.integers(0, num_dias, num_registros), unit='D')
+        
+        for coluna in ['Eficiencia_Percentual', 'Elevacao_Temperatura_C', 'Perdas_Totais_kW', 'Modelo', 'Data_Teste']:
+            df.loc[rng.random(num_registros) < fracao_ausentes, coluna] = None
+        
+        if ordenar:
+            df = df.sort_values('Data_Teste', na_position='first').reset_index(drop=True)
+        
+        df = normalizar_schema(df)
+        df.attrs['versao_dados'] = uuid.uuid4().hex
+        return df
+    
+    return criar
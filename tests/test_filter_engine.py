@@ -0,0 +1,234 @@
+"""
+Testes do motor de filtros
+Compara `DashboardFilters.aplicar_filtros` (índices, planejador, avaliação
+incremental e cache de resultados) com máscaras booleanas simples do pandas
+"""
+
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+import pytest
+from config import FILTROS_PLANO_CONFIG
+from filter_engine import CacheResultados, obter_cache_resultados
+from filters import DashboardFilters
+
+
+def mascara_referencia(df: pd.DataFrame, filtros: dict) -> pd.Series:
+    """Máscara de referência: um predicado do pandas por filtro, como na versão original"""
+    mascara = pd.Series(True, index=df.index)
+    
+    for chave, coluna in [('modelos', 'Modelo'), ('status', 'Status_Aprovacao'), ('tipos_ensaio', 'Tipo_Ensaio'),
+                          ('potencias', 'Potencia_Nominal_MVA'), ('status_rapido', 'Status_Aprovacao')]:
+        if filtros.get(chave):
+            mascara &= df[coluna].isin(filtros[chave])
+    
+    for chave in ['periodo', 'periodo_rapido']:
+        if filtros.get(chave) and len(filtros[chave]) == 2:
+            data_inicio, data_fim = filtros[chave]
+            datas = df['Data_Teste'].dt.date
+            mascara &= df['Data_Teste'].notna() & (datas >= data_inicio) & (datas <= data_fim)
+    
+    for chave, coluna in [('eficiencia_range', 'Eficiencia_Percentual'),
+                          ('temperatura_range', 'Elevacao_Temperatura_C'),
+                          ('perdas_range', 'Perdas_Totais_kW')]:
+        if filtros.get(chave):
+            valor_min, valor_max = filtros[chave]
+            mascara &= (df[coluna] >= valor_min) & (df[coluna] <= valor_max)
+    
+    return mascara
+
+
+def verificar(gerenciador: DashboardFilters, filtros: dict):
+    """Aplica os filtros pelo motor e compara as linhas com a máscara de referência"""
+    df_filtrado = gerenciador.aplicar_filtros(filtros)
+    esperado = gerenciador.df.index[mascara_referencia(gerenciador.df, filtros).to_numpy()]
+    assert df_filtrado.index.equals(esperado), gerenciador.obter_plano_filtros()
+
+
+def limites(df: pd.DataFrame, coluna: str) -> tuple:
+    return float(df[coluna].min()), float(df[coluna].max())
+
+
+def periodo_total(df: pd.DataFrame) -> tuple:
+    return df['Data_Teste'].min().date(), df['Data_Teste'].max().date()
+
+
+@pytest.mark.parametrize('ordenar', [False, True])
+@pytest.mark.parametrize('filtros', [
+    {},
+    {'modelos': ['TSEA-1000', 'TSEA-5000']},
+    {'modelos': ['modelo inexistente']},
+    {'status': ['Reprovado'], 'tipos_ensaio': ['Ensaio de Tipo', 'Ensaio Especial']},
+    {'potencias': [5.0, 10.0]},
+    {'status_rapido': ['Aprovado']},
+    {'eficiencia_range': (98.5, 99.2)},
+    {'temperatura_range': (40.0, 60.0), 'perdas_range': (10.0, 30.0)},
+    {'modelos': ['TSEA-2500'], 'eficiencia_range': (98.0, 99.0), 'perdas_range': (15.0, 40.0)},
+])
+def test_filtros_isolados(criar_dados, filtros, ordenar):
+    gerenciador = DashboardFilters(criar_dados(ordenar=ordenar))
+    verificar(gerenciador, filtros)
+
+
+@pytest.mark.parametrize('ordenar', [False, True])
+def test_filtros_de_periodo(criar_dados, ordenar):
+    df = criar_dados(ordenar=ordenar)
+    gerenciador = DashboardFilters(df)
+    inicio, fim = periodo_total(df)
+    
+    verificar(gerenciador, {'periodo': (inicio, fim)})
+    verificar(gerenciador, {'periodo': (inicio + timedelta(days=100), inicio + timedelta(days=130))})
+    verificar(gerenciador, {'periodo': (fim, fim)})
+    verificar(gerenciador, {'periodo': (fim + timedelta(days=1), fim + timedelta(days=10))})
+    verificar(gerenciador, {'periodo': (inicio, fim), 'periodo_rapido': (fim - timedelta(days=30), fim)})
+
+
+def test_faixa_completa_exclui_ausentes(criar_dados):
+    """Slider na amplitude inteira ainda descarta NaN, como a máscara do pandas"""
+    df = criar_dados()
+    gerenciador = DashboardFilters(df)
+    
+    filtros = {'eficiencia_range': limites(df, 'Eficiencia_Percentual')}
+    verificar(gerenciador, filtros)
+    assert len(gerenciador.df_filtrado) == df['Eficiencia_Percentual'].notna().sum()
+
+
+def test_faixa_completa_sem_ausentes_nao_restringe(criar_dados):
+    df = criar_dados(fracao_ausentes=0.0)
+    gerenciador = DashboardFilters(df)
+    
+    assert gerenciador.aplicar_filtros({'eficiencia_range': limites(df, 'Eficiencia_Percentual')}) is df
+
+
+def test_faixas_em_varios_blocos(criar_dados, monkeypatch):
+    """A avaliação conjunta das faixas dá o mesmo resultado com blocos menores que os dados"""
+    monkeypatch.setitem(FILTROS_PLANO_CONFIG, 'tamanho_bloco_faixas', 257)
+    gerenciador = DashboardFilters(criar_dados())
+    
+    verificar(gerenciador, {'eficiencia_range': (98.2, 99.4), 'temperatura_range': (45.0, 70.0)})
+    verificar(gerenciador, {'eficiencia_range': (98.2, 99.4), 'temperatura_range': (50.0, 60.0)})
+
+
+def test_refinamento_e_ampliacao(criar_dados):
+    df = criar_dados()
+    gerenciador = DashboardFilters(df)
+    efic_min, efic_max = limites(df, 'Eficiencia_Percentual')
+    
+    filtros = {'modelos': ['TSEA-1000', 'TSEA-2500', 'TSEA-5000'], 'eficiencia_range': (efic_min, efic_max)}
+    verificar(gerenciador, filtros)
+    
+    # Estreitar um único filtro reavalia só ele, sobre o resultado anterior
+    filtros = dict(filtros, eficiencia_range=(98.5, efic_max))
+    verificar(gerenciador, filtros)
+    assert gerenciador.avaliacao.plano['estrategia'] == 'refinamento'
+    
+    filtros = dict(filtros, modelos=['TSEA-1000'])
+    verificar(gerenciador, filtros)
+    assert gerenciador.avaliacao.plano['estrategia'] == 'refinamento'
+    
+    # Ampliar não pode partir do resultado anterior
+    filtros = dict(filtros, eficiencia_range=(98.0, efic_max))
+    verificar(gerenciador, filtros)
+    assert gerenciador.avaliacao.plano['estrategia'] != 'refinamento'
+    
+    filtros = dict(filtros, modelos=['TSEA-1000', 'TSEA-SPECIAL'], status=['Aprovado'])
+    verificar(gerenciador, filtros)
+    assert gerenciador.avaliacao.plano['estrategia'] != 'refinamento'
+
+
+def test_combinacao_repetida_vem_do_cache(criar_dados):
+    gerenciador = DashboardFilters(criar_dados())
+    cache = obter_cache_resultados()
+    
+    filtros_a = {'modelos': ['TSEA-1000', 'TSEA-7500'], 'perdas_range': (10.0, 30.0)}
+    filtros_b = {'modelos': ['TSEA-1000'], 'perdas_range': (10.0, 30.0)}
+    verificar(gerenciador, filtros_a)
+    verificar(gerenciador, filtros_b)
+    
+    # A ordem das seleções não muda a chave do cache
+    acertos = cache.estatisticas()['acertos']
+    verificar(gerenciador, {'perdas_range': (10.0, 30.0), 'modelos': ['TSEA-7500', 'TSEA-1000']})
+    assert cache.estatisticas()['acertos'] == acertos + 1
+    assert gerenciador.avaliacao.plano['estrategia'] == 'cache'
+    
+    # Depois de um resultado vindo do cache, a avaliação incremental continua correta
+    verificar(gerenciador, dict(filtros_b, status=['Reprovado']))
+    verificar(gerenciador, filtros_a)
+
+
+def test_resultados_do_cache_sao_somente_leitura(criar_dados):
+    gerenciador = DashboardFilters(criar_dados())
+    gerenciador.aplicar_filtros({'modelos': ['TSEA-1000']})
+    
+    posicoes = gerenciador.avaliacao.resultado
+    with pytest.raises(ValueError):
+        posicoes[0] = 0
+
+
+def test_cache_descarta_os_menos_usados():
+    cache = CacheResultados(memoria_maxima_bytes=3 * 80)
+    for chave in 'abc':
+        cache.obter(chave, lambda: np.arange(10))
+    cache.obter('a', lambda: pytest.fail("'a' deveria estar no cache"))
+    cache.obter('d', lambda: np.arange(10))
+    
+    # 'b' era a entrada usada há mais tempo quando 'd' entrou
+    falhas = cache.estatisticas()['falhas']
+    cache.obter('b', lambda: np.arange(10))
+    assert cache.estatisticas()['falhas'] == falhas + 1
+    assert cache.estatisticas()['memoria_mb'] * 1024 ** 2 <= 3 * 80
+
+
+def _filtros_aleatorios(df: pd.DataFrame, rng: np.random.Generator, filtros: dict) -> dict:
+    """Altera um filtro (estreitando, ampliando ou removendo) ou repete uma combinação anterior"""
+    filtros = dict(filtros)
+    chave = rng.choice([
+        'modelos', 'status', 'tipos_ensaio', 'potencias', 'periodo',
+        'eficiencia_range', 'temperatura_range', 'perdas_range'
+    ])
+    
+    if rng.random() < 0.15:
+        filtros.pop(chave, None)
+    elif chave in ('modelos', 'status', 'tipos_ensaio', 'potencias'):
+        coluna = {'modelos': 'Modelo', 'status': 'Status_Aprovacao', 'tipos_ensaio': 'Tipo_Ensaio',
+                  'potencias': 'Potencia_Nominal_MVA'}[chave]
+        valores = sorted(df[coluna].dropna().unique().tolist())
+        quantidade = int(rng.integers(1, len(valores) + 1))
+        filtros[chave] = [valores[i] for i in rng.choice(len(valores), quantidade, replace=False)]
+    elif chave == 'periodo':
+        inicio, fim = periodo_total(df)
+        dias = (fim - inicio).days
+        a, b = sorted(rng.integers(0, dias + 1, 2).tolist())
+        filtros[chave] = (inicio + timedelta(days=a), inicio + timedelta(days=b))
+    else:
+        coluna = {'eficiencia_range': 'Eficiencia_Percentual', 'temperatura_range': 'Elevacao_Temperatura_C',
+                  'perdas_range': 'Perdas_Totais_kW'}[chave]
+        valor_min, valor_max = limites(df, coluna)
+        a, b = sorted(rng.uniform(valor_min, valor_max, 2).round(1).tolist())
+        filtros[chave] = (a, b) if rng.random() < 0.8 else (valor_min, valor_max)
+    return filtros
+
+
+@pytest.mark.parametrize('ordenar', [False, True])
+def test_sequencia_aleatoria_de_mudancas(criar_dados, ordenar):
+    """600 mudanças seguidas (refinamentos, ampliações e repetições) contra a máscara de referência"""
+    df = criar_dados(num_registros=4000, ordenar=ordenar)
+    gerenciador = DashboardFilters(df)
+    rng = np.random.default_rng(2024)
+    
+    filtros = {}
+    historico = []
+    estrategias = set()
+    for _ in range(600):
+        if historico and rng.random() < 0.1:
+            filtros = historico[int(rng.integers(len(historico)))]
+        else:
+            filtros = _filtros_aleatorios(df, rng, filtros)
+        historico.append(filtros)
+        
+        verificar(gerenciador, filtros)
+        if gerenciador.avaliacao.plano is not None:
+            estrategias.add(gerenciador.avaliacao.plano['estrategia'])
+    
+    assert {'refinamento', 'cache'} <= estrategias
+    assert obter_cache_resultados().estatisticas()['acertos'] > 0
@@ -0,0 +1,128 @@
+"""
+Testes da linguagem de expressões de filtro
+Verifica a lista de construções aceitas pelo analisador (nada além de
+comparações, 'in', 'and', 'or' e 'not' sobre colunas e constantes) e compara
+as expressões avaliadas pelo motor com máscaras do pandas
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from filter_expression import NoExpressao, compilar_expressao
+from filters import DashboardFilters
+
+
+@pytest.mark.parametrize('texto', [
+    # Acesso a atributos
+    "Modelo.__class__ == 'x'",
+    "Perdas_Totais_kW.real > 1",
+    "Modelo == ''.__class__.__mro__[1].__subclasses__()",
+    # Chamadas
+    "__import__('os').system('true')",
+    "Perdas_Totais_kW > __import__('os').getpid()",
+    "Modelo == open('/etc/passwd').read()",
+    "Modelo == 'TSEA-1000'.upper()",
+    "Perdas_Totais_kW > len('abc')",
+    # Lambdas, compreensões e outras construções
+    "(lambda: True)()",
+    "Perdas_Totais_kW > (lambda: 1)()",
+    "Modelo in [m for m in ('TSEA-1000',)]",
+    "Perdas_Totais_kW > (1 if True else 2)",
+    "(Modelo := 'TSEA-1000')",
+    "Perdas_Totais_kW > 10 + 5",
+    "Modelo[0] == 'T'",
+    # Nomes dunder e nomes que não são colunas
+    "__builtins__ == 1",
+    "__class__ == 'x'",
+    "__debug__",
+    "Perdas_Totais_kW > __name__",
+    "Modelo",
+    "True",
+])
+def test_construcoes_nao_permitidas(texto):
+    with pytest.raises(ValueError):
+        compilar_expressao(texto)
+
+
+@pytest.mark.parametrize('texto', [
+    "Perdas_Totais_kW > ",
+    "Modelo == 'TSEA-1000' and",
+    "x" * 600,
+])
+def test_sintaxe_invalida_e_tamanho(texto):
+    with pytest.raises(ValueError):
+        compilar_expressao(texto)
+
+
+@pytest.mark.parametrize('texto', [
+    "Modelo > 'TSEA-1000'",
+    "Perdas_Totais_kW > 'alto'",
+    "Modelo in (1, 2)",
+    "Data_Teste > 2025",
+    "Data_Teste == 'ontem'",
+    "Data_Teste in ('2025-01-01',)",
+    "Data_Teste > 'now'",
+    "Data_Teste > 'today'",
+    "Data_Teste <= '2025-01-01T00:00:00+03:00'",
+    "Perdas_Totais_kW in ()",
+])
+def test_constantes_incompativeis_com_a_coluna(texto):
+    with pytest.raises(ValueError):
+        compilar_expressao(texto)
+
+
+def test_mensagem_de_operador_nao_permitido():
+    with pytest.raises(ValueError, match="Perdas_Totais_kW is 1"):
+        compilar_expressao("Perdas_Totais_kW is 1")
+
+
+def test_no_incompleto_falha_ao_ser_criado():
+    class SemEstimativa(NoExpressao):
+        def mascara(self, motor, posicoes=None):
+            return np.ones(0, dtype=bool)
+    
+    with pytest.raises(TypeError):
+        SemEstimativa()
+    with pytest.raises(TypeError):
+        NoExpressao()
+
+
+def test_colunas_da_expressao():
+    expressao = compilar_expressao("Modelo in ('TSEA-5000', 'TSEA-7500') and Perdas_Totais_kW > 25")
+    assert expressao.colunas == {'Modelo', 'Perdas_Totais_kW'}
+
+
+@pytest.mark.parametrize('texto, referencia', [
+    ("Modelo in ('TSEA-5000', 'TSEA-7500') and Perdas_Totais_kW > 25",
+     lambda df: df['Modelo'].isin(['TSEA-5000', 'TSEA-7500']) & (df['Perdas_Totais_kW'] > 25)),
+    ("Modelo not in ('TSEA-1000',) or not Eficiencia_Percentual >= 98.5",
+     lambda df: (df['Modelo'].notna() & (df['Modelo'] != 'TSEA-1000')) | ~(df['Eficiencia_Percentual'] >= 98.5)),
+    ("20 < Perdas_Totais_kW <= 30",
+     lambda df: (df['Perdas_Totais_kW'] > 20) & (df['Perdas_Totais_kW'] <= 30)),
+    ("Status_Aprovacao != 'Aprovado' and Elevacao_Temperatura_C > -1",
+     lambda df: (df['Status_Aprovacao'] == 'Reprovado') & (df['Elevacao_Temperatura_C'] > -1)),
+    ("Potencia_Nominal_MVA in (5, 10) and Tensao_Primaria_kV >= 69",
+     lambda df: df['Potencia_Nominal_MVA'].isin([5, 10]) & (df['Tensao_Primaria_kV'] >= 69)),
+])
+def test_expressoes_validas_contra_o_pandas(criar_dados, texto, referencia):
+    df = criar_dados()
+    gerenciador = DashboardFilters(df)
+    
+    df_filtrado = gerenciador.aplicar_filtros({'expressao': texto})
+    esperado = df.index[referencia(df).fillna(False).to_numpy(dtype=bool)]
+    assert df_filtrado.index.equals(esperado)
+
+
+def test_datas_sem_horario_representam_o_dia_inteiro(criar_dados):
+    df = criar_dados()
+    gerenciador = DashboardFilters(df)
+    dia = df['Data_Teste'].dropna().iloc[0].normalize()
+    texto_dia = dia.strftime('%Y-%m-%d')
+    
+    for texto, referencia in [
+        (f"Data_Teste == '{texto_dia}'", lambda datas: datas.dt.normalize() == dia),
+        (f"Data_Teste > '{texto_dia}'", lambda datas: datas >= dia + pd.Timedelta(days=1)),
+        (f"Data_Teste <= '{texto_dia}'", lambda datas: datas < dia + pd.Timedelta(days=1)),
+    ]:
+        df_filtrado = gerenciador.aplicar_filtros({'expressao': texto})
+        assert df_filtrado.index.equals(df.index[referencia(df['Data_Teste']).to_numpy(dtype=bool)]), texto
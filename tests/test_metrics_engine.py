@@ -0,0 +1,255 @@
+"""
+Testes do motor de agregação das métricas
+Compara os agregados combináveis (passada única em blocos, células e
+combinação pela fórmula de Chan) com as estatísticas do pandas, e as
+métricas respondidas pelo cubo com as calculadas varrendo as linhas
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from datetime import timedelta
+from config import AGREGACAO_CONFIG, METRICAS_CONFIG, QUANTIS_CONFIG
+from filters import DashboardFilters
+from metrics import DashboardMetrics
+from metrics_engine import (
+    COLUNAS_AGREGADAS, CuboMetricas, agregar_celulas, agregar_coluna, calcular_agregados, calcular_kpis,
+    metricas_basicas, obter_cubo_metricas, taxa_aprovacao_por_modelo, _celulas_minimas
+)
+
+
+def assert_agregados_iguais(agregados, valores: pd.Series, coluna: str):
+    """Compara um AgregadosColuna de um único grupo com as estatísticas do pandas"""
+    assert agregados.contagem[0] == valores.count()
+    if valores.count() == 0:
+        assert np.isnan(agregados.media[0]) and np.isnan(agregados.minimo[0])
+        return
+    assert agregados.media[0] == pytest.approx(valores.mean(), rel=1e-12)
+    assert agregados.minimo[0] == valores.min()
+    assert agregados.maximo[0] == valores.max()
+    desvio = agregados.desvio_padrao()[0]
+    assert (np.isnan(desvio) and np.isnan(valores.std())) or desvio == pytest.approx(valores.std(), rel=1e-9)
+    
+    falhas = {
+        'Eficiencia_Percentual': (valores < METRICAS_CONFIG['eficiencia_minima']).sum(),
+        'Elevacao_Temperatura_C': (valores > METRICAS_CONFIG['temperatura_maxima']).sum(),
+        'Perdas_Totais_kW': (valores > METRICAS_CONFIG['perdas_maximas']).sum()
+    }.get(coluna, 0)
+    assert agregados.fora_spec[0] == falhas
+
+
+@pytest.mark.parametrize('tamanho_bloco', [1, 97, 65536])
+def test_passada_unica_em_blocos(criar_dados, monkeypatch, tamanho_bloco):
+    monkeypatch.setitem(AGREGACAO_CONFIG, 'tamanho_bloco', tamanho_bloco)
+    df = criar_dados(num_registros=1500)
+    
+    for coluna in COLUNAS_AGREGADAS:
+        assert_agregados_iguais(agregar_coluna(df[coluna].to_numpy(), coluna), df[coluna], coluna)
+
+
+def test_coluna_sem_valores():
+    agregados = agregar_coluna(np.full(10, np.nan), 'Perdas_Totais_kW')
+    assert_agregados_iguais(agregados, pd.Series(np.full(10, np.nan)), 'Perdas_Totais_kW')
+
+
+def test_combinacao_de_celulas(criar_dados):
+    """Qualquer união de células combinada pela fórmula de Chan equivale a reler as linhas"""
+    df = criar_dados(num_registros=2000)
+    rng = np.random.default_rng(3)
+    celulas = rng.integers(0, 40, len(df))
+    ordem = np.argsort(celulas, kind='stable')
+    _, inicios = np.unique(celulas[ordem], return_index=True)
+    
+    for coluna in ['Eficiencia_Percentual', 'Perdas_Totais_kW']:
+        por_celula = agregar_celulas(df[coluna].to_numpy()[ordem], inicios, coluna)
+        assert_agregados_iguais(por_celula.combinar(), df[coluna], coluna)
+        
+        for _ in range(20):
+            selecao = rng.random(40) < 0.3
+            linhas = selecao[celulas]
+            assert_agregados_iguais(por_celula.combinar(selecao), df.loc[linhas, coluna], coluna)
+
+
+def test_calcular_agregados(criar_dados):
+    df = criar_dados(num_registros=2000)
+    agregados = calcular_agregados(df)
+    
+    assert agregados['total'] == len(df)
+    for coluna in ['Modelo', 'Tipo_Ensaio', 'Status_Aprovacao']:
+        contagens = df[coluna].value_counts()
+        assert agregados['categorias'][coluna] == contagens[contagens > 0].to_dict()
+    
+    tabela = pd.crosstab(df['Modelo'], df['Status_Aprovacao'])
+    pd.testing.assert_frame_equal(
+        agregados['modelo_status'], tabela, check_names=False, check_dtype=False, check_categorical=False,
+        check_index_type=False, check_column_type=False
+    )
+    
+    metricas = metricas_basicas(agregados)
+    assert metricas['eficiencia_media'] == pytest.approx(df['Eficiencia_Percentual'].mean())
+    assert metricas['taxa_aprovacao'] == pytest.approx((df['Status_Aprovacao'] == 'Aprovado').mean() * 100)
+
+
+def assert_metricas_iguais(obtidas, esperadas):
+    """Compara dicionários de métricas (números com tolerância relativa, NaN igual a NaN)"""
+    assert obtidas.keys() == esperadas.keys()
+    for chave, esperado in esperadas.items():
+        if isinstance(esperado, dict):
+            assert obtidas[chave] == esperado, chave
+        elif isinstance(esperado, float) and np.isnan(esperado):
+            assert np.isnan(obtidas[chave]), chave
+        else:
+            assert obtidas[chave] == pytest.approx(esperado, rel=1e-9), chave
+
+
+def test_cubo_descartado_nos_dados_de_demonstracao(criar_dados, monkeypatch):
+    """Com poucos registros por dia há quase uma célula por registro: as métricas varrem as linhas"""
+    df = criar_dados(num_registros=500)
+    assert CuboMetricas(df).num_celulas > AGREGACAO_CONFIG['limite_celulas_cubo'] * len(df)
+    
+    # A estimativa basta para descartá-lo, sem construir o cubo
+    monkeypatch.setattr(CuboMetricas, '__init__', lambda *args: pytest.fail("o cubo não deveria ser construído"))
+    cubo = obter_cubo_metricas(df)
+    assert cubo is None
+    
+    metricas = DashboardMetrics(df, cubo, {})
+    metricas.calcular_metricas_basicas()
+    assert metricas.origem_agregados == 'linhas'
+
+
+@pytest.mark.parametrize('num_dias', [None, 5])
+def test_estimativa_nao_excede_as_celulas(criar_dados, num_dias):
+    df = criar_dados(num_registros=5000, num_dias=num_dias)
+    assert _celulas_minimas(df) <= CuboMetricas(df).num_celulas
+
+
+@pytest.mark.parametrize('montar_filtros', [
+    lambda fim: {},
+    lambda fim: {'modelos': ['TSEA-1000', 'TSEA-5000']},
+    lambda fim: {'status': ['Reprovado'], 'tipos_ensaio': ['Ensaio de Tipo', 'Ensaio Especial']},
+    lambda fim: {'potencias': [5.0, 10.0, 25.0], 'status_rapido': ['Aprovado']},
+    lambda fim: {'modelos': ['TSEA-2500'], 'periodo': (fim - timedelta(days=2), fim)},
+    lambda fim: {'periodo': (fim - timedelta(days=2), fim), 'periodo_rapido': (fim, fim)},
+    lambda fim: {'modelos': ['modelo inexistente']},
+])
+def test_cubo_igual_a_varredura_das_linhas(criar_dados, monkeypatch, montar_filtros):
+    """Sob filtros de lista e de período, as métricas vêm do cubo e coincidem com as das linhas"""
+    monkeypatch.setitem(QUANTIS_CONFIG, 'modo', 'exato')
+    df = criar_dados(num_registros=20000, num_dias=5)
+    filtros = montar_filtros(df['Data_Teste'].max().date())
+    
+    cubo = obter_cubo_metricas(df)
+    assert cubo.viavel
+    df_filtrado = DashboardFilters(df).aplicar_filtros(filtros)
+    
+    pelo_cubo = DashboardMetrics(df_filtrado, cubo, filtros)
+    pelas_linhas = DashboardMetrics(df_filtrado)
+    if df_filtrado.empty:
+        assert pelo_cubo.calcular_metricas_basicas()['total_testes'] == 0
+        return
+    
+    assert_metricas_iguais(pelo_cubo.calcular_metricas_basicas(), pelas_linhas.calcular_metricas_basicas())
+    assert_metricas_iguais(pelo_cubo.calcular_metricas_avancadas(), pelas_linhas.calcular_metricas_avancadas())
+    assert pelo_cubo.origem_agregados == 'cubo'
+    assert pelas_linhas.origem_agregados == 'linhas'
+    
+    pd.testing.assert_frame_equal(
+        taxa_aprovacao_por_modelo(pelo_cubo.obter_agregados()),
+        taxa_aprovacao_por_modelo(pelas_linhas.obter_agregados()),
+        check_dtype=False, check_categorical=False, check_index_type=False, check_column_type=False
+    )
+
+
+@pytest.mark.parametrize('filtros', [
+    {'eficiencia_range': (98.5, 99.5)},
+    {'modelos': ['TSEA-1000'], 'expressao': 'Perdas_Totais_kW > 25'},
+    {'eficiencia_range': 'completa'},
+])
+def test_cubo_nao_responde_faixas_nem_expressoes(criar_dados, filtros):
+    df = criar_dados(num_registros=20000, num_dias=5)
+    if filtros.get('eficiencia_range') == 'completa':
+        # Slider na amplitude inteira ainda descarta NaN, o que o cubo não representa
+        filtros = {'eficiencia_range': (df['Eficiencia_Percentual'].min(), df['Eficiencia_Percentual'].max())}
+    
+    cubo = obter_cubo_metricas(df)
+    metricas = DashboardMetrics(DashboardFilters(df).aplicar_filtros(filtros), cubo, filtros)
+    metricas.calcular_metricas_basicas()
+    
+    assert cubo.viavel and not cubo.responde(filtros)
+    assert metricas.origem_agregados == 'linhas'
+
+
+def test_limite_de_celulas(criar_dados, monkeypatch):
+    df = criar_dados(num_registros=2000)
+    
+    monkeypatch.setitem(AGREGACAO_CONFIG, 'limite_celulas_cubo', 1.0)
+    assert CuboMetricas(df).viavel
+    monkeypatch.setitem(AGREGACAO_CONFIG, 'limite_celulas_cubo', 0.25)
+    assert not CuboMetricas(df).viavel
+
+
+def test_comparar_periodos_com_dataframe(criar_dados):
+    """A forma anterior, comparar_periodos(df_anterior), retorna só as variações"""
+    df = criar_dados(num_registros=2000)
+    atual, anterior = df.iloc[:1200], df.iloc[1200:]
+    
+    variacoes = DashboardMetrics(atual).comparar_periodos(anterior)
+    esperada = (atual['Eficiencia_Percentual'].mean() / anterior['Eficiencia_Percentual'].mean() - 1) * 100
+    assert variacoes['total_testes_variacao'] == pytest.approx((1200 / 800 - 1) * 100)
+    assert variacoes['eficiencia_media_variacao'] == pytest.approx(esperada)
+    assert DashboardMetrics(atual).comparar_periodos(anterior.iloc[:0]) == {}
+
+
+@pytest.mark.parametrize('definicao', [
+    {'agregacao': 'media'},
+    {'agregacao': 'mediana', 'coluna': 'Perdas_Totais_kW'},
+    {'agregacao': 'contagem', 'faixa': (98.0, 99.0)},
+    {'agregacao': 'contagem', 'coluna': 'Eficiencia_Percentual', 'faixa': (98.0,)},
+    {'agregacao': 'soma', 'coluna': 'Coluna_Inexistente'},
+    {'agregacao': 'taxa_aprovacao', 'por': 'Coluna_Inexistente'},
+])
+def test_kpi_invalido_indica_o_nome(criar_dados, definicao):
+    df = criar_dados(num_registros=200)
+    with pytest.raises(ValueError, match='meu_kpi'):
+        calcular_kpis(df, {'meu_kpi': definicao})
+    with pytest.raises(ValueError, match='meu_kpi'):
+        calcular_kpis(df.iloc[:0], {'meu_kpi': definicao})
+
+
+def test_kpis_contra_o_pandas(criar_dados):
+    df = criar_dados(num_registros=2000)
+    kpis = calcular_kpis(df, {
+        'total': {'agregacao': 'contagem'},
+        'perdas': {'agregacao': 'media', 'coluna': 'Perdas_Totais_kW', 'por': 'Tipo_Ensaio'},
+        'alta': {'agregacao': 'maximo', 'coluna': 'Perdas_Totais_kW', 'coluna_faixa': 'Eficiencia_Percentual',
+                 'faixa': (98.5, None)},
+    })
+    
+    assert kpis['total'] == len(df)
+    for tipo, media in df.groupby('Tipo_Ensaio', observed=True)['Perdas_Totais_kW'].mean().items():
+        assert kpis[f'perdas_{tipo}'] == pytest.approx(media)
+    assert kpis['alta'] == df.loc[df['Eficiencia_Percentual'] >= 98.5, 'Perdas_Totais_kW'].max()
+
+
+def test_comparacao_nao_usa_cubo_descartado(criar_dados, monkeypatch):
+    """Se o total do cubo não confere com as linhas, as janelas da comparação também vêm das linhas"""
+    df = criar_dados(num_registros=20000, num_dias=5)
+    cubo = obter_cubo_metricas(df)
+    assert cubo.viavel
+    
+    # Linhas que o cubo (montado sobre todos os dados) não descreve
+    df_parcial = df.iloc[::2]
+    gerenciador = DashboardFilters(df_parcial)
+    filtrar_periodo = lambda periodo: gerenciador.aplicar_filtros_periodo({}, periodo)
+    monkeypatch.setattr(cubo, 'agregados_janelas', lambda *args: pytest.fail("janelas não deveriam vir do cubo"))
+    
+    metricas = DashboardMetrics(df_parcial, cubo, {})
+    comparacao = metricas.comparar_periodos('janela_movel', 2, filtrar_periodo)
+    assert metricas.origem_agregados == 'linhas'
+    
+    esperada = DashboardMetrics(df_parcial).comparar_periodos('janela_movel', 2, filtrar_periodo)
+    inicio, fim = comparacao['janelas'][0]
+    datas = df_parcial['Data_Teste'].dt.date
+    assert comparacao['atual']['total_testes'] == ((datas >= inicio) & (datas <= fim)).sum()
+    assert_metricas_iguais(comparacao['atual'], esperada['atual'])
+    assert_metricas_iguais(comparacao['referencia'], esperada['referencia'])
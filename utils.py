@@ -9,7 +9,7 @@ import numpy as np
 import io
 from datetime import datetime
 from typing import Optional, Dict, Any
-from config import EXPORT_CONFIG, TEXTOS_INTERFACE
+from config import EXPORT_CONFIG, TEXTOS_INTERFACE, DATA_CONFIG
 
 
 class DataExporter:
@@ -353,8 +353,15 @@ def configurar_pagina():
     """, unsafe_allow_html=True)
 
 
-def criar_sidebar_info():
-    """Cria informações na sidebar"""
+def criar_sidebar_info(relatorio_memoria: Optional[Dict[str, float]] = None,
+                       estatisticas_cache: Optional[Dict[str, float]] = None):
+    """
+    Cria informações na sidebar
+    
+    Args:
+        relatorio_memoria: Uso de memória dos dados antes/depois da normalização (opcional)
+        estatisticas_cache: Contadores do cache de resultados dos filtros (opcional)
+    """
     st.sidebar.markdown("---")
     st.sidebar.markdown("### ℹ️ Informações")
     st.sidebar.info(
@@ -362,8 +369,30 @@ def criar_sidebar_info():
         "de forma interativa. Use os filtros para explorar os dados."
     )
     
+    if relatorio_memoria:
+        st.sidebar.caption(
+            f"💾 Memória dos dados: {relatorio_memoria['memoria_depois_mb']:.1f} MB "
+            f"(antes da otimização: {relatorio_memoria['memoria_antes_mb']:.1f} MB)"
+        )
+    
+    if estatisticas_cache:
+        st.sidebar.caption(
+            f"⚡ Cache de filtros: {estatisticas_cache['acertos']} acertos, "
+            f"{estatisticas_cache['falhas']} falhas "
+            f"({estatisticas_cache['entradas']} resultados, {estatisticas_cache['memoria_mb']:.1f} MB)"
+        )
+    
     st.sidebar.markdown("### 🔧 Configurações")
-    if st.sidebar.button("🔄 Recarregar Dados"):
+    if DATA_CONFIG['modo_incremental']:
+        # Lê apenas os registros novos; a recarga completa continua disponível
+        if st.sidebar.button("🔄 Recarregar Dados", help="Lê apenas os registros novos"):
+            st.session_state.atualizar_dados = True
+            st.rerun()
+        if st.sidebar.button("♻️ Recarga Completa", help="Descarta os dados em memória e lê tudo novamente"):
+            st.cache_data.clear()
+            st.cache_resource.clear()
+            st.rerun()
+    elif st.sidebar.button("🔄 Recarregar Dados"):
         st.cache_data.clear()
         st.rerun()
     
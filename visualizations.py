@@ -9,7 +9,11 @@ from plotly.subplots import make_subplots
 import pandas as pd
 import numpy as np
 import streamlit as st
+from typing import Any, Dict, Optional
 from config import GRAFICOS_CONFIG, METRICAS_CONFIG
+from metrics import DashboardMetrics
+from metrics_engine import taxa_aprovacao_por_modelo
+from quantile_sketch import EsbocoQuantis
 
 
 class DashboardVisualizations:
@@ -107,17 +111,23 @@ class DashboardVisualizations:
         
         return fig
     
-    def grafico_distribuicao_modelos(self, df: pd.DataFrame) -> go.Figure:
+    def grafico_distribuicao_modelos(self, df: pd.DataFrame,
+                                     agregados: Optional[Dict[str, Any]] = None) -> go.Figure:
         """
         Cria gráfico de pizza com distribuição de modelos
         
         Args:
             df: DataFrame com os dados
+            agregados: Agregados já calculados pelas métricas (evita recontar as linhas)
             
         Returns:
             Figura do Plotly
         """
-        contagem_modelos = df['Modelo'].value_counts()
+        if agregados is not None:
+            contagem_modelos = pd.Series(agregados['categorias']['Modelo'], dtype='int64')
+        else:
+            contagem_modelos = df['Modelo'].value_counts()
+            contagem_modelos = contagem_modelos[contagem_modelos > 0]
         
         fig = px.pie(
             values=contagem_modelos.values,
@@ -131,20 +141,25 @@ class DashboardVisualizations:
         
         return fig
     
-    def grafico_aprovacao_por_modelo(self, df: pd.DataFrame) -> go.Figure:
+    def grafico_aprovacao_por_modelo(self, df: pd.DataFrame,
+                                     agregados: Optional[Dict[str, Any]] = None) -> go.Figure:
         """
         Cria gráfico de barras com taxa de aprovação por modelo
         
         Args:
             df: DataFrame com os dados
+            agregados: Agregados já calculados pelas métricas (evita agrupar as linhas)
             
         Returns:
             Figura do Plotly
         """
         # Calcula taxa de aprovação por modelo
-        aprovacao_modelo = df.groupby(['Modelo', 'Status_Aprovacao']).size().unstack(fill_value=0)
-        aprovacao_modelo['Total'] = aprovacao_modelo.sum(axis=1)
-        aprovacao_modelo['Taxa_Aprovacao'] = (aprovacao_modelo.get('Aprovado', 0) / aprovacao_modelo['Total']) * 100
+        if agregados is not None:
+            aprovacao_modelo = taxa_aprovacao_por_modelo(agregados)
+        else:
+            aprovacao_modelo = df.groupby(['Modelo', 'Status_Aprovacao'], observed=True).size().unstack(fill_value=0)
+            aprovacao_modelo['Total'] = aprovacao_modelo.sum(axis=1)
+            aprovacao_modelo['Taxa_Aprovacao'] = (aprovacao_modelo.get('Aprovado', 0) / aprovacao_modelo['Total']) * 100
         
         fig = px.bar(
             x=aprovacao_modelo.index,
@@ -213,28 +228,52 @@ class DashboardVisualizations:
         
         return fig
     
-    def grafico_boxplot_temperatura(self, df: pd.DataFrame) -> go.Figure:
+    def grafico_boxplot_temperatura(self, df: pd.DataFrame,
+                                    esboco: Optional[EsbocoQuantis] = None) -> go.Figure:
         """
         Cria boxplot da temperatura por modelo
         
         Args:
             df: DataFrame com os dados
+            esboco: Esboço de quantis da temperatura por modelo; quando informado,
+                apenas as estatísticas das caixas são enviadas ao navegador (sem
+                os pontos individuais nem os outliers)
             
         Returns:
             Figura do Plotly
         """
-        fig = px.box(
-            df,
-            x='Modelo',
-            y='Elevacao_Temperatura_C',
-            title='Distribuição da Elevação de Temperatura por Modelo',
-            labels={
-                'Modelo': 'Modelo do Transformador',
-                'Elevacao_Temperatura_C': 'Elevação de Temperatura (°C)'
-            },
-            template=self.template,
-            height=self.altura_padrao
-        )
+        if esboco is not None:
+            com_dados = esboco.totais() > 0
+            q1, mediana, q3 = esboco.quantis([0.25, 0.5, 0.75]).T
+            inferior, superior = esboco.cercas(q1, q3)
+            
+            fig = go.Figure(go.Box(
+                x=[rotulo for rotulo, ativo in zip(esboco.rotulos, com_dados) if ativo],
+                q1=q1[com_dados],
+                median=mediana[com_dados],
+                q3=q3[com_dados],
+                lowerfence=inferior[com_dados],
+                upperfence=superior[com_dados],
+                name='Elevação de Temperatura'
+            ))
+            fig.update_layout(
+                title='Distribuição da Elevação de Temperatura por Modelo',
+                template=self.template,
+                height=self.altura_padrao
+            )
+        else:
+            fig = px.box(
+                df,
+                x='Modelo',
+                y='Elevacao_Temperatura_C',
+                title='Distribuição da Elevação de Temperatura por Modelo',
+                labels={
+                    'Modelo': 'Modelo do Transformador',
+                    'Elevacao_Temperatura_C': 'Elevação de Temperatura (°C)'
+                },
+                template=self.template,
+                height=self.altura_padrao
+            )
         
         # Adiciona linha de referência
         fig.add_hline(
@@ -265,7 +304,7 @@ class DashboardVisualizations:
         df_mensal = df.copy()
         df_mensal['Mes_Ano'] = df_mensal['Data_Teste'].dt.to_period('M')
         
-        tendencia = df_mensal.groupby(['Mes_Ano', 'Status_Aprovacao']).size().unstack(fill_value=0)
+        tendencia = df_mensal.groupby(['Mes_Ano', 'Status_Aprovacao'], observed=True).size().unstack(fill_value=0)
         tendencia.index = tendencia.index.astype(str)
         
         fig = go.Figure()
@@ -329,13 +368,15 @@ class DashboardVisualizations:
         return fig
 
 
-def criar_visualizacao(tipo_grafico: str, df: pd.DataFrame) -> go.Figure:
+def criar_visualizacao(tipo_grafico: str, df: pd.DataFrame,
+                       metricas: Optional[DashboardMetrics] = None) -> go.Figure:
     """
     Função auxiliar para criar visualizações
     
     Args:
         tipo_grafico: Tipo do gráfico a ser criado
         df: DataFrame com os dados
+        metricas: Métricas dos mesmos dados (agregados e esboços reaproveitados pelos gráficos)
         
     Returns:
         Figura do Plotly
@@ -353,7 +394,14 @@ def criar_visualizacao(tipo_grafico: str, df: pd.DataFrame) -> go.Figure:
         'correlacao_potencia': viz.grafico_correlacao_potencia_perdas
     }
     
-    if tipo_grafico in graficos_disponiveis:
+    # Gráficos que podem ser montados a partir dos agregados das métricas
+    graficos_agregados = {'distribuicao_modelos', 'aprovacao_modelo'}
+    
+    if metricas is not None and tipo_grafico in graficos_agregados:
+        return graficos_disponiveis[tipo_grafico](df, metricas.obter_agregados())
+    elif metricas is not None and tipo_grafico == 'boxplot_temperatura':
+        return viz.grafico_boxplot_temperatura(df, metricas.obter_esboco('Elevacao_Temperatura_C', por='Modelo'))
+    elif tipo_grafico in graficos_disponiveis:
         return graficos_disponiveis[tipo_grafico](df)
     else:
         st.error(f"Tipo de gráfico '{tipo_grafico}' não encontrado")